@@ -0,0 +1,293 @@
+"""
+Incremental per-user baseline statistics for the Early Warning engine.
+
+_calculate_blended_baseline needs, per metric, the mean and sample std of the
+readings in the last ROLLING_WINDOW_DAYS before the newest reading, plus the
+date span of the whole history window.  Instead of rebuilding that from the
+raw rows on every call, each user keeps running count / sum / sum-of-squares
+over the recent window and evicts readings from the front as the window
+slides.  Pushing a reading and reading the stats are O(1) amortised, however
+long the user's history is.
+
+The same state carries the streaming estimators (stream_stats.py) behind
+two checks:
+
+- HR trend: the least-squares slope over the last ``trend_days``, and over
+  the newest ``tail_size`` readings.
+- Exercise suppression: the user's step-count percentile over the horizon.
+
+Both update as readings are pushed and expire.
+
+State lives for the lifetime of the process.  It is rebuilt from the rows in
+biometric_time_series (via the request's AnalysisContext) the first time a
+user is seen, after a restart, and whenever the stored history no longer
+matches the state (e.g. another worker ingested for the same user).
+"""
+
+import math
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from history_frame import DAY_NS, HistoryFrame, epoch_ns, now_ns
+from stream_stats import SlidingSlope, WindowPercentile
+
+
+class UserBaselineState:
+    """Rolling window statistics for one user across a fixed list of metrics."""
+
+    def __init__(self, metrics: Sequence[str], recent_days: float, horizon_days: float,
+                 trend_metric: Optional[str] = None, trend_days: float = 0.0, tail_size: int = 0,
+                 percentile_metric: Optional[str] = None, percentile: float = 50.0):
+        self.metrics = list(metrics)
+        self._recent_ns = int(recent_days * DAY_NS)
+        self._horizon_ns = int(horizon_days * DAY_NS)
+        self._trend_ns = int(trend_days * DAY_NS)
+        self._trend_i = self.metrics.index(trend_metric) if trend_metric else None
+        self._pct_i = self.metrics.index(percentile_metric) if percentile_metric else None
+        # (timestamp, has a trend value) of readings in the trend window, and
+        # the slope over those values
+        self._trend: Deque[Tuple[int, bool]] = deque()
+        self._trend_slope = SlidingSlope()
+        # Trend metric of the newest readings (NaN when missing)
+        self._tail: Deque[float] = deque(maxlen=tail_size)
+        # Percentile metric of every reading in the horizon, aligned with _times
+        self._pct_values: Deque[float] = deque()
+        self._pct = WindowPercentile(percentile)
+        # Timestamps of every reading in the history horizon (gives the span)
+        self._times: Deque[int] = deque()
+        # (timestamp, values) of readings in the recent window (gives mean/std);
+        # missing values are NaN
+        self._recent: Deque[Tuple[int, Tuple[float, ...]]] = deque()
+        n = len(self.metrics)
+        self.count = [0] * n
+        self.sum = [0.0] * n
+        self.sum_sq = [0.0] * n
+        # Per-metric shift keeps sum-of-squares well conditioned
+        self._shift = [0.0] * n
+        self.first_ts: Optional[int] = None
+        self.last_ts: Optional[int] = None
+
+    @classmethod
+    def from_frame(cls, frame: HistoryFrame, recent_days: float, horizon_days: float,
+                   now: Optional[int] = None, **stream) -> "UserBaselineState":
+        """
+        Bulk-build from a request's history in one vectorised pass.
+        ``stream`` configures the estimators as in the constructor; ``now``
+        trims the trend window (expire() does it otherwise).
+        """
+        state = cls(frame.metrics, recent_days, horizon_days, **stream)
+        if not len(frame):
+            return state
+        ts = frame.ts
+        if state._trend_i is not None:
+            column = frame.values[state._trend_i]
+            start = 0 if now is None else int(np.searchsorted(ts, now - state._trend_ns, side="right"))
+            present = ~np.isnan(column[start:])
+            state._trend.extend(zip(ts[start:].tolist(), present.tolist()))
+            state._trend_slope = SlidingSlope(column[start:][present].tolist())
+            if state._tail.maxlen:
+                state._tail.extend(column[-state._tail.maxlen:].tolist())
+        if state._pct_i is not None:
+            column = frame.values[state._pct_i]
+            state._pct_values.extend(column.tolist())
+            state._pct = WindowPercentile(state._pct.q, np.sort(column[~np.isnan(column)]).tolist())
+        lo = frame.recent_start(recent_days)
+        count, mean, std = frame.window_stats(recent_days)
+        state._times.extend(ts.tolist())
+        state._recent.extend(zip(ts[lo:].tolist(), map(tuple, frame.values[:, lo:].T.tolist())))
+        for i in range(len(state.metrics)):
+            n = int(count[i])
+            if n == 0:
+                continue
+            state.count[i] = n
+            state._shift[i] = float(mean[i])
+            state.sum_sq[i] = float(std[i]) ** 2 * (n - 1) if n > 1 else 0.0
+        state.first_ts = int(ts[0])
+        state.last_ts = int(ts[-1])
+        return state
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def push(self, ts: datetime, row: dict) -> bool:
+        """
+        Add one reading.  Returns False (and leaves the state untouched) when
+        the reading is older than the newest one already seen; the caller
+        should rebuild from storage in that case.
+        """
+        t = epoch_ns(ts)
+        if self.last_ts is not None and t < self.last_ts:
+            return False
+        values = tuple(math.nan if row.get(m) is None else float(row[m]) for m in self.metrics)
+        self._times.append(t)
+        self._recent.append((t, values))
+        if self._trend_i is not None:
+            v = values[self._trend_i]
+            self._trend.append((t, not math.isnan(v)))
+            if not math.isnan(v):
+                self._trend_slope.push(v)
+            self._tail.append(v)
+        if self._pct_i is not None:
+            v = values[self._pct_i]
+            self._pct_values.append(v)
+            if not math.isnan(v):
+                self._pct.add(v)
+        for i, v in enumerate(values):
+            if math.isnan(v):
+                continue
+            if self.count[i] == 0:
+                self._shift[i] = v
+            d = v - self._shift[i]
+            self.count[i] += 1
+            self.sum[i] += d
+            self.sum_sq[i] += d * d
+        if self.first_ts is None:
+            self.first_ts = t
+        self.last_ts = t
+        self._evict_recent(t - self._recent_ns)
+        return True
+
+    def _evict_recent(self, cutoff: int) -> None:
+        """Drop recent-window readings older than ``cutoff``."""
+        while self._recent and self._recent[0][0] < cutoff:
+            _, values = self._recent.popleft()
+            for i, v in enumerate(values):
+                if math.isnan(v):
+                    continue
+                d = v - self._shift[i]
+                self.count[i] -= 1
+                self.sum[i] -= d
+                self.sum_sq[i] -= d * d
+                if self.count[i] == 0:
+                    self.sum[i] = 0.0
+                    self.sum_sq[i] = 0.0
+
+    def expire(self, now: int) -> None:
+        """Drop readings that have fallen out of the history horizon."""
+        cutoff = now - self._horizon_ns
+        while self._times and self._times[0] <= cutoff:
+            self._times.popleft()
+            if self._pct_i is not None:
+                v = self._pct_values.popleft()
+                if not math.isnan(v):
+                    self._pct.remove(v)
+        trend_cutoff = now - self._trend_ns
+        while self._trend and self._trend[0][0] <= trend_cutoff:
+            _, present = self._trend.popleft()
+            if present:
+                self._trend_slope.popleft()
+        if not self._times:
+            self.first_ts = self.last_ts = None
+        else:
+            self.first_ts = self._times[0]
+        # Recent readings must also still be inside the horizon
+        self._evict_recent(cutoff + 1)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    @property
+    def size(self) -> int:
+        return len(self._times)
+
+    def span_days(self) -> float:
+        if self.first_ts is None or self.last_ts is None:
+            return 0.0
+        return (self.last_ts - self.first_ts) / DAY_NS
+
+    def trend(self) -> Tuple[int, int, float]:
+        """
+        (readings, values, slope) over the trend window: readings in it, how
+        many have the trend metric, and the slope of those values against
+        their position (NaN below two).
+        """
+        return len(self._trend), len(self._trend_slope), self._trend_slope.slope()
+
+    def tail_trend(self) -> Tuple[int, float]:
+        """(values, slope) of the trend metric over the newest ``tail_size`` readings."""
+        tail = list(self._tail)[-min(len(self._tail), self.size):] if self.size else []
+        values = [v for v in tail if not math.isnan(v)]
+        return len(values), SlidingSlope(values).slope()
+
+    def percentile(self) -> float:
+        """The percentile metric's configured percentile over the horizon; NaN if none."""
+        return self._pct.value()
+
+    def metric_stats(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (count, mean, sample std) per metric over the recent window, as arrays
+        aligned with ``metrics``.  Mean is NaN where count is 0 and std is NaN
+        where count < 2, matching HistoryFrame.window_stats.
+        """
+        count = np.array(self.count, dtype=np.float64)
+        total = np.array(self.sum)
+        total_sq = np.array(self.sum_sq)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_d = total / count
+            var = np.maximum(0.0, (total_sq - count * mean_d * mean_d) / (count - 1))
+        mean = mean_d + np.array(self._shift)
+        std = np.where(count > 1, np.sqrt(np.where(count > 1, var, 0.0)), np.nan)
+        return count, mean, std
+
+
+class BaselineStateStore:
+    """Process-wide map of user_id -> UserBaselineState."""
+
+    def __init__(self, metrics: Sequence[str], recent_days: float, horizon_days: float,
+                 **stream):
+        self.metrics = list(metrics)
+        self.recent_days = recent_days
+        self.horizon_days = horizon_days
+        # Estimator settings passed to every UserBaselineState
+        self.stream = stream
+        self._states: Dict[str, UserBaselineState] = {}
+        self._lock = threading.Lock()
+
+    def state_for(self, user_id: str, frame: HistoryFrame) -> UserBaselineState:
+        """
+        Return the user's state, (re)building it from ``frame`` — the stored
+        history for the horizon — when it is missing or no longer agrees with
+        storage.  The agreement check is O(1): same number of readings and
+        same newest timestamp.
+        """
+        now = now_ns()
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is not None:
+                state.expire(now)
+                if state.size == len(frame) and state.last_ts == frame.last_ts:
+                    return state
+            state = self.build(frame, now)
+            self._states[user_id] = state
+            return state
+
+    def build(self, frame: HistoryFrame, now: Optional[int] = None) -> UserBaselineState:
+        """A state over ``frame`` that is not kept (e.g. a partial history)."""
+        now = now_ns() if now is None else now
+        state = UserBaselineState.from_frame(
+            frame, self.recent_days, self.horizon_days, now=now, **self.stream,
+        )
+        state.expire(now)
+        return state
+
+    def push(self, user_id: str, row: dict) -> None:
+        """Apply a just-stored reading to a user's state, if one is held."""
+        ts = row.get("timestamp")
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is None or not isinstance(ts, datetime):
+                return
+            if not state.push(ts, row):
+                # Out-of-order reading: rebuild from storage on next lookup
+                del self._states[user_id]
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(user_id, None)
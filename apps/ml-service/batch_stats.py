@@ -0,0 +1,57 @@
+"""
+Vectorised statistics over many users' rows at once.
+
+``round_like_python`` is the element-wise round() that keeps vectorised
+scoring rules (cohort CVD scoring) bit-identical to their scalar versions.
+Per-user trend and percentile statistics are streamed instead; see
+stream_stats.py.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+_SPLITTER = 134217729.0  # 2**27 + 1 (Veltkamp splitting)
+
+
+def _two_product(a: np.ndarray, b: float) -> Tuple[np.ndarray, np.ndarray]:
+    """(p, e) with p + e == a * b exactly (Dekker), barring overflow."""
+    p = a * b
+    t = _SPLITTER * a
+    a_hi = t - (t - a)
+    a_lo = a - a_hi
+    t = _SPLITTER * b
+    b_hi = t - (t - b)
+    b_lo = b - b_hi
+    e = ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+    return p, e
+
+
+def round_like_python(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    ``round(v, ndigits)`` of every element, bit for bit.
+
+    Python rounds the exact binary value to the nearest ``ndigits``-decimal
+    (ties to even).  np.round multiplies by 10**ndigits first, which rounds,
+    and can land on the wrong side of a halfway point.  Here the candidates
+    c and c + 1 (in units of 10**-ndigits) are compared against the exact
+    midpoint, with an error-free product where the float midpoint is not
+    enough to decide.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** ndigits
+    c = np.floor(x * scale)
+    # The float nearest the midpoint (2c + 1) / (2 * scale) decides unless x equals it
+    mid = (2.0 * c + 1.0) / (2.0 * scale)
+    up = x > mid
+    tied = x == mid
+    if tied.any():
+        p, e = _two_product(x[tied], 2.0 * scale)
+        m = 2.0 * c[tied] + 1.0
+        d = (p - m) + e
+        even_up = (d == 0) & (np.fmod(c[tied], 2.0) != 0)
+        up[tied] = (d > 0) | even_up
+    out = np.copysign((c + up) / scale, x)
+    # Already integral at this precision (or not finite): round() returns x
+    return np.where(np.isfinite(x) & (np.abs(x) * scale < 2.0 ** 52), out, x)
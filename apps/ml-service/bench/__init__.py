@@ -0,0 +1,5 @@
+"""
+Benchmark suite for the ML service hot paths.
+
+Run from apps/ml-service:  python -m bench.run_bench --help
+"""
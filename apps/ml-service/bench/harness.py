@@ -0,0 +1,91 @@
+"""
+Timing, memory and baseline comparison for the benchmark suite.
+
+Latencies come from time.perf_counter_ns over ``iterations`` calls, after
+``warmup`` calls that are not recorded.  Peak memory is measured in a
+separate, shorter pass under tracemalloc, because tracing slows every
+allocation and would distort the latencies.
+"""
+
+import gc
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# Result fields checked against the baseline.  Peak memory is deterministic
+# enough to gate on; p99 is reported but too noisy to fail a run.
+COMPARED_FIELDS = ("p50_ms", "p95_ms", "peak_kib")
+
+
+def measure(fn: Callable[[int], object], iterations: int, warmup: int = 3) -> Dict[str, float]:
+    """Call ``fn(i)`` repeatedly; latency percentiles and throughput."""
+    for i in range(warmup):
+        fn(i)
+    samples = np.empty(iterations, dtype=np.int64)
+    gc.collect()
+    started = time.perf_counter_ns()
+    for i in range(iterations):
+        t0 = time.perf_counter_ns()
+        fn(warmup + i)
+        samples[i] = time.perf_counter_ns() - t0
+    elapsed = (time.perf_counter_ns() - started) / 1e9
+    ms = samples / 1e6
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "iterations": iterations,
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(ms.max()), 4),
+        "throughput_ops": round(iterations / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def peak_memory_kib(fn: Callable[[int], object], repeats: int = 3, offset: int = 0) -> float:
+    """Peak traced allocation (KiB) over ``repeats`` calls of ``fn``."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        for i in range(repeats):
+            fn(offset + i)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(max(0, peak - base) / 1024.0, 1)
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+    min_delta_ms: float,
+    min_delta_kib: float = 64.0,
+) -> List[str]:
+    """
+    One line per regressed field: larger than the baseline by more than
+    ``threshold`` (a fraction) *and* by more than the absolute floor, so
+    sub-millisecond jitter on fast operations cannot fail a run.  Benchmarks
+    missing from either side are skipped.
+    """
+    regressions = []
+    for name in sorted(results):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        new = results[name]
+        for field in COMPARED_FIELDS:
+            if field not in new or not old.get(field):
+                continue
+            floor = min_delta_kib if field.endswith("_kib") else min_delta_ms
+            delta = new[field] - old[field]
+            if delta > floor and new[field] > old[field] * (1.0 + threshold):
+                regressions.append(
+                    f"{name} {field}: {old[field]} -> {new[field]} "
+                    f"(+{100.0 * delta / old[field]:.0f}%)"
+                )
+    return regressions
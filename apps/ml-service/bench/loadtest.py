@@ -0,0 +1,430 @@
+"""
+HTTP load test for the ML service, end to end through main:app.
+
+Unlike bench/run_bench.py this goes through everything a real request pays:
+uvicorn, the auth and disclaimer middlewares, pydantic validation of
+BiometricData and serialisation of the response models.  It replays a
+Terra/Rook-style ingest stream, either synthetic or recorded, with a
+configurable mix of read endpoints.  It runs one load level per
+--concurrency value, so worker counts and pool sizes can be compared
+before a scale-up.
+
+Usage (from apps/ml-service):
+
+    # start main:app with 2 uvicorn workers, sweep three concurrency levels
+    python -m bench.loadtest --spawn --workers 2 --concurrency 8,32,128 --duration 30
+
+    # replay a recorded stream against an already running service
+    python -m bench.loadtest --url http://localhost:8000 --replay stream.ndjson \
+        --mix ingest=80,readiness=20
+
+A recorded stream is NDJSON, one reading per line, in the body shape the
+backend's webhook handlers post: ``{"user_id": ..., "data": {BiometricData}}``
+or the BiometricData fields with a ``user_id`` key alongside.  Timestamps are
+rewritten to the send time unless --keep-timestamps is given.
+
+Clients are closed-loop.  Each of the N threads keeps one keep-alive
+connection and sends its next request as soon as the last one answers.  The
+generator is plain Python: check its CPU use when pushing thousands of
+requests per second, and run several copies if it saturates.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import secrets
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bench.synthetic import reading
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUTH_HEADER = "x-ahava-service-key"
+
+ENDPOINTS = ("ingest", "batch", "analyze", "readiness", "summary", "baseline")
+DEFAULT_MIX = "ingest=60,readiness=15,summary=10,baseline=10,analyze=5"
+
+
+# ---------------------------------------------------------------------------
+# Readings: synthetic or replayed
+# ---------------------------------------------------------------------------
+class ReadingSource:
+    """Thread-safe, endless stream of (user_id, reading JSON) pairs."""
+
+    def __init__(self, users: List[str], recorded: Optional[List[Tuple[str, dict]]],
+                 keep_timestamps: bool, seed: int):
+        self.users = users
+        self.recorded = recorded
+        self.keep_timestamps = keep_timestamps
+        self._rng = np.random.default_rng(seed)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> Tuple[str, dict]:
+        with self._lock:
+            i = self._next
+            self._next += 1
+            if self.recorded is None:
+                data = reading(self._rng, datetime.now(timezone.utc)).model_dump(mode="json")
+                return self.users[i % len(self.users)], data
+        user_id, data = self.recorded[i % len(self.recorded)]
+        if not self.keep_timestamps:
+            data = dict(data, timestamp=datetime.now(timezone.utc).isoformat())
+        return user_id, data
+
+    def user(self) -> str:
+        return random.choice(self.users)
+
+
+def load_recording(path: str) -> List[Tuple[str, dict]]:
+    out = []
+    with open(path) as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            user_id = item.get("user_id")
+            data = item.get("data") or {k: v for k, v in item.items() if k != "user_id"}
+            if not user_id or not data:
+                raise SystemExit(f"{path}:{n}: expected user_id and a reading")
+            out.append((str(user_id), data))
+    if not out:
+        raise SystemExit(f"{path}: no readings")
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Requests
+# ---------------------------------------------------------------------------
+def build_request(endpoint: str, source: ReadingSource, batch_size: int) -> Tuple[str, str, Optional[dict]]:
+    """(method, path, JSON body) for one request to ``endpoint``."""
+    if endpoint == "ingest":
+        user_id, data = source.next()
+        return "POST", f"/ingest?user_id={urllib.parse.quote(user_id)}", data
+    if endpoint == "batch":
+        readings = [source.next() for _ in range(batch_size)]
+        return "POST", "/ingest/batch", {"readings": [{"user_id": u, "data": d} for u, d in readings]}
+    if endpoint == "analyze":
+        user_id, data = source.next()
+        return "POST", f"/early-warning/analyze?user_id={urllib.parse.quote(user_id)}", {"biometrics": data}
+    user_id = urllib.parse.quote(source.user(), safe="")
+    path = {
+        "readiness": f"/readiness-score/{user_id}",
+        "summary": f"/early-warning/summary/{user_id}",
+        "baseline": f"/early-warning/baseline/{user_id}",
+    }[endpoint]
+    return "GET", path, None
+
+
+class Client:
+    """One keep-alive connection; reconnects after any transport error."""
+
+    def __init__(self, url: str, secret: str, timeout: float):
+        parsed = urllib.parse.urlsplit(url)
+        self._cls = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        self._netloc = parsed.netloc
+        self._timeout = timeout
+        self._headers = {"Content-Type": "application/json"}
+        if secret:
+            self._headers[AUTH_HEADER] = secret
+        self._conn = None
+
+    def send(self, method: str, path: str, body: Optional[dict]) -> Tuple[int, bytes]:
+        if self._conn is None:
+            self._conn = self._cls(self._netloc, timeout=self._timeout)
+        try:
+            payload = json.dumps(body).encode() if body is not None else None
+            self._conn.request(method, path, body=payload, headers=self._headers)
+            resp = self._conn.getresponse()
+            return resp.status, resp.read()
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def run_level(args: argparse.Namespace, url: str, secret: str, source: ReadingSource,
+              mix: Dict[str, float], concurrency: int) -> dict:
+    names, weights = list(mix), list(mix.values())
+    deadline = time.monotonic() + args.duration
+    samples: Dict[str, List[float]] = defaultdict(list)
+    outcomes: Dict[str, Counter] = defaultdict(Counter)
+    lock = threading.Lock()
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        client = Client(url, secret, args.timeout)
+        local_samples: Dict[str, List[float]] = defaultdict(list)
+        local_outcomes: Dict[str, Counter] = defaultdict(Counter)
+        while time.monotonic() < deadline:
+            endpoint = rng.choices(names, weights)[0]
+            method, path, body = build_request(endpoint, source, args.batch_size)
+            started = time.perf_counter()
+            try:
+                status, _ = client.send(method, path, body)
+                outcome = str(status)
+            except Exception as e:
+                outcome = type(e).__name__
+            local_samples[endpoint].append((time.perf_counter() - started) * 1000.0)
+            local_outcomes[endpoint][outcome] += 1
+            if args.think_ms:
+                time.sleep(args.think_ms / 1000.0)
+        client.close()
+        with lock:
+            for k, v in local_samples.items():
+                samples[k].extend(v)
+            for k, v in local_outcomes.items():
+                outcomes[k].update(v)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(args.seed + i,), daemon=True)
+               for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    endpoints = {}
+    for name in sorted(samples):
+        endpoints[name] = summarise(samples[name], outcomes[name], elapsed)
+    everything = [ms for values in samples.values() for ms in values]
+    total = Counter()
+    for c in outcomes.values():
+        total.update(c)
+    return {
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 2),
+        "overall": summarise(everything, total, elapsed),
+        "endpoints": endpoints,
+        "server": fetch_pool_stats(url, secret, args.timeout),
+    }
+
+
+def summarise(latencies: List[float], outcomes: Counter, elapsed: float) -> dict:
+    requests = sum(outcomes.values())
+    # A 404 from /early-warning/summary just means the user has no data yet
+    errors = {k: v for k, v in outcomes.items() if not (k.isdigit() and int(k) < 400) and k != "404"}
+    out = {
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1) if elapsed > 0 else 0.0,
+        "error_rate": round(sum(errors.values()) / requests, 4) if requests else 0.0,
+        "outcomes": dict(sorted(outcomes.items())),
+    }
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        out.update(
+            p50_ms=round(float(p50), 2), p95_ms=round(float(p95), 2),
+            p99_ms=round(float(p99), 2), max_ms=round(float(max(latencies)), 2),
+        )
+    return out
+
+
+def fetch_pool_stats(url: str, secret: str, timeout: float) -> Optional[dict]:
+    """/health/db-pool after a level (from whichever worker answers)."""
+    client = Client(url, secret, timeout)
+    try:
+        status, body = client.send("GET", "/health/db-pool", None)
+        return json.loads(body) if status == 200 else None
+    except Exception:
+        return None
+    finally:
+        client.close()
+
+
+# ---------------------------------------------------------------------------
+# Setup
+# ---------------------------------------------------------------------------
+def seed_history(url: str, secret: str, users: List[str], readings: int, seed: int, timeout: float) -> None:
+    """Give every user ``readings`` past readings so read endpoints do real work."""
+    rng = np.random.default_rng(seed)
+    client = Client(url, secret, timeout)
+    now = datetime.now(timezone.utc)
+    step = timedelta(days=21) / max(1, readings)
+    try:
+        batch = []
+        for user_id in users:
+            for i in range(readings):
+                ts = now - timedelta(minutes=5) - step * (readings - 1 - i)
+                batch.append({"user_id": user_id, "data": reading(rng, ts).model_dump(mode="json")})
+                if len(batch) >= 500:
+                    _post_seed(client, batch)
+                    batch = []
+        if batch:
+            _post_seed(client, batch)
+    finally:
+        client.close()
+
+
+def _post_seed(client: Client, batch: List[dict]) -> None:
+    status, body = client.send("POST", "/ingest/batch", {"readings": batch})
+    if status != 200:
+        raise SystemExit(f"seeding failed: HTTP {status}: {body[:300]!r}")
+
+
+def spawn_service(port: int, workers: int, secret: str, timeout: float = 60.0) -> subprocess.Popen:
+    env = dict(os.environ, ML_SERVICE_SHARED_SECRET=secret)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=SERVICE_DIR, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"main:app exited with {proc.returncode} during startup")
+        try:
+            client = Client(url, "", 2.0)
+            status, _ = client.send("GET", "/health/ready", None)
+            client.close()
+            if status == 200:
+                return proc
+        except Exception:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit(f"main:app did not answer on {url} within {timeout:.0f}s")
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r} (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("mix needs at least one positive weight")
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m bench.loadtest", description=__doc__.split("\n\n")[0])
+    target = p.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="an already running service")
+    target.add_argument("--spawn", action="store_true", help="start main:app with uvicorn")
+    p.add_argument("--workers", type=int, default=1, help="uvicorn workers with --spawn")
+    p.add_argument("--port", type=int, default=8765, help="port with --spawn")
+    p.add_argument("--secret", default=os.getenv("ML_SERVICE_SHARED_SECRET", ""),
+                   help="service key (default ML_SERVICE_SHARED_SECRET; random with --spawn)")
+    p.add_argument("--concurrency", default="8,32",
+                   type=lambda v: [int(c) for c in v.split(",") if c.strip()],
+                   help="comma-separated client counts, one load level each")
+    p.add_argument("--duration", type=float, default=20.0, help="seconds per level")
+    p.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                   help=f"endpoint weights (default {DEFAULT_MIX})")
+    p.add_argument("--users", type=int, default=200, help="synthetic user count")
+    p.add_argument("--replay", help="NDJSON recording to replay instead of synthetic readings")
+    p.add_argument("--keep-timestamps", action="store_true", help="send recorded timestamps as-is")
+    p.add_argument("--seed-history", type=int, default=30,
+                   help="past readings per synthetic user before the run (0 to skip)")
+    p.add_argument("--batch-size", type=int, default=50, help="readings per /ingest/batch call")
+    p.add_argument("--think-ms", type=float, default=0.0, help="pause between a client's requests")
+    p.add_argument("--timeout", type=float, default=30.0, help="per-request timeout (s)")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", help="write the report JSON here")
+    p.add_argument("--p95-ms", type=float, help="exit 1 if any level's overall p95 exceeds this")
+    p.add_argument("--max-error-rate", type=float, help="exit 1 if any level's error rate exceeds this")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    random.seed(args.seed)
+    proc = None
+    secret = args.secret
+    if args.spawn:
+        secret = secret or secrets.token_hex(16)
+        proc = spawn_service(args.port, args.workers, secret)
+        url = f"http://127.0.0.1:{args.port}"
+    else:
+        url = args.url.rstrip("/")
+
+    try:
+        run_id = secrets.token_hex(4)
+        if args.replay:
+            recorded = load_recording(args.replay)
+            users = sorted({u for u, _ in recorded})
+        else:
+            recorded = None
+            users = [f"load-{run_id}-{i}" for i in range(args.users)]
+            if args.seed_history > 0:
+                print(f"[loadtest] Seeding {len(users)} users x {args.seed_history} readings",
+                      file=sys.stderr)
+                seed_history(url, secret, users, args.seed_history, args.seed, args.timeout)
+        source = ReadingSource(users, recorded, args.keep_timestamps, args.seed)
+
+        levels = []
+        for concurrency in args.concurrency:
+            level = run_level(args, url, secret, source, args.mix, concurrency)
+            levels.append(level)
+            o = level["overall"]
+            print(
+                f"[loadtest] c={concurrency}: {o['requests']} req, {o['throughput_rps']} req/s, "
+                f"p50={o.get('p50_ms')}ms p95={o.get('p95_ms')}ms p99={o.get('p99_ms')}ms "
+                f"errors={o['error_rate']:.2%}",
+                file=sys.stderr,
+            )
+            for name, e in level["endpoints"].items():
+                print(
+                    f"           {name:<10} {e['requests']:>7} p50={e.get('p50_ms')} "
+                    f"p95={e.get('p95_ms')} p99={e.get('p99_ms')} {e['outcomes']}",
+                    file=sys.stderr,
+                )
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "url": url if not args.spawn else f"spawned main:app, {args.workers} worker(s)",
+            "mix": args.mix,
+            "users": len(users),
+            "replay": args.replay,
+            "duration_seconds": args.duration,
+            "env": {k: v for k, v in sorted(os.environ.items()) if k.startswith("ML_") and "SECRET" not in k},
+        },
+        "levels": levels,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = False
+    for level in levels:
+        o = level["overall"]
+        if args.p95_ms is not None and o.get("p95_ms", 0) > args.p95_ms:
+            print(f"[loadtest] c={level['concurrency']}: p95 {o['p95_ms']}ms > {args.p95_ms}ms",
+                  file=sys.stderr)
+            failed = True
+        if args.max_error_rate is not None and o["error_rate"] > args.max_error_rate:
+            print(f"[loadtest] c={level['concurrency']}: error rate {o['error_rate']:.2%} > "
+                  f"{args.max_error_rate:.2%}", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Storage calls per request for the main routes, checked against a budget.
+
+Usage (from apps/ml-service):
+
+    python -m bench.query_budget                          # in-memory store
+    DATABASE_URL=postgresql://... python -m bench.query_budget --out budget.json
+
+Each route is called through the ASGI app in this process, inside
+``db.count_queries()``, so every storage call it makes is counted: sync
+(db.py) and async (db_async.py), including those made from worker threads.
+The user has a seeded history and a risk profile.  Every route is called
+twice in a row: ``cold`` is the first call after seeding, and ``warm``
+repeats it once caches hold the user.  Write-behind flushes run on their
+own thread and are not part of any request.
+
+The budget is the most storage calls a request may make, whatever the
+ML_* cache and store settings.  The run exits 1 if any call goes over it.
+Requests carry ML_SERVICE_SHARED_SECRET; without one, the tool sets a
+random secret for this process, so the default ML_SERVICE_REQUIRE_AUTH=true
+works.  Postgres runs expect a schema the service has already created (the
+tool does not run ensure_schema), write under user id ``budget-<run id>``
+and delete those rows when done.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from bench.synthetic import reading, user_rows
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# route -> most storage calls one request may make.  The worst case is
+# ML_BASELINE_SOURCE=rollup with the context cache off: rollups, recent
+# readings and the profile are each one call.
+BUDGET: Dict[str, int] = {
+    "POST /ingest": 4,                           # history (2), profile, write
+    "POST /early-warning/analyze": 5,            # history (2), profile, write, summary
+    "GET /readiness-score/{user_id}": 4,         # history (2), profile, latest
+    "GET /early-warning/summary/{user_id}": 6,   # latest, profile, summary; stale: history (2), save
+    "GET /early-warning/baseline/{user_id}": 2,  # history (2)
+}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m bench.query_budget", description=__doc__.split("\n\n")[0])
+    p.add_argument("--readings", type=int, default=500, help="seeded readings for the user")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", help="write per-route counts JSON here")
+    return p.parse_args(argv)
+
+
+async def _call(app, method: str, path: str, body: Optional[dict] = None) -> int:
+    """One request through the ASGI app in the current task; returns the status."""
+    path, _, query = path.partition("?")
+    payload = orjson.dumps(body) if body is not None else b""
+    headers = [(b"content-type", b"application/json")]
+    secret = os.getenv("ML_SERVICE_SHARED_SECRET")
+    if secret:
+        headers.append((b"x-ahava-service-key", secret.encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "root_path": "", "headers": headers,
+        "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 80),
+    }
+    sent = False
+    status = 0
+
+    async def receive() -> dict:
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def _requests(user_id: str, rng: np.random.Generator) -> List[Tuple[str, str, str, Optional[dict]]]:
+    """
+    (budget key, method, path, body) in call order.  The summary is read
+    right after an ingest, so it is stale and takes the recompute path.
+    """
+    now = datetime.now(timezone.utc)
+
+    def fresh(offset_ms: int) -> dict:
+        data = reading(rng, now + timedelta(milliseconds=offset_ms))
+        return data.model_dump(mode="json")
+
+    return [
+        ("POST /ingest", "POST", f"/ingest?user_id={user_id}", fresh(1)),
+        ("GET /early-warning/summary/{user_id}", "GET", f"/early-warning/summary/{user_id}", None),
+        ("POST /early-warning/analyze", "POST", f"/early-warning/analyze?user_id={user_id}",
+         {"biometrics": fresh(2)}),
+        ("GET /readiness-score/{user_id}", "GET", f"/readiness-score/{user_id}", None),
+        ("GET /early-warning/baseline/{user_id}", "GET", f"/early-warning/baseline/{user_id}", None),
+    ]
+
+
+async def run(args: argparse.Namespace) -> dict:
+    # main reads the secret at import; _call sends it
+    if not os.getenv("ML_SERVICE_SHARED_SECRET", "").strip():
+        os.environ["ML_SERVICE_SHARED_SECRET"] = uuid.uuid4().hex
+    import db
+    import main
+
+    # The startup check that lets a cache-on worker use its history cache
+    db.check_notify_trigger()
+    user_id = f"budget-{uuid.uuid4().hex[:8]}"
+    db.save_biometrics(list(user_rows([user_id], args.readings, args.seed)))
+    status = await _call(main.app, "PUT", f"/early-warning/context/{user_id}",
+                         {"age": 54, "smoker": False, "hypertension": True})
+    if status != 200:
+        raise SystemExit(f"PUT /early-warning/context answered {status}")
+    buffer = db.write_behind()
+    if buffer is not None:
+        buffer.flush()
+
+    rng = np.random.default_rng(args.seed + 1)
+    routes: Dict[str, dict] = {}
+    try:
+        for phase, offset in (("cold", 0), ("warm", 1000)):
+            for key, method, path, body in _requests(user_id, rng):
+                if body is not None:
+                    # Later phases send later readings, so timestamps stay unique
+                    reading_ = body.get("biometrics", body)
+                    ts = datetime.fromisoformat(reading_["timestamp"]) + timedelta(milliseconds=offset)
+                    reading_["timestamp"] = ts.isoformat()
+                with db.count_queries() as counter:
+                    status = await _call(main.app, method, path, body)
+                if status != 200:
+                    raise SystemExit(f"{key} answered {status}")
+                routes.setdefault(key, {"budget": BUDGET[key]})[phase] = {
+                    "total": counter.total, "by_name": dict(sorted(counter.by_name.items())),
+                }
+    finally:
+        buffer = db.write_behind()
+        if buffer is not None:
+            buffer.flush()
+        if db._use_db:
+            conn = db._get_conn()
+            try:
+                with conn.cursor() as cur:
+                    for table in ("biometric_time_series", "early_warning_summaries"):
+                        cur.execute(f"DELETE FROM {table} WHERE user_id = %s", (user_id,))
+                conn.commit()
+            finally:
+                db._put_conn(conn)
+        else:
+            db._memory_store.discard(user_id)
+    return {
+        "store": "postgres" if db._use_db else "memory",
+        "env": {k: v for k, v in sorted(os.environ.items())
+                if k.startswith("ML_") and k != "ML_SERVICE_SHARED_SECRET"},
+        "routes": routes,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    over = []
+    print(f"{'route':<40}{'cold':>6}{'warm':>6}{'budget':>8}  ({report['store']})")
+    for key, r in report["routes"].items():
+        print(f"{key:<40}{r['cold']['total']:>6}{r['warm']['total']:>6}{r['budget']:>8}")
+        for phase in ("cold", "warm"):
+            if r[phase]["total"] > r["budget"]:
+                over.append(f"{key} ({phase}): {r[phase]['total']} > {r['budget']} {r[phase]['by_name']}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if over:
+        print(f"[bench] {len(over)} route(s) over the query budget:", file=sys.stderr)
+        for line in over:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+    print("[bench] Every route within its query budget", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
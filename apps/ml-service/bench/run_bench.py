@@ -0,0 +1,307 @@
+"""
+Benchmark the Early Warning engine's hot paths against the in-memory store
+and/or a local Postgres.
+
+Usage (from apps/ml-service):
+
+    python -m bench.run_bench --store memory --out bench-results.json
+    DATABASE_URL=postgresql://... python -m bench.run_bench --store memory,postgres \
+        --baseline bench/baseline.json
+
+Each scenario seeds synthetic users (bench/synthetic.py), then times
+EarlyWarningEngine._evaluate (with its per-request history load),
+full_analysis, get_readiness_score, get_baseline_info and ingest.  ingest
+runs last because it grows the history.  Backfill scenarios seed nothing
+and time one operation, ``backfill``: a new user's whole history, spread
+over weeks and oldest first, sent through ingest_batch in chunks as a
+device sync would.  Results (latency percentiles,
+throughput, peak traced memory) are written as JSON and keyed
+``<store>/<scenario>/<operation>``.
+
+With --baseline, the run exits 1 if any benchmark regressed by more than
+--threshold against the stored results.  --update-baseline overwrites the
+baseline with this run instead.  Baselines are only comparable on the same
+machine and the same ML_* settings (recorded under ``meta.env``).
+
+The store is fixed when db.py is imported, so each store runs in its own
+child process.  Postgres runs write to the configured database under user
+ids ``bench-<run id>-...`` and delete those rows when done.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from bench.harness import compare, measure, peak_memory_kib
+from bench.synthetic import history, reading, user_rows
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (users, readings per user, timed iterations per operation)
+SCENARIOS: Dict[str, tuple] = {
+    "tiny": (1, 10, 200),
+    "1k": (1, 1_000, 100),
+    "50k": (1, 50_000, 15),
+    "many-users": (1_000, 30, 500),
+    "backfill": (1, 2_000, 5),
+}
+# Backfill scenario -> days its history spans (past the engine's load window)
+BACKFILL_SPAN_DAYS: Dict[str, float] = {"backfill": 60.0}
+OPERATIONS = ("evaluate", "full_analysis", "readiness_score", "baseline_info", "ingest", "backfill")
+STORES = ("memory", "postgres")
+
+_SEED_CHUNK_ROWS = 5_000
+_BACKFILL_CHUNK_ROWS = 500
+
+
+def _csv(value: str, allowed) -> List[str]:
+    items = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [v for v in items if v not in allowed]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown: {', '.join(unknown)} (choose from {', '.join(allowed)})")
+    return items
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m bench.run_bench", description=__doc__.split("\n\n")[0])
+    p.add_argument("--store", default="memory", type=lambda v: _csv(v, STORES),
+                   help="comma-separated: memory,postgres (postgres needs DATABASE_URL)")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS), type=lambda v: _csv(v, SCENARIOS))
+    p.add_argument("--operations", default=",".join(OPERATIONS), type=lambda v: _csv(v, OPERATIONS))
+    p.add_argument("--quick", action="store_true", help="a fifth of the iterations (smoke runs)")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", help="write results JSON here")
+    p.add_argument("--baseline", help="compare against this results JSON")
+    p.add_argument("--update-baseline", action="store_true",
+                   help="write this run to --baseline instead of comparing")
+    p.add_argument("--threshold", type=float, default=0.25,
+                   help="allowed slowdown as a fraction of the baseline (default 0.25)")
+    p.add_argument("--min-delta-ms", type=float, default=0.2,
+                   help="ignore latency regressions smaller than this (default 0.2ms)")
+    return p.parse_args(argv)
+
+
+def _meta() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_DIR,
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "env": {k: v for k, v in sorted(os.environ.items()) if k.startswith("ML_")},
+    }
+
+
+# ---------------------------------------------------------------------------
+# One store, in this process
+# ---------------------------------------------------------------------------
+def _seed(db, user_ids: List[str], readings: int, seed: int) -> float:
+    started = time.perf_counter()
+    chunk = []
+    for row in user_rows(user_ids, readings, seed):
+        chunk.append(row)
+        if len(chunk) >= _SEED_CHUNK_ROWS:
+            db.save_biometrics(chunk)
+            chunk = []
+    if chunk:
+        db.save_biometrics(chunk)
+    buffer = db.write_behind()
+    if buffer is not None:
+        buffer.flush()
+    return time.perf_counter() - started
+
+
+def _cleanup(db, prefix: str) -> None:
+    if not db._use_db:
+        for user_id in db._memory_store.users():
+            if user_id.startswith(prefix):
+                db._memory_store.discard(user_id)
+        return
+    conn = db._get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM biometric_time_series WHERE user_id LIKE %s", (prefix + "%",))
+        conn.commit()
+        try:
+            # Plain-Postgres rollup table; a continuous aggregate refreshes itself
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM biometric_daily_rollup WHERE user_id LIKE %s", (prefix + "%",))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+    finally:
+        db._put_conn(conn)
+
+
+def _operations(engine, user_ids: List[str], rng: np.random.Generator) -> Dict[str, Callable[[int], object]]:
+    now = datetime.now(timezone.utc)
+    probes = [reading(rng, now) for _ in range(64)]
+    users = len(user_ids)
+
+    def user(i: int) -> str:
+        return user_ids[i % users]
+
+    def fresh(i: int):
+        # Unique, increasing timestamps so ingested rows never collide
+        return probes[i % len(probes)].model_copy(update={"timestamp": now + timedelta(milliseconds=i + 1)})
+
+    return {
+        "evaluate": lambda i: engine._evaluate(engine.analysis_context(user(i)), probes[i % len(probes)]),
+        "full_analysis": lambda i: engine.full_analysis(user(i), probes[i % len(probes)]),
+        "readiness_score": lambda i: engine.get_readiness_score(user(i)),
+        "baseline_info": lambda i: engine.get_baseline_info(user(i)),
+        "ingest": lambda i: engine.ingest(user(i), fresh(i)),
+    }
+
+
+def _backfill(engine, prefix: str, readings: int, span_days: float,
+              rng: np.random.Generator) -> Dict[str, Callable[[int], object]]:
+    batch = history(rng, readings, span_days)
+
+    def run(i: int) -> None:
+        user_id = f"{prefix}backfill-{i}"
+        for lo in range(0, len(batch), _BACKFILL_CHUNK_ROWS):
+            engine.ingest_batch([(user_id, data) for data in batch[lo:lo + _BACKFILL_CHUNK_ROWS]])
+
+    return {"backfill": run}
+
+
+def run_store(store: str, args: argparse.Namespace) -> dict:
+    """Run every selected scenario against ``store`` in this process."""
+    if store == "memory":
+        os.environ.pop("DATABASE_URL", None)
+    elif not os.getenv("DATABASE_URL"):
+        raise SystemExit("--store postgres needs DATABASE_URL")
+
+    import db
+    from engine import EarlyWarningEngine
+
+    run_id = uuid.uuid4().hex[:8]
+    results: Dict[str, dict] = {}
+    seeding: Dict[str, dict] = {}
+    for scenario in args.scenarios:
+        users, readings, iterations = SCENARIOS[scenario]
+        if args.quick:
+            iterations = max(5, iterations // 5)
+        prefix = f"bench-{run_id}-{scenario}-"
+        user_ids = [f"{prefix}{i}" for i in range(users)]
+        backfill = scenario in BACKFILL_SPAN_DAYS
+        if not backfill:
+            print(f"[bench] {store}/{scenario}: seeding {users} x {readings} readings", file=sys.stderr)
+            seconds = _seed(db, user_ids, readings, args.seed)
+            seeding[scenario] = {
+                "users": users, "readings_per_user": readings,
+                "seconds": round(seconds, 3),
+                "rows_per_second": round(users * readings / seconds, 1) if seconds > 0 else 0.0,
+            }
+        try:
+            engine = EarlyWarningEngine()
+            rng = np.random.default_rng(args.seed + 1)
+            if backfill:
+                ops = _backfill(engine, prefix, readings, BACKFILL_SPAN_DAYS[scenario], rng)
+            else:
+                ops = _operations(engine, user_ids, rng)
+            for name in (op for op in OPERATIONS if op in args.operations and op in ops):
+                result = measure(ops[name], iterations)
+                # Continue the call index so ingest keeps unique timestamps
+                result["peak_kib"] = peak_memory_kib(ops[name], offset=iterations + 3)
+                key = f"{store}/{scenario}/{name}"
+                results[key] = result
+                print(
+                    f"[bench] {key}: p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+                    f"p99={result['p99_ms']}ms {result['throughput_ops']}/s peak={result['peak_kib']}KiB",
+                    file=sys.stderr,
+                )
+        finally:
+            buffer = db.write_behind()
+            if buffer is not None:
+                buffer.flush()
+            _cleanup(db, prefix)
+    return {"meta": dict(_meta(), seeding={store: seeding}), "results": results}
+
+
+# ---------------------------------------------------------------------------
+# Several stores: one child process each
+# ---------------------------------------------------------------------------
+def _run_children(args: argparse.Namespace) -> dict:
+    merged: dict = {"meta": None, "results": {}}
+    for store in args.store:
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "results.json")
+            cmd = [
+                sys.executable, "-m", "bench.run_bench", "--store", store,
+                "--scenarios", ",".join(args.scenarios),
+                "--operations", ",".join(args.operations),
+                "--seed", str(args.seed), "--out", out,
+            ] + (["--quick"] if args.quick else [])
+            if subprocess.run(cmd, cwd=SERVICE_DIR).returncode != 0:
+                raise SystemExit(f"[bench] {store} run failed")
+            with open(out) as f:
+                child = json.load(f)
+        if merged["meta"] is None:
+            merged["meta"] = child["meta"]
+        else:
+            merged["meta"]["seeding"].update(child["meta"]["seeding"])
+        merged["results"].update(child["results"])
+    return merged
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.update_baseline and not args.baseline:
+        raise SystemExit("--update-baseline needs --baseline PATH")
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(SERVICE_DIR, ".env"))
+    except ImportError:
+        pass
+    if "postgres" in args.store and not os.getenv("DATABASE_URL"):
+        raise SystemExit("--store postgres needs DATABASE_URL")
+
+    report = run_store(args.store[0], args) if len(args.store) == 1 else _run_children(args)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"[bench] Baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report["results"], baseline.get("results", {}),
+                          args.threshold, args.min_delta_ms)
+    if regressions:
+        print(f"[bench] {len(regressions)} regression(s) against {args.baseline}:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+    print(f"[bench] No regressions against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Serialisation share of request latency for the EarlyWarningSummary routes.
+
+Usage (from apps/ml-service):
+
+    python -m bench.serialization --out serialization.json
+
+Seeds one synthetic user in the in-memory store and builds a real
+EarlyWarningSummary with full_analysis.  It then times the same request
+through several response paths of a throwaway FastAPI app, called in-process
+over ASGI (no sockets, so serialisation is not hidden behind network time):
+
+    empty              Response(b"{}"): routing and ASGI floor
+    response_model     returns the model; FastAPI validates and encodes it
+    model_response     fast_json.model_response: serialised once
+    stored_revalidate  stored summary dict -> model_validate -> response_model
+                       (how a cached summary was served before)
+    stored_raw         stored JSON text sent as is (fast_json.raw_response)
+
+``serialisation_ms`` is a path's p50 minus the ``empty`` p50.  ``share`` is
+that as a fraction of the path's p50.  The real GET
+/early-warning/summary/{user_id} through main.app, with its middlewares and
+the materialised summary, is timed as ``summary_route`` for scale.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from bench.harness import measure
+from bench.synthetic import reading, user_rows
+
+USER_ID = "bench-serialization"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m bench.serialization", description=__doc__.split("\n\n")[0])
+    p.add_argument("--readings", type=int, default=1_000, help="history size of the seeded user")
+    p.add_argument("--iterations", type=int, default=2_000)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", help="write results JSON here")
+    return p.parse_args(argv)
+
+
+def _asgi_get(app, path: str) -> Callable[[int], bytes]:
+    """``fn(i)`` that sends one GET through ``app`` in-process and returns the body."""
+    loop = asyncio.new_event_loop()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [],
+        "server": ("bench", 80), "client": ("bench", 50000),
+    }
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def call() -> bytes:
+        chunks = []
+
+        async def send(message: dict) -> None:
+            if message["type"] == "http.response.start" and message["status"] != 200:
+                raise RuntimeError(f"GET {path} returned {message['status']}")
+            if message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await app(dict(scope), receive, send)
+        return b"".join(chunks)
+
+    return lambda i: loop.run_until_complete(call())
+
+
+def _paths_app(summary, stored: dict, stored_json: str):
+    from fastapi import FastAPI
+    from fastapi.responses import Response
+
+    import fast_json
+    from models import EarlyWarningSummary
+
+    app = FastAPI()
+
+    @app.get("/empty")
+    async def empty():
+        return Response(b"{}", media_type="application/json")
+
+    @app.get("/response_model", response_model=EarlyWarningSummary)
+    async def response_model():
+        return summary
+
+    @app.get("/model_response", response_model=EarlyWarningSummary)
+    async def model_response():
+        return fast_json.model_response(summary)
+
+    @app.get("/stored_revalidate", response_model=EarlyWarningSummary)
+    async def stored_revalidate():
+        return EarlyWarningSummary.model_validate(stored)
+
+    @app.get("/stored_raw", response_model=EarlyWarningSummary)
+    async def stored_raw():
+        return fast_json.raw_response(stored_json)
+
+    return app
+
+
+def run(args: argparse.Namespace) -> dict:
+    os.environ.pop("DATABASE_URL", None)
+    os.environ["ML_SERVICE_REQUIRE_AUTH"] = "false"
+    import db
+    import main
+
+    rng = np.random.default_rng(args.seed)
+    db.save_biometrics(list(user_rows([USER_ID], args.readings, args.seed)))
+    latest = db.load_latest_biometric(USER_ID)
+    summary = main.engine.full_analysis(USER_ID, reading(rng, latest["timestamp"]))
+    stored_json = summary.model_dump_json()
+
+    app = _paths_app(summary, json.loads(stored_json), stored_json)
+    paths = ["empty", "response_model", "model_response", "stored_revalidate", "stored_raw"]
+    results: Dict[str, dict] = {}
+    for path in paths:
+        results[path] = measure(_asgi_get(app, f"/{path}"), args.iterations, warmup=50)
+    # First call computes and stores the summary; later calls are served from it
+    results["summary_route"] = measure(
+        _asgi_get(main.app, f"/early-warning/summary/{USER_ID}"), args.iterations, warmup=50,
+    )
+
+    floor = results["empty"]["p50_ms"]
+    for path in paths[1:]:
+        r = results[path]
+        r["serialisation_ms"] = round(max(0.0, r["p50_ms"] - floor), 4)
+        r["share"] = round(r["serialisation_ms"] / r["p50_ms"], 3) if r["p50_ms"] else 0.0
+    return {"summary_bytes": len(stored_json), "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+    print(f"EarlyWarningSummary: {report['summary_bytes']} bytes")
+    print(f"{'path':<20}{'p50 ms':>10}{'p95 ms':>10}{'serialise ms':>14}{'share':>8}")
+    for path, r in report["results"].items():
+        share = f"{r['share']:.0%}" if "share" in r else ""
+        ser = f"{r['serialisation_ms']:.4f}" if "serialisation_ms" in r else ""
+        print(f"{path:<20}{r['p50_ms']:>10.4f}{r['p95_ms']:>10.4f}{ser:>14}{share:>8}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Cold-start time of the service: process spawn to first answer and to ready.
+
+Usage (from apps/ml-service):
+
+    python -m bench.startup --runs 5 --out startup.json
+    DATABASE_URL=postgresql://... python -m bench.startup   # include schema + pool warm-up
+
+Each run starts a fresh ``uvicorn main:app`` on a free port and polls it
+every few milliseconds.  It records:
+
+    import_ms   ``import main`` alone, in a separate fresh interpreter
+    live_ms     spawn -> first 200 from GET /health/live (port bound)
+    ready_ms    spawn -> first 200 from GET /health/ready (warm-up done)
+
+The service sees the caller's environment.  Without DATABASE_URL it runs
+in memory mode, so ready_ms is close to live_ms.  Results are per-run
+values plus their median.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m bench.startup", description=__doc__.split("\n\n")[0])
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for ready per run")
+    p.add_argument("--out", help="write results JSON here")
+    return p.parse_args(argv)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _status(port: int, path: str) -> Optional[int]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1.0)
+    try:
+        conn.request("GET", path)
+        return conn.getresponse().status
+    except OSError:
+        return None
+    finally:
+        conn.close()
+
+
+def import_ms() -> float:
+    code = "import time; t = time.perf_counter(); import main; print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=SERVICE_DIR, check=True, capture_output=True, text=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def run_once(timeout: float) -> Dict[str, float]:
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=SERVICE_DIR, stdout=subprocess.DEVNULL,
+    )
+    result: Dict[str, float] = {}
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise SystemExit(f"main:app exited with {proc.returncode} during startup")
+            if "live_ms" not in result and _status(port, "/health/live") == 200:
+                result["live_ms"] = (time.perf_counter() - started) * 1000
+            if "live_ms" in result and _status(port, "/health/ready") == 200:
+                result["ready_ms"] = (time.perf_counter() - started) * 1000
+                return result
+            time.sleep(0.005)
+        raise SystemExit(f"main:app was not ready within {timeout:.0f}s")
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def run(args: argparse.Namespace) -> dict:
+    runs = []
+    for _ in range(args.runs):
+        r = run_once(args.timeout)
+        r["import_ms"] = import_ms()
+        runs.append({k: round(v, 1) for k, v in r.items()})
+    median = {
+        key: round(float(np.median([r[key] for r in runs])), 1)
+        for key in ("import_ms", "live_ms", "ready_ms")
+    }
+    return {"database": bool(os.getenv("DATABASE_URL")), "runs": runs, "median": median}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+    print(f"{'run':<8}{'import ms':>12}{'live ms':>12}{'ready ms':>12}")
+    for i, r in enumerate(report["runs"], 1):
+        print(f"{i:<8}{r['import_ms']:>12.1f}{r['live_ms']:>12.1f}{r['ready_ms']:>12.1f}")
+    m = report["median"]
+    print(f"{'median':<8}{m['import_ms']:>12.1f}{m['live_ms']:>12.1f}{m['ready_ms']:>12.1f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Synthetic wearable histories for the benchmark suite.
+
+Readings are drawn from a seeded generator around plausible adult resting
+values, so every run benchmarks the same data.  A history is spread evenly
+over the last ``span_days`` days and ends shortly before "now".  All of it
+falls inside the engine's 30-day baseline-info window.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from models import BiometricData
+
+
+def _clip(value: float, lo: float, hi: float) -> float:
+    return float(min(hi, max(lo, value)))
+
+
+def reading(rng: np.random.Generator, timestamp: datetime) -> BiometricData:
+    """One plausible reading; occasional outliers exercise the anomaly paths."""
+    outlier = rng.random() < 0.02
+    return BiometricData(
+        timestamp=timestamp,
+        heart_rate_resting=_clip(rng.normal(88 if outlier else 64, 5), 35, 190),
+        hrv_rmssd=_clip(rng.normal(22 if outlier else 46, 9), 1, 250),
+        spo2=_clip(rng.normal(93 if outlier else 97.6, 0.8), 80, 100),
+        skin_temp_offset=_clip(rng.normal(0.0, 0.3), -4.5, 4.5),
+        respiratory_rate=_clip(rng.normal(14, 1.5), 6, 40),
+        step_count=int(rng.lognormal(6.5, 1.0)),
+        active_calories=_clip(rng.lognormal(4.0, 0.8), 0, 5000),
+        sleep_duration_hours=_clip(rng.normal(7.0, 1.0), 0, 14),
+    )
+
+
+def history(
+    rng: np.random.Generator,
+    readings: int,
+    span_days: float = 21.0,
+    now: Optional[datetime] = None,
+) -> List[BiometricData]:
+    """``readings`` readings spaced evenly over the last ``span_days`` days."""
+    now = now or datetime.now(timezone.utc)
+    end = now - timedelta(minutes=1)
+    step = timedelta(days=span_days) / max(1, readings)
+    start = end - step * (readings - 1)
+    return [reading(rng, start + step * i) for i in range(readings)]
+
+
+def user_rows(
+    user_ids: List[str],
+    readings: int,
+    seed: int,
+    span_days: float = 21.0,
+) -> Iterator[Tuple[str, BiometricData, str, list]]:
+    """db.save_biometrics rows for every user, one user at a time."""
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    for user_id in user_ids:
+        for data in history(rng, readings, span_days, now):
+            yield user_id, data, "GREEN", []
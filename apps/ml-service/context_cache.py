@@ -0,0 +1,136 @@
+"""
+In-process cache of users' CVD risk profiles (users."riskProfile").
+
+Profiles change rarely but were read on nearly every request.  Entries live
+for ML_CONTEXT_CACHE_TTL_SECONDS.  Users with no profile are cached too
+(negative caching), for the shorter ML_CONTEXT_CACHE_NEGATIVE_TTL_SECONDS,
+so a profile created elsewhere shows up quickly even if a notification is
+missed.
+
+Invalidation mirrors history_cache.py.  save_context writes through.  A
+trigger on users sends NOTIFY ml_risk_profile when the Node backend (or
+another worker) changes "riskProfile".  In database mode the cache is only
+consulted while the listener is connected.  As there, every write stamps
+its user with the next value of a cache-wide clock, and a fill only lands if
+its user was not stamped since it took the clock, so a slow load never
+overwrites a newer write and writes for other users do not cost it the fill.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from models import ContextualProfile
+
+
+class ContextCache:
+    """Bounded LRU map of user_id -> Optional[ContextualProfile] with TTLs."""
+
+    def __init__(self, ttl_seconds: float = 300.0, negative_ttl_seconds: float = 60.0,
+                 max_users: int = 50_000, max_stamps: int = 100_000):
+        self.ttl = ttl_seconds
+        self.negative_ttl = negative_ttl_seconds
+        self.max_users = max(1, max_users)
+        # user_id -> (profile or None, expires_at)
+        self._entries: "OrderedDict[str, Tuple[Optional[ContextualProfile], float]]" = OrderedDict()
+        # user_id -> clock at its last change, oldest first; the floor covers
+        # users whose stamp was forgotten and invalidate(None)
+        self._clock = 0
+        self._changed: "OrderedDict[str, int]" = OrderedDict()
+        self._floor = 0
+        self.max_stamps = max(1, max_stamps)
+        self._lock = threading.Lock()
+        # Counters
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "ContextCache":
+        return cls(
+            ttl_seconds=float(os.getenv("ML_CONTEXT_CACHE_TTL_SECONDS", "300") or 300),
+            negative_ttl_seconds=float(
+                os.getenv("ML_CONTEXT_CACHE_NEGATIVE_TTL_SECONDS", "60") or 60
+            ),
+            max_users=int(os.getenv("ML_CONTEXT_CACHE_MAX_USERS", "50000") or 50000),
+        )
+
+    def generation(self) -> int:
+        """Token to pass to store() after a database read."""
+        with self._lock:
+            return self._clock
+
+    def _touch(self, user_id: str) -> None:
+        self._clock += 1
+        self._changed[user_id] = self._clock
+        self._changed.move_to_end(user_id)
+        if len(self._changed) > self.max_stamps:
+            _, stamp = self._changed.popitem(last=False)
+            self._floor = max(self._floor, stamp)
+
+    def _unchanged_since(self, user_id: str, generation: int) -> bool:
+        return max(self._floor, self._changed.get(user_id, 0)) <= generation
+
+    def get(self, user_id: str) -> Tuple[bool, Optional[ContextualProfile]]:
+        """(hit, profile).  A hit with None means the user has no profile."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(user_id)
+            if entry[0] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, entry[0]
+
+    def _set(self, user_id: str, profile: Optional[ContextualProfile]) -> None:
+        ttl = self.ttl if profile is not None else self.negative_ttl
+        self._entries[user_id] = (profile, time.monotonic() + ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def store(self, user_id: str, profile: Optional[ContextualProfile], generation: int) -> None:
+        """Fill after a miss; ignored if the user changed since ``generation``."""
+        with self._lock:
+            if self._unchanged_since(user_id, generation):
+                self._set(user_id, profile)
+
+    def put(self, user_id: str, profile: ContextualProfile) -> None:
+        """Write-through of a profile this process just saved."""
+        with self._lock:
+            self._touch(user_id)
+            self._set(user_id, profile)
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        with self._lock:
+            self.invalidations += 1
+            if user_id is None:
+                self._clock += 1
+                self._floor = self._clock
+                self._changed.clear()
+                self._entries.clear()
+            else:
+                self._touch(user_id)
+                self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "users": len(self._entries),
+                "max_users": self.max_users,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,201 @@
+"""
+Trained CVD risk model: artifact format, loading and vectorised inference.
+
+train/train_cvd_risk.py fits a logistic regression on wearable features
+and writes it as an uncompressed ``.npz`` artifact, named after its hash:
+
+    format_version  int64[1]    FORMAT_VERSION
+    feature_names   str[k]      must equal FEATURE_NAMES
+    mean, scale     float64[k]  standardisation applied before the weights
+    coef            float64[k]
+    intercept       float64[1]
+    meta            str[1]      training metadata (JSON)
+
+Set ML_CVD_MODEL to the artifact path to enable it.  The engine then scores
+ml_cvd_risk_pct with the model instead of the hand-written rules.  The
+artifact is loaded lazily, once per process, and its arrays are
+memory-mapped, so uvicorn workers share the pages.  ``version``
+(``cvd-lr-<sha256[:12]>``) is appended to the engine's MODEL_VERSION, and
+from there reaches ClinicalProvenance.model_version.
+
+Inference is a fixed sequence of element-wise NumPy operations.  Scoring one
+reading or a whole cohort therefore gives bit-identical results per
+element.  A single reading takes tens of microseconds, and a batch costs
+well under a microsecond per reading.  If the configured artifact
+cannot be loaded, a warning is logged and the rules stay in use.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Model inputs, derived from one reading (see ``features``)
+FEATURE_NAMES = (
+    "heart_rate_resting", "hr_above_80", "hrv_rmssd", "hrv_below_30",
+    "short_sleep", "irregular_ecg", "low_steps",
+)
+
+_MODEL_PATH = os.getenv("ML_CVD_MODEL", "").strip()
+
+
+def features(
+    heart_rate_resting: np.ndarray, hrv_rmssd: np.ndarray, sleep_hours: np.ndarray,
+    irregular: np.ndarray, step_count: np.ndarray,
+) -> List[np.ndarray]:
+    """One float64 column per FEATURE_NAMES entry, shared by training and inference."""
+    hr = np.asarray(heart_rate_resting, dtype=np.float64)
+    hrv = np.asarray(hrv_rmssd, dtype=np.float64)
+    sleep = np.asarray(sleep_hours, dtype=np.float64)
+    steps = np.asarray(step_count, dtype=np.float64)
+    return [
+        hr,
+        np.maximum(hr - 80.0, 0.0),
+        hrv,
+        np.where(hrv > 0, np.maximum(30.0 - hrv, 0.0), 0.0),
+        ((sleep > 0) & (sleep < 6)).astype(np.float64),
+        np.asarray(irregular, dtype=np.float64),
+        ((steps > 0) & (steps < 4000)).astype(np.float64),
+    ]
+
+
+class CvdModel:
+    """A loaded artifact; ``risk_pct`` is the vectorised inference."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], sha256: str, path: str = ""):
+        if int(arrays["format_version"][0]) != FORMAT_VERSION:
+            raise ValueError(f"unsupported artifact format {int(arrays['format_version'][0])}")
+        names = tuple(str(n) for n in arrays["feature_names"])
+        if names != FEATURE_NAMES:
+            raise ValueError(f"artifact features {names} do not match {FEATURE_NAMES}")
+        self.arrays = arrays
+        self.sha256 = sha256
+        self.path = path
+        self.version = f"cvd-lr-{sha256[:12]}"
+        # Python floats: the per-element arithmetic is the same at any batch size
+        self._terms = list(zip(
+            arrays["mean"].tolist(), arrays["scale"].tolist(), arrays["coef"].tolist(),
+        ))
+        self._intercept = float(arrays["intercept"][0])
+
+    @property
+    def meta(self) -> dict:
+        return json.loads(str(self.arrays["meta"][0]))
+
+    def risk_pct(
+        self, heart_rate_resting: np.ndarray, hrv_rmssd: np.ndarray, sleep_hours: np.ndarray,
+        irregular: np.ndarray, step_count: np.ndarray,
+    ) -> np.ndarray:
+        """Predicted CVD risk in percent (unrounded), one element per reading."""
+        columns = features(heart_rate_resting, hrv_rmssd, sleep_hours, irregular, step_count)
+        z = np.full(len(columns[0]), self._intercept)
+        for column, (mean, scale, coef) in zip(columns, self._terms):
+            z += (column - mean) / scale * coef
+        return 100.0 / (1.0 + np.exp(-z))
+
+
+# ---------------------------------------------------------------------------
+# Artifact I/O
+# ---------------------------------------------------------------------------
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _mmap_npz(path: str) -> Dict[str, np.ndarray]:
+    """
+    Memory-map every array of an uncompressed .npz.  np.load ignores
+    mmap_mode for .npz files, so each member's .npy header is read from its
+    offset inside the zip.
+    """
+    arrays: Dict[str, np.ndarray] = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{info.filename} is compressed; write artifacts with np.savez")
+            f.seek(info.header_offset)
+            name_len, extra_len = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"{info.filename} holds Python objects")
+            arrays[info.filename[:-len(".npy")]] = np.memmap(
+                path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                order="F" if fortran else "C",
+            )
+    return arrays
+
+
+def load(path: str) -> CvdModel:
+    return CvdModel(_mmap_npz(path), _file_sha256(path), path)
+
+
+def save(
+    out_dir: str, coef: np.ndarray, intercept: float, mean: np.ndarray, scale: np.ndarray,
+    meta: dict,
+) -> Tuple[str, str]:
+    """Write an artifact as ``<out_dir>/cvd_risk-<sha256[:12]>.npz``; returns (path, sha256)."""
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".npz")
+    os.close(fd)
+    try:
+        np.savez(
+            tmp,
+            format_version=np.array([FORMAT_VERSION], dtype=np.int64),
+            feature_names=np.array(FEATURE_NAMES),
+            mean=np.asarray(mean, dtype=np.float64),
+            scale=np.asarray(scale, dtype=np.float64),
+            coef=np.asarray(coef, dtype=np.float64),
+            intercept=np.array([intercept], dtype=np.float64),
+            meta=np.array([json.dumps(meta, sort_keys=True)]),
+        )
+        sha256 = _file_sha256(tmp)
+        path = os.path.join(out_dir, f"cvd_risk-{sha256[:12]}.npz")
+        os.replace(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+    load(path)  # refuse to hand out an artifact the service could not read
+    return path, sha256
+
+
+# ---------------------------------------------------------------------------
+# Process-wide model (lazy)
+# ---------------------------------------------------------------------------
+_model: Optional[CvdModel] = None
+_loaded = False
+_load_lock = threading.Lock()
+
+
+def get() -> Optional[CvdModel]:
+    """The ML_CVD_MODEL artifact, loaded on first use; None means rule-based scoring."""
+    global _model, _loaded
+    if not _loaded:
+        with _load_lock:
+            if not _loaded:
+                if _MODEL_PATH:
+                    try:
+                        _model = load(_MODEL_PATH)
+                        logger.info("[cvd_model] Loaded %s (%s)", _MODEL_PATH, _model.version)
+                    except Exception as e:
+                        logger.warning("[cvd_model] Could not load %s, using rules: %s", _MODEL_PATH, e)
+                _loaded = True
+    return _model
@@ -0,0 +1,147 @@
+"""
+Per-user daily rollups for the Early Warning engine's baseline path.
+
+db.ensure_schema maintains biometric_daily_rollup.  On TimescaleDB it is a
+continuous aggregate; on plain PostgreSQL it is a table kept current by an
+insert trigger.  Each row holds one user's UTC day: the reading count, the
+first and last reading time, and for every baseline metric the non-null
+count, sum and sum of squares.
+
+With ML_BASELINE_SOURCE=rollup the engine reads at most about 30 rollup
+rows per request, plus a short tail of raw readings, instead of every raw
+reading in the window.  Today's raw readings are folded in as the newest
+day, so a baseline includes readings minutes old.
+
+Window edges are resolved to whole days.  A day counts towards a window when
+its newest reading falls inside it.  Baselines from this path can therefore
+differ slightly from the raw path's, where the window is timestamp-exact.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from history_frame import DAY_NS, HistoryFrame, epoch_ns
+
+
+class DailyRollup:
+    """Per-day counts and sums for one user, oldest day first."""
+
+    __slots__ = ("metrics", "day", "n", "first", "last", "count", "total", "total_sq")
+
+    def __init__(self, metrics: Sequence[str], day: np.ndarray, n: np.ndarray,
+                 first: np.ndarray, last: np.ndarray, count: np.ndarray,
+                 total: np.ndarray, total_sq: np.ndarray):
+        self.metrics = list(metrics)
+        self.day = day            # int64 epoch-ns of each UTC day start
+        self.n = n                # readings per day
+        self.first = first        # int64 epoch-ns of the first / last reading
+        self.last = last
+        self.count = count        # (metrics x days) non-null counts
+        self.total = total        # (metrics x days) sums
+        self.total_sq = total_sq  # (metrics x days) sums of squares
+
+    @classmethod
+    def empty(cls, metrics: Sequence[str]) -> "DailyRollup":
+        k = len(metrics)
+        i64 = np.zeros(0, dtype=np.int64)
+        f64 = np.zeros((k, 0), dtype=np.float64)
+        return cls(metrics, i64, i64, i64, i64, f64, f64, f64)
+
+    @classmethod
+    def from_rows(cls, rows: List[dict], metrics: Sequence[str]) -> "DailyRollup":
+        """Build from db.load_daily_rollups rows (keys ``<metric>_n/_sum/_sumsq``)."""
+        rows = sorted(rows, key=lambda r: epoch_ns(r["day"]))
+        d = len(rows)
+        rollup = cls(
+            metrics,
+            np.array([epoch_ns(r["day"]) for r in rows], dtype=np.int64),
+            np.array([int(r["n"] or 0) for r in rows], dtype=np.int64),
+            np.array([epoch_ns(r["first_time"]) for r in rows], dtype=np.int64),
+            np.array([epoch_ns(r["last_time"]) for r in rows], dtype=np.int64),
+            np.zeros((len(metrics), d)), np.zeros((len(metrics), d)), np.zeros((len(metrics), d)),
+        )
+        for i, m in enumerate(metrics):
+            rollup.count[i] = [float(r.get(f"{m}_n") or 0) for r in rows]
+            rollup.total[i] = [float(r.get(f"{m}_sum") or 0.0) for r in rows]
+            rollup.total_sq[i] = [float(r.get(f"{m}_sumsq") or 0.0) for r in rows]
+        return rollup
+
+    # ------------------------------------------------------------------
+    # Combining with raw readings
+    # ------------------------------------------------------------------
+    def add_frame(self, frame: HistoryFrame) -> "DailyRollup":
+        """A new rollup with ``frame``'s readings folded into their days."""
+        if not len(frame):
+            return self
+        ts, values = frame.ts, frame.values
+        days = ts - ts % DAY_NS
+        uniq, start = np.unique(days, return_index=True)
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        add_n = np.diff(np.append(start, len(ts)))
+        add_first = ts[start]
+        add_last = ts[np.append(start[1:], len(ts)) - 1]
+        add_count = np.add.reduceat(present.astype(np.float64), start, axis=1)
+        add_total = np.add.reduceat(filled, start, axis=1)
+        add_sq = np.add.reduceat(filled * filled, start, axis=1)
+
+        all_days = np.union1d(self.day, uniq)
+        k, d = len(self.metrics), len(all_days)
+        out = DailyRollup(
+            self.metrics, all_days,
+            np.zeros(d, dtype=np.int64),
+            np.full(d, np.iinfo(np.int64).max), np.full(d, np.iinfo(np.int64).min),
+            np.zeros((k, d)), np.zeros((k, d)), np.zeros((k, d)),
+        )
+        for src_day, n, first, last, count, total, sq in (
+            (self.day, self.n, self.first, self.last, self.count, self.total, self.total_sq),
+            (uniq, add_n, add_first, add_last, add_count, add_total, add_sq),
+        ):
+            at = np.searchsorted(all_days, src_day)
+            out.n[at] += n
+            out.first[at] = np.minimum(out.first[at], first)
+            out.last[at] = np.maximum(out.last[at], last)
+            out.count[:, at] += count
+            out.total[:, at] += total
+            out.total_sq[:, at] += sq
+        return out
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def _since(self, cutoff_ns: int) -> int:
+        """Index of the first day whose newest reading is after ``cutoff_ns``."""
+        return int(np.searchsorted(self.last, cutoff_ns, side="right"))
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        return int(self.last[-1]) if len(self.day) else None
+
+    def size_since(self, cutoff_ns: int) -> int:
+        return int(self.n[self._since(cutoff_ns):].sum())
+
+    def span_days_since(self, cutoff_ns: int) -> float:
+        lo = self._since(cutoff_ns)
+        if lo >= len(self.day):
+            return 0.0
+        return float(self.last[-1] - self.first[lo]) / DAY_NS
+
+    def window_stats(self, window_days: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (count, mean, sample std) per metric over the days within
+        ``window_days`` of the newest reading — the day-granular equivalent
+        of HistoryFrame.window_stats.
+        """
+        k = len(self.metrics)
+        if not len(self.day):
+            return np.zeros(k), np.full(k, np.nan), np.full(k, np.nan)
+        lo = int(np.searchsorted(self.last, self.last[-1] - int(window_days * DAY_NS), side="left"))
+        count = self.count[:, lo:].sum(axis=1)
+        total = self.total[:, lo:].sum(axis=1)
+        total_sq = self.total_sq[:, lo:].sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            var = np.maximum(0.0, (total_sq - count * mean * mean) / (count - 1))
+        std = np.where(count > 1, np.sqrt(np.where(count > 1, var, 0.0)), np.nan)
+        return count, mean, std
@@ -13,14 +13,27 @@ Database:     The same PostgreSQL instance used by the Node backend,
 
 import os
 import json
+import uuid
+import atexit
 import logging
-from typing import List, Optional
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta, timezone
 
 import psycopg2
 import psycopg2.extras
-import psycopg2.pool
 
+import metrics
+import storage_policy
+from db_pool import ConnectionPool, PoolConfig, PoolTimeout  # noqa: F401 (re-exported)
+from context_cache import ContextCache
+from history_cache import HistoryCache
+from history_frame import HistoryFrame, epoch_ns
+from ingest_buffer import WriteBehindBuffer
+from memory_store import MemoryStore
+from notify_listener import NotifyListener
 from models import BiometricData, ContextualProfile
 
 logger = logging.getLogger(__name__)
@@ -28,29 +41,59 @@ logger = logging.getLogger(__name__)
 _db_url = os.getenv("DATABASE_URL")
 _use_db = bool(_db_url)
 _timescale_mode = (os.getenv("TIMESCALE_MODE", "auto") or "auto").strip().lower()
-_memory_biometrics: dict[str, list[dict]] = {}
+# In-memory mode: columnar per-user readings, oldest dropped past the cap
+_memory_store = MemoryStore(
+    max_readings=int(os.getenv("ML_MEMORY_MAX_READINGS_PER_USER", "100000") or 100000)
+)
 _memory_context: dict[str, ContextualProfile] = {}
+_memory_summaries: dict[str, dict] = {}
+# Identifies this process's connections (application_name), so it can skip
+# NOTIFYs about its own writes
+WORKER_ID = f"ml-service-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+# Opt-in per-user history cache; see history_cache.py
+_history_cache_enabled = (os.getenv("ML_HISTORY_CACHE", "off") or "off").strip().lower() in (
+    "1", "true", "on",
+)
+# Risk-profile cache, on by default; see context_cache.py
+_context_cache_enabled = (os.getenv("ML_CONTEXT_CACHE", "on") or "on").strip().lower() in (
+    "1", "true", "on",
+)
+# Opt-in write-behind ingest (group commit); see ingest_buffer.py
+_write_behind_enabled = (os.getenv("ML_WRITE_BEHIND", "off") or "off").strip().lower() in (
+    "1", "true", "on",
+)
 
 # ---------------------------------------------------------------------------
-# Connection pool (shared across requests for the lifetime of the process)
+# Connection pool (shared across requests for the lifetime of the process).
+# Sized and tuned from ML_DB_POOL_* env vars; see db_pool.py.  Waits for a
+# free connection and raises PoolTimeout only after the acquire timeout.
 # ---------------------------------------------------------------------------
-_pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+_pool: Optional[ConnectionPool] = None
+_pool_init_lock = threading.Lock()
 
 
-def _get_pool() -> psycopg2.pool.ThreadedConnectionPool:
+def _get_pool() -> ConnectionPool:
     global _pool
     if _pool is None:
-        if not _db_url:
-            raise RuntimeError("DATABASE_URL environment variable not set")
-        _pool = psycopg2.pool.ThreadedConnectionPool(
-            minconn=1,
-            maxconn=10,
-            dsn=_db_url,
-        )
-        logger.info("[db] Connection pool created")
+        with _pool_init_lock:
+            if _pool is None:
+                if not _db_url:
+                    raise RuntimeError("DATABASE_URL environment variable not set")
+                pool = ConnectionPool(_db_url, PoolConfig.from_env(), application_name=WORKER_ID)
+                pool.prewarm()
+                _pool = pool
+                logger.info(
+                    "[db] Connection pool created (min=%d max=%d timeout=%.1fs)",
+                    pool.config.min_size, pool.config.max_size, pool.config.timeout,
+                )
     return _pool
 
 
+def pool_stats() -> Optional[Dict[str, float]]:
+    """Counters and gauges for the sync pool, or None before it is created."""
+    return _pool.stats() if _pool is not None else None
+
+
 def _get_conn():
     return _get_pool().getconn()
 
@@ -59,6 +102,42 @@ def _put_conn(conn):
     _get_pool().putconn(conn)
 
 
+# ---------------------------------------------------------------------------
+# Query accounting — per-request storage budget, checked per route by
+# bench/query_budget.py.  Counted per storage call (one round trip), in both
+# database and memory mode.
+# ---------------------------------------------------------------------------
+class QueryCounter:
+    def __init__(self) -> None:
+        self.total = 0
+        self.by_name: Dict[str, int] = {}
+
+    def record(self, name: str) -> None:
+        self.total += 1
+        self.by_name[name] = self.by_name.get(name, 0) + 1
+
+
+_active_counters: ContextVar[Tuple[QueryCounter, ...]] = ContextVar(
+    "db_query_counters", default=()
+)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """Count storage calls made inside the block (nested blocks each count)."""
+    counter = QueryCounter()
+    token = _active_counters.set(_active_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _active_counters.reset(token)
+
+
+def _record_query(name: str) -> None:
+    for counter in _active_counters.get():
+        counter.record(name)
+
+
 # ---------------------------------------------------------------------------
 # Ensure hypertable exists (idempotent — safe to call on every startup)
 # ---------------------------------------------------------------------------
@@ -92,8 +171,7 @@ CREATE INDEX IF NOT EXISTS bts_user_time_idx
     ON biometric_time_series (user_id, time DESC);
 """
 
-PLAIN_TABLE_SQL = """
-CREATE TABLE IF NOT EXISTS biometric_time_series (
+_PLAIN_COLUMNS_SQL = """
     time         TIMESTAMPTZ NOT NULL,
     user_id      TEXT        NOT NULL,
     hr_resting   DOUBLE PRECISION,
@@ -108,29 +186,380 @@ CREATE TABLE IF NOT EXISTS biometric_time_series (
     temp_trend   TEXT DEFAULT 'normal',
     alert_level  TEXT DEFAULT 'GREEN',
     anomalies    JSONB DEFAULT '[]'
-);
+"""
+
+PLAIN_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS biometric_time_series ({_PLAIN_COLUMNS_SQL});
 CREATE INDEX IF NOT EXISTS bts_user_time_idx
     ON biometric_time_series (user_id, time DESC);
 """
 
+# New plain tables: monthly range partitions, made and retired by
+# storage_policy.maintain_partitions; DEFAULT catches rows outside them.
+PARTITIONED_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS biometric_time_series ({_PLAIN_COLUMNS_SQL})
+    PARTITION BY RANGE (time);
+CREATE TABLE IF NOT EXISTS biometric_time_series_default
+    PARTITION OF biometric_time_series DEFAULT;
+CREATE INDEX IF NOT EXISTS bts_user_time_idx
+    ON biometric_time_series (user_id, time DESC);
+"""
+
+
+# ---------------------------------------------------------------------------
+# Daily rollups — per user and UTC day: reading count, first/last reading and,
+# for each baseline metric (BASELINE_METRICS in engine.py), the non-null
+# count, sum and sum of squares.  A continuous aggregate on TimescaleDB, a
+# trigger-maintained table on plain PostgreSQL; same name and columns.
+# ---------------------------------------------------------------------------
+ROLLUP_COLUMNS = {
+    "heart_rate_resting":   "hr_resting",
+    "hrv_rmssd":            "hrv_rmssd",
+    "spo2":                 "spo2",
+    "respiratory_rate":     "resp_rate",
+    "step_count":           "step_count",
+    "active_calories":      "active_cals",
+    "sleep_duration_hours": "sleep_hrs",
+}
+
+
+def _rollup_aggregates(source: str = "") -> str:
+    """Aggregate expressions for the per-metric rollup columns."""
+    parts = []
+    for col in ROLLUP_COLUMNS.values():
+        ref = f"{source}{col}"
+        parts.append(
+            f"count({ref}) AS {col}_n, "
+            f"sum({ref}) AS {col}_sum, "
+            f"sum({ref}::double precision * {ref}) AS {col}_sumsq"
+        )
+    return ",\n    ".join(parts)
+
+
+ROLLUP_CAGG_SQL = f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS biometric_daily_rollup
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    user_id,
+    time_bucket(INTERVAL '1 day', time) AS day,
+    count(*)  AS n,
+    min(time) AS first_time,
+    max(time) AS last_time,
+    {_rollup_aggregates()}
+FROM biometric_time_series
+GROUP BY user_id, day
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy(
+    'biometric_daily_rollup',
+    start_offset      => INTERVAL '40 days',
+    end_offset        => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '30 minutes',
+    if_not_exists     => TRUE
+);
+"""
+
+_ROLLUP_DAY_SQL = "(date_trunc('day', {ref}time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC')"
+
+
+def _rollup_select(source: str, alias: str = "") -> str:
+    """SELECT ... GROUP BY producing rollup rows from ``source``."""
+    ref = f"{alias}." if alias else ""
+    return f"""
+    SELECT
+        {ref}user_id,
+        {_ROLLUP_DAY_SQL.format(ref=ref)} AS day,
+        count(*), min({ref}time), max({ref}time),
+        {_rollup_aggregates(ref)}
+    FROM {source} {alias}
+    GROUP BY 1, 2"""
+
+
+_ROLLUP_TABLE_COLUMNS = ",\n    ".join(
+    f"{col}_n BIGINT NOT NULL DEFAULT 0, "
+    f"{col}_sum DOUBLE PRECISION, "
+    f"{col}_sumsq DOUBLE PRECISION"
+    for col in ROLLUP_COLUMNS.values()
+)
+
+_ROLLUP_UPSERT_SET = ",\n            ".join(
+    ["n = r.n + EXCLUDED.n",
+     "first_time = LEAST(r.first_time, EXCLUDED.first_time)",
+     "last_time = GREATEST(r.last_time, EXCLUDED.last_time)"]
+    + [
+        f"{col}_n = r.{col}_n + EXCLUDED.{col}_n, "
+        f"{col}_sum = COALESCE(r.{col}_sum, 0) + COALESCE(EXCLUDED.{col}_sum, 0), "
+        f"{col}_sumsq = COALESCE(r.{col}_sumsq, 0) + COALESCE(EXCLUDED.{col}_sumsq, 0)"
+        for col in ROLLUP_COLUMNS.values()
+    ]
+)
+
+# Statement-level trigger: one upsert per INSERT/COPY statement, aggregated
+# over the statement's new rows, so batched ingest stays batched.
+ROLLUP_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS biometric_daily_rollup (
+    user_id    TEXT        NOT NULL,
+    day        TIMESTAMPTZ NOT NULL,
+    n          BIGINT      NOT NULL,
+    first_time TIMESTAMPTZ NOT NULL,
+    last_time  TIMESTAMPTZ NOT NULL,
+    {_ROLLUP_TABLE_COLUMNS},
+    PRIMARY KEY (user_id, day)
+);
+
+CREATE OR REPLACE FUNCTION biometric_daily_rollup_apply() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO biometric_daily_rollup AS r
+    {_rollup_select("new_rows", "nr")}
+    ON CONFLICT (user_id, day) DO UPDATE SET
+            {_ROLLUP_UPSERT_SET};
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_trigger WHERE tgname = 'bts_daily_rollup_trg'
+    ) THEN
+        -- Backfill existing history, blocking concurrent inserts until the
+        -- trigger exists so no row is missed or counted twice
+        LOCK TABLE biometric_time_series IN SHARE ROW EXCLUSIVE MODE;
+        INSERT INTO biometric_daily_rollup
+        {_rollup_select("biometric_time_series", "b")}
+        ON CONFLICT (user_id, day) DO NOTHING;
+        CREATE TRIGGER bts_daily_rollup_trg
+            AFTER INSERT ON biometric_time_series
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION biometric_daily_rollup_apply();
+    END IF;
+END;
+$$;
+"""
+
+
+# Write notifications for the history cache, its only consumer.  The
+# triggers are shared by every worker on the database, so ensure_schema always
+# installs them whatever this process's ML_HISTORY_CACHE says; a worker with
+# the cache on checks they exist before using it (check_notify_trigger).
+# On plain tables one statement-level trigger per event sends a NOTIFY per
+# distinct user in the statement.  Hypertables do not support transition
+# tables, so there it is row-level; Postgres folds identical payloads within
+# a transaction, so a batch still sends one NOTIFY per user.
+NOTIFY_CHANNEL = "ml_biometrics"
+
+_NOTIFY_PAYLOAD_SQL = """json_build_object(
+            'origin',  current_setting('application_name'),
+            'user_id', {ref}user_id
+        )::text"""
+
+
+def _create_trigger_sql(name: str, definition: str) -> str:
+    return f"""
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_trigger
+        WHERE tgname = '{name}' AND tgrelid = 'biometric_time_series'::regclass
+    ) THEN
+        CREATE TRIGGER {name}
+            {definition};
+    END IF;
+END;
+$$;
+"""
+
+
+NOTIFY_ROW_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION biometric_notify_write() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', {_NOTIFY_PAYLOAD_SQL.format(ref="NEW.")});
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+""" + _create_trigger_sql(
+    "bts_notify_write_trg",
+    "AFTER INSERT OR UPDATE ON biometric_time_series\n"
+    "            FOR EACH ROW EXECUTE FUNCTION biometric_notify_write()",
+)
+
+NOTIFY_STATEMENT_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION biometric_notify_users() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', {_NOTIFY_PAYLOAD_SQL.format(ref="u.")})
+    FROM (SELECT DISTINCT user_id FROM new_rows) u;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+""" + "".join(
+    _create_trigger_sql(
+        f"bts_notify_{event.lower()}_trg",
+        f"AFTER {event} ON biometric_time_series\n"
+        "            REFERENCING NEW TABLE AS new_rows\n"
+        "            FOR EACH STATEMENT EXECUTE FUNCTION biometric_notify_users()",
+    )
+    for event in ("INSERT", "UPDATE")
+)
+
+_NOTIFY_ROW_TRIGGERS = {"bts_notify_write_trg"}
+_NOTIFY_STATEMENT_TRIGGERS = {"bts_notify_insert_trg", "bts_notify_update_trg"}
+
+
+def set_notify_trigger(cur, on: bool, hypertable: bool = False) -> None:
+    """
+    Install the write NOTIFY in the form the table supports, or (on=False)
+    drop it.  Only storage_policy's migrate drops it, to move it to the new
+    partitioned parent in the same transaction.
+    """
+    if on:
+        cur.execute(NOTIFY_ROW_TRIGGER_SQL if hypertable else NOTIFY_STATEMENT_TRIGGER_SQL)
+        return
+    for name in sorted(_NOTIFY_ROW_TRIGGERS | _NOTIFY_STATEMENT_TRIGGERS):
+        cur.execute(f"DROP TRIGGER IF EXISTS {name} ON biometric_time_series")
+
+
+def _notify_trigger_present(cur) -> bool:
+    cur.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_trigger "
+        "WHERE tgrelid = to_regclass('biometric_time_series') AND tgname = ANY(%s))",
+        (sorted(_NOTIFY_ROW_TRIGGERS | _NOTIFY_STATEMENT_TRIGGERS),),
+    )
+    return bool(cur.fetchone()[0])
+
+
+# users belongs to the Node backend (Prisma); this trigger only tells ML
+# workers that a risk profile changed so they drop their cached copy.
+CONTEXT_NOTIFY_CHANNEL = "ml_risk_profile"
+
+CONTEXT_NOTIFY_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION ml_risk_profile_notify() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('{CONTEXT_NOTIFY_CHANNEL}', json_build_object(
+            'origin', current_setting('application_name'), 'user_id', OLD.id)::text);
+    ELSIF TG_OP = 'INSERT' OR NEW."riskProfile" IS DISTINCT FROM OLD."riskProfile" THEN
+        PERFORM pg_notify('{CONTEXT_NOTIFY_CHANNEL}', json_build_object(
+            'origin', current_setting('application_name'), 'user_id', NEW.id)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_trigger WHERE tgname = 'users_risk_profile_notify_trg'
+    ) THEN
+        CREATE TRIGGER users_risk_profile_notify_trg
+            AFTER INSERT OR UPDATE OF "riskProfile" OR DELETE ON users
+            FOR EACH ROW EXECUTE FUNCTION ml_risk_profile_notify();
+    END IF;
+END;
+$$;
+"""
+
+
+# Latest EarlyWarningSummary per user (see save_summary / load_summary).  A row
+# is only served while reading_time is still the user's newest reading and
+# summary_key (model version + risk profile) still matches.
+SUMMARY_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS early_warning_summaries (
+    user_id       TEXT        PRIMARY KEY,
+    reading_time  TIMESTAMPTZ NOT NULL,
+    summary_key   TEXT        NOT NULL,
+    computed_at   TIMESTAMPTZ NOT NULL,
+    summary       JSONB       NOT NULL
+);
+"""
+
+
+def _no_statement_timeout(cur) -> None:
+    """
+    Lift ML_DB_STATEMENT_TIMEOUT_MS for the rest of this transaction.  Schema
+    and storage upkeep (rollup backfill, moving rows out of DEFAULT) can take
+    far longer than any request query, and would otherwise fail on every retry.
+    """
+    cur.execute("SET LOCAL statement_timeout = 0")
+
 
 def ensure_schema() -> None:
     """Call once at service startup to create hypertable if not already present."""
     if not _use_db:
         return
+    _ensure_biometrics_schema()
+    _ensure_summary_table()
+    _ensure_context_trigger()
+
+
+def _ensure_summary_table() -> None:
+    conn = _get_conn()
+    try:
+        with conn.cursor() as cur:
+            _no_statement_timeout(cur)
+            cur.execute(SUMMARY_TABLE_SQL)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _put_conn(conn)
+
+
+def _ensure_context_trigger() -> None:
+    """Best effort: users may not exist yet, or we may lack the privilege."""
+    conn = _get_conn()
+    try:
+        with conn.cursor() as cur:
+            _no_statement_timeout(cur)
+            cur.execute(CONTEXT_NOTIFY_TRIGGER_SQL)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.warning(
+            "[db] Could not install riskProfile notify trigger (context cache relies on TTL): %s", e
+        )
+    finally:
+        _put_conn(conn)
+
+
+def _timescale_schema(cur) -> None:
+    cur.execute(HYPERTABLE_SQL)
+    cur.execute(ROLLUP_CAGG_SQL)
+    set_notify_trigger(cur, True, hypertable=True)
+    storage_policy.apply_timescale_policies(cur)
+
+
+def _plain_schema(cur) -> None:
+    if storage_policy.PARTITIONING == "monthly" and not storage_policy.table_exists(cur):
+        cur.execute(PARTITIONED_TABLE_SQL)
+    else:
+        cur.execute(PLAIN_TABLE_SQL)
+    cur.execute(ROLLUP_TABLE_SQL)
+    set_notify_trigger(cur, True)
+    if storage_policy.is_partitioned(cur):
+        storage_policy.maintain_partitions(cur)
+    elif storage_policy.PARTITIONING == "monthly":
+        logger.warning(
+            "[db] biometric_time_series is not partitioned; retention is off until "
+            "`python -m storage_policy migrate` converts it"
+        )
+
+
+def _ensure_biometrics_schema() -> None:
     conn = _get_conn()
     try:
         with conn.cursor() as cur:
+            _no_statement_timeout(cur)
             if _timescale_mode == "off":
-                cur.execute(PLAIN_TABLE_SQL)
+                _plain_schema(cur)
                 conn.commit()
-                logger.info("[db] TIMESCALE_MODE=off; plain PostgreSQL table ready")
+                logger.info("[db] TIMESCALE_MODE=off; plain PostgreSQL table and daily rollup ready")
                 return
 
             if _timescale_mode == "on":
-                cur.execute(HYPERTABLE_SQL)
+                _timescale_schema(cur)
                 conn.commit()
-                logger.info("[db] TimescaleDB hypertable ready")
+                logger.info("[db] TimescaleDB hypertable, daily rollup and storage policies ready")
                 return
 
             # AUTO mode: only attempt CREATE EXTENSION when extension exists on host.
@@ -146,11 +575,13 @@ def ensure_schema() -> None:
             available = bool(cur.fetchone()[0])
 
             if available:
-                cur.execute(HYPERTABLE_SQL)
+                _timescale_schema(cur)
                 conn.commit()
-                logger.info("[db] TimescaleDB available; hypertable ready")
+                logger.info(
+                    "[db] TimescaleDB available; hypertable, daily rollup and storage policies ready"
+                )
             else:
-                cur.execute(PLAIN_TABLE_SQL)
+                _plain_schema(cur)
                 conn.commit()
                 logger.info(
                     "[db] TimescaleDB not available on this host; using plain PostgreSQL table"
@@ -159,48 +590,330 @@ def ensure_schema() -> None:
         _put_conn(conn)
 
 
+def maintain_storage() -> Optional[Dict[str, int]]:
+    """
+    One pass of partition upkeep on plain PostgreSQL (see storage_policy.py).
+    None when there is nothing to do here: memory mode, a hypertable (its
+    policies run inside TimescaleDB) or an unpartitioned table.
+    """
+    if not _use_db:
+        return None
+    conn = _get_conn()
+    try:
+        with conn.cursor() as cur:
+            _no_statement_timeout(cur)
+            result = storage_policy.maintain_partitions(cur)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _put_conn(conn)
+
+
+def storage_stats() -> Optional[Dict[str, float]]:
+    """Storage-policy settings and partition upkeep counters (database mode)."""
+    return storage_policy.stats() if _use_db else None
+
+
 # ---------------------------------------------------------------------------
 # Write
 # ---------------------------------------------------------------------------
+BIOMETRIC_INSERT_COLUMNS = (
+    "time, user_id, hr_resting, hrv_rmssd, spo2, resp_rate, "
+    "step_count, active_cals, sleep_hrs, skin_temp, "
+    "ecg_rhythm, temp_trend, alert_level, anomalies"
+)
+
+INSERT_BIOMETRIC_SQL = f"""
+INSERT INTO biometric_time_series ({BIOMETRIC_INSERT_COLUMNS})
+VALUES %s
+"""
+
+
+def biometric_row(data: BiometricData, alert_level: str, anomalies: list) -> dict:
+    """Shape an evaluated reading like a row returned by load_biometrics."""
+    row = data.model_dump()
+    row["alert_level"] = alert_level
+    row["anomalies"] = anomalies
+    return row
+
+
+def biometric_values(
+    user_id: str,
+    data: BiometricData,
+    alert_level: str,
+    anomalies: list,
+) -> tuple:
+    """Column values in BIOMETRIC_INSERT_COLUMNS order (anomalies as a plain list)."""
+    return (
+        data.timestamp,
+        user_id,
+        data.heart_rate_resting,
+        data.hrv_rmssd,
+        data.spo2,
+        data.respiratory_rate,
+        data.step_count,
+        data.active_calories,
+        data.sleep_duration_hours,
+        data.skin_temp_offset,
+        getattr(data, "ecg_rhythm", "unknown") or "unknown",
+        getattr(data, "temperature_trend", "normal") or "normal",
+        alert_level,
+        anomalies,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Write-behind buffer (ML_WRITE_BEHIND=on).  Created on first write; drained
+# by close_write_behind() on shutdown (and at interpreter exit).
+# ---------------------------------------------------------------------------
+_write_buffer: Optional[WriteBehindBuffer] = None
+_write_buffer_lock = threading.Lock()
+
+
+def write_behind() -> Optional[WriteBehindBuffer]:
+    """The write-behind buffer, or None when write-behind is off."""
+    global _write_buffer
+    if not _write_behind_enabled:
+        return None
+    if _write_buffer is None:
+        with _write_buffer_lock:
+            if _write_buffer is None:
+                buffer = WriteBehindBuffer.from_env(
+                    _write_biometrics, biometric_row,
+                    # Bad values, not a bad connection: retrying cannot help
+                    permanent=(psycopg2.DataError, psycopg2.IntegrityError),
+                )
+                atexit.register(buffer.close)
+                _write_buffer = buffer
+                logger.info(
+                    "[db] Write-behind ingest on (batch=%d rows, flush=%.0fms, max=%d rows)",
+                    buffer.batch_rows, buffer.flush_interval * 1000, buffer.max_rows,
+                )
+    return _write_buffer
+
+
+def close_write_behind(timeout: Optional[float] = 30.0) -> None:
+    """Write out everything still queued and stop the flusher."""
+    if _write_buffer is not None:
+        _write_buffer.close(timeout)
+
+
+def write_behind_stats() -> Optional[Dict[str, float]]:
+    return _write_buffer.stats() if _write_buffer is not None else None
+
+
+# ---------------------------------------------------------------------------
+# Caches (history: ML_HISTORY_CACHE=on, risk profile: ML_CONTEXT_CACHE).  In
+# database mode they are only used while the NOTIFY listener is connected,
+# so writes by other processes always invalidate them; see history_cache.py
+# and context_cache.py.
+# ---------------------------------------------------------------------------
+_history_cache: Optional[HistoryCache] = HistoryCache.from_env() if _history_cache_enabled else None
+_context_cache: Optional[ContextCache] = ContextCache.from_env() if _context_cache_enabled else None
+_listener: Optional[NotifyListener] = None
+_listener_lock = threading.Lock()
+# Set by check_notify_trigger at startup; the history cache stays unused in
+# database mode until the write NOTIFY is known to exist
+_notify_trigger_ok = False
+
+
+def _notified_user(payload: str) -> Tuple[bool, Optional[str]]:
+    """(is another process's write, user_id or None for "everyone")."""
+    try:
+        note = json.loads(payload)
+    except ValueError:
+        return True, None
+    if note.get("origin") == WORKER_ID:
+        return False, None  # our own write; already applied by write-through
+    return True, note.get("user_id")
+
+
+def _on_biometrics_notify(payload: str) -> None:
+    foreign, user_id = _notified_user(payload)
+    if foreign:
+        _history_cache.invalidate(user_id)
+
+
+def _on_context_notify(payload: str) -> None:
+    foreign, user_id = _notified_user(payload)
+    if foreign:
+        _context_cache.invalidate(user_id)
+
+
+def notify_listener() -> Optional[NotifyListener]:
+    """The process's LISTEN connection (database mode with a cache on), started lazily."""
+    global _listener
+    if not _use_db or (_history_cache is None and _context_cache is None):
+        return None
+    if _listener is None:
+        with _listener_lock:
+            if _listener is None:
+                listener = NotifyListener(_db_url, f"{WORKER_ID}-listen")
+                if _history_cache is not None:
+                    listener.subscribe(NOTIFY_CHANNEL, _on_biometrics_notify)
+                    listener.on_reset(_history_cache.invalidate)
+                if _context_cache is not None:
+                    listener.subscribe(CONTEXT_NOTIFY_CHANNEL, _on_context_notify)
+                    listener.on_reset(_context_cache.invalidate)
+                listener.start()
+                _listener = listener
+    return _listener
+
+
+def _listening() -> bool:
+    return not _use_db or notify_listener().connected.is_set()
+
+
+def check_notify_trigger() -> None:
+    """
+    Startup check for the history cache: without the write NOTIFY, other
+    workers' writes would never invalidate it, so it is left off.
+    """
+    global _notify_trigger_ok
+    if not _use_db or _history_cache is None:
+        return
+    conn = _get_conn()
+    try:
+        with conn.cursor() as cur:
+            present = _notify_trigger_present(cur)
+        conn.commit()
+    finally:
+        _put_conn(conn)
+    if not present:
+        logger.error("[db] Write NOTIFY trigger missing on biometric_time_series; history cache stays off")
+    _notify_trigger_ok = present
+
+
+def _cache() -> Optional[HistoryCache]:
+    if _history_cache is None or not _listening() or (_use_db and not _notify_trigger_ok):
+        return None
+    return _history_cache
+
+
+def _cached_window(user_id: str, days: int) -> Tuple[Optional[List[dict]], Optional[int]]:
+    """(cached rows or None, generation token for _cache_window after a miss)."""
+    cache = _cache()
+    if cache is None:
+        return None, None
+    generation = cache.generation()
+    return cache.window(user_id, days), generation
+
+
+def _cache_window(user_id: str, days: int, rows: List[dict], generation: Optional[int]) -> None:
+    if generation is not None and _history_cache is not None:
+        _history_cache.store(user_id, days, rows, generation)
+
+
+def _cached_latest(user_id: str) -> Tuple[bool, Optional[dict], Optional[int]]:
+    cache = _cache()
+    if cache is None:
+        return False, None, None
+    generation = cache.generation()
+    hit, row = cache.latest(user_id)
+    return hit, row, generation
+
+
+def _cache_latest(user_id: str, row: Optional[dict], generation: Optional[int]) -> None:
+    if generation is not None and _history_cache is not None:
+        _history_cache.store_latest(user_id, row, generation)
+
+
+def _write_through(rows: List[Tuple[str, BiometricData, str, list]]) -> None:
+    """Add just-committed rows to the cached histories."""
+    if _history_cache is None:
+        return
+    by_user: Dict[str, List[dict]] = {}
+    for user_id, data, alert_level, anomalies in rows:
+        by_user.setdefault(user_id, []).append(biometric_row(data, alert_level, anomalies))
+    for user_id, user_rows in by_user.items():
+        _history_cache.append(user_id, user_rows)
+
+
+def context_cache_stats() -> Optional[Dict[str, float]]:
+    return _context_cache.stats() if _context_cache is not None else None
+
+
+def history_cache_stats() -> Optional[Dict[str, float]]:
+    if _history_cache is None:
+        return None
+    stats = _history_cache.stats()
+    stats["listening"] = bool(_listener and _listener.connected.is_set())
+    return stats
+
+
+def _merge_pending(user_id: str, rows: List[dict], days: Optional[int] = None) -> List[dict]:
+    """
+    Add the user's queued, not yet committed rows to ``rows`` (time-ordered).
+    A row committed between the read and this merge would appear in both,
+    so pending rows whose timestamp is already in ``rows`` are skipped.
+    """
+    if _write_buffer is None:
+        return rows
+    pending = _write_buffer.pending(user_id)
+    if not pending:
+        return rows
+    seen = {epoch_ns(r["timestamp"]) for r in rows if isinstance(r.get("timestamp"), datetime)}
+    cutoff = None
+    if days is not None:
+        cutoff = epoch_ns(datetime.now(timezone.utc) - timedelta(days=days))
+    extra = []
+    for r in pending:
+        if not isinstance(r.get("timestamp"), datetime):
+            continue
+        t = epoch_ns(r["timestamp"])
+        if t in seen or (cutoff is not None and t <= cutoff):
+            continue
+        extra.append(r)
+    if not extra:
+        return rows
+    return sorted(rows + extra, key=lambda r: epoch_ns(r["timestamp"]))
+
+
 def save_biometric(
     user_id: str,
     data: BiometricData,
     alert_level: str,
     anomalies: list,
 ) -> None:
+    save_biometrics([(user_id, data, alert_level, anomalies)])
+
+
+@metrics.timed("save")
+def save_biometrics(rows: List[Tuple[str, BiometricData, str, list]]) -> None:
+    """Persist many evaluated readings with a single multi-row INSERT.
+
+    Each row is (user_id, data, alert_level, anomalies), as passed to
+    save_biometric.  Rows may belong to different users.  With write-behind
+    on, the rows are queued instead (blocking while the queue is full) and
+    written by the flusher thread.
+    """
+    if not rows:
+        return
+    buffer = write_behind()
+    if buffer is not None:
+        buffer.put(rows)
+        return
+    _record_query("save_biometrics")
+    _write_biometrics(rows)
+
+
+@metrics.timed("biometrics_write")
+def _write_biometrics(rows: List[Tuple[str, BiometricData, str, list]]) -> None:
     if not _use_db:
-        row = data.model_dump()
-        row["alert_level"] = alert_level
-        row["anomalies"] = anomalies
-        _memory_biometrics.setdefault(user_id, []).append(row)
+        _memory_store.add(rows)
+        _write_through(rows)
         return
     conn = _get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO biometric_time_series
-                    (time, user_id, hr_resting, hrv_rmssd, spo2, resp_rate,
-                     step_count, active_cals, sleep_hrs, skin_temp,
-                     ecg_rhythm, temp_trend, alert_level, anomalies)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                """,
-                (
-                    data.timestamp,
-                    user_id,
-                    data.heart_rate_resting,
-                    data.hrv_rmssd,
-                    data.spo2,
-                    data.respiratory_rate,
-                    data.step_count,
-                    data.active_calories,
-                    data.sleep_duration_hours,
-                    data.skin_temp_offset,
-                    getattr(data, "ecg_rhythm", "unknown") or "unknown",
-                    getattr(data, "temperature_trend", "normal") or "normal",
-                    alert_level,
-                    psycopg2.extras.Json(anomalies),
-                ),
+            psycopg2.extras.execute_values(
+                cur,
+                INSERT_BIOMETRIC_SQL,
+                [biometric_values(*row)[:-1] + (psycopg2.extras.Json(row[3]),) for row in rows],
+                page_size=1000,
             )
         conn.commit()
     except Exception:
@@ -208,106 +921,469 @@ def save_biometric(
         raise
     finally:
         _put_conn(conn)
+    _write_through(rows)
 
 
 # ---------------------------------------------------------------------------
 # Read — returns rows as plain dicts with keys matching BiometricData fields
 # ---------------------------------------------------------------------------
+BIOMETRIC_COLUMNS_SQL = """
+    time        AS timestamp,
+    hr_resting  AS heart_rate_resting,
+    hrv_rmssd,
+    spo2,
+    resp_rate   AS respiratory_rate,
+    step_count,
+    active_cals AS active_calories,
+    sleep_hrs   AS sleep_duration_hours,
+    skin_temp   AS skin_temp_offset,
+    ecg_rhythm,
+    temp_trend  AS temperature_trend,
+    alert_level,
+    anomalies
+"""
+
+SELECT_BIOMETRICS_SQL = f"""
+SELECT {BIOMETRIC_COLUMNS_SQL}
+FROM biometric_time_series
+WHERE user_id = %s
+  AND time > NOW() - INTERVAL '1 day' * %s
+ORDER BY time ASC
+"""
+
+# Bulk reads for population jobs (risk_sweep.py): one query per chunk of users
+SELECT_BIOMETRICS_BULK_SQL = f"""
+SELECT user_id, {BIOMETRIC_COLUMNS_SQL}
+FROM biometric_time_series
+WHERE user_id = ANY(%s)
+  AND time > NOW() - INTERVAL '1 day' * %s
+ORDER BY user_id, time ASC
+"""
+
+SELECT_ACTIVE_USERS_SQL = """
+SELECT DISTINCT user_id
+FROM biometric_time_series
+WHERE time > NOW() - INTERVAL '1 day' * %s
+"""
+
+SELECT_LATEST_BIOMETRIC_SQL = f"""
+SELECT {BIOMETRIC_COLUMNS_SQL}
+FROM biometric_time_series
+WHERE user_id = %s
+ORDER BY time DESC
+LIMIT 1
+"""
+
+SELECT_LATEST_BIOMETRICS_BULK_SQL = f"""
+SELECT DISTINCT ON (user_id) user_id, {BIOMETRIC_COLUMNS_SQL}
+FROM biometric_time_series
+WHERE user_id = ANY(%s)
+ORDER BY user_id, time DESC
+"""
+
+# Raw readings for the rollup baseline path: today's (UTC) readings plus at
+# least the newest (offset + 1) readings in the window, however old.
+SELECT_RECENT_BIOMETRICS_SQL = f"""
+SELECT {BIOMETRIC_COLUMNS_SQL}
+FROM biometric_time_series
+WHERE user_id = %(user_id)s
+  AND time > NOW() - INTERVAL '1 day' * %(days)s
+  AND time >= LEAST(
+        date_trunc('day', NOW(), 'UTC'),
+        COALESCE((
+            SELECT time FROM biometric_time_series
+            WHERE user_id = %(user_id)s
+              AND time > NOW() - INTERVAL '1 day' * %(days)s
+            ORDER BY time DESC
+            OFFSET %(offset)s LIMIT 1
+        ), '-infinity'::timestamptz)
+  )
+ORDER BY time ASC
+"""
+
+_ROLLUP_READ_COLUMNS = ",\n    ".join(
+    f"{col}_n AS {field}_n, {col}_sum AS {field}_sum, {col}_sumsq AS {field}_sumsq"
+    for field, col in ROLLUP_COLUMNS.items()
+)
+
+# Completed days only; the engine folds today's raw readings in itself
+SELECT_DAILY_ROLLUPS_SQL = f"""
+SELECT
+    day, n, first_time, last_time,
+    {_ROLLUP_READ_COLUMNS}
+FROM biometric_daily_rollup
+WHERE user_id = %s
+  AND day >= date_trunc('day', NOW() - INTERVAL '1 day' * %s, 'UTC')
+  AND day <  date_trunc('day', NOW(), 'UTC')
+ORDER BY day ASC
+"""
+
+COUNT_BIOMETRICS_SQL = """
+SELECT COUNT(*)
+FROM biometric_time_series
+WHERE user_id = %s
+  AND time > NOW() - INTERVAL '1 day' * %s
+"""
+
+
+def _memory_cutoff(days: int) -> int:
+    return epoch_ns(datetime.now(timezone.utc) - timedelta(days=days))
+
+
+def _memory_window(user_id: str, days: int) -> List[dict]:
+    return _memory_store.window(user_id, _memory_cutoff(days))
+
+
+def memory_store_stats() -> Optional[Dict[str, float]]:
+    """Size of the in-memory store; None in database mode."""
+    return None if _use_db else _memory_store.stats()
+
+
+@metrics.timed("history_load")
 def load_biometrics(user_id: str, days: int = 30) -> List[dict]:
+    cached, generation = _cached_window(user_id, days)
+    if cached is not None:
+        return _merge_pending(user_id, cached, days)
+    _record_query("load_biometrics")
+    if not _use_db:
+        rows = _memory_window(user_id, days)
+    else:
+        conn = _get_conn()
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute(SELECT_BIOMETRICS_SQL, (user_id, days))
+                rows = [dict(r) for r in cur.fetchall()]
+        finally:
+            _put_conn(conn)
+    _cache_window(user_id, days, rows, generation)
+    return _merge_pending(user_id, rows, days)
+
+
+@metrics.timed("history_load")
+def load_history_frame(user_id: str, days: int, columns: List[str]) -> Optional[HistoryFrame]:
+    """
+    In-memory mode: the load_biometrics window as a HistoryFrame of
+    ``columns``, read straight from the columnar store without row dicts.
+    None in database mode or with write-behind on; load rows instead.
+    """
+    if _use_db or _write_buffer is not None:
+        return None
+    _record_query("load_biometrics")
+    return _memory_store.frame(user_id, _memory_cutoff(days), columns)
+
+
+def load_biometrics_bulk(user_ids: List[str], days: int) -> Dict[str, List[dict]]:
+    """load_biometrics for many users in one query; users without rows are omitted."""
+    if not user_ids:
+        return {}
+    _record_query("load_biometrics_bulk")
+    if not _use_db:
+        out = {u: _merge_pending(u, _memory_window(u, days), days) for u in user_ids}
+        return {u: rows for u, rows in out.items() if rows}
+    conn = _get_conn()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(SELECT_BIOMETRICS_BULK_SQL, (list(user_ids), days))
+            out: Dict[str, List[dict]] = {}
+            for r in cur:
+                row = dict(r)
+                out.setdefault(row.pop("user_id"), []).append(row)
+    finally:
+        _put_conn(conn)
+    return {u: _merge_pending(u, rows, days) for u, rows in out.items()}
+
+
+def load_history_frames_bulk(
+    user_ids: List[str], days: int, columns: List[str],
+) -> Optional[Dict[str, HistoryFrame]]:
+    """load_history_frame for many users; None where that would be None."""
+    if _use_db or _write_buffer is not None:
+        return None
+    _record_query("load_biometrics_bulk")
+    cutoff = _memory_cutoff(days)
+    return {u: _memory_store.frame(u, cutoff, columns) for u in user_ids}
+
+
+def iter_active_user_ids(days: int, batch: int = 5000) -> Iterator[str]:
+    """
+    Distinct user_ids with readings in the last ``days`` days, streamed with a
+    server-side cursor so the full list never sits in memory.  Holds one
+    pooled connection until the iterator is exhausted or closed.
+    """
+    _record_query("iter_active_user_ids")
+    if not _use_db:
+        cutoff = _memory_cutoff(days) + 1
+        for user_id in _memory_store.users():
+            if _memory_store.count(user_id, cutoff):
+                yield user_id
+        return
+    conn = _get_conn()
+    try:
+        with conn.cursor(name=f"active_users_{uuid.uuid4().hex[:8]}") as cur:
+            cur.itersize = batch
+            cur.execute(SELECT_ACTIVE_USERS_SQL, (days,))
+            for (user_id,) in cur:
+                yield user_id
+        conn.commit()
+    finally:
+        _put_conn(conn)
+
+
+def _utc_day_start(now: Optional[datetime] = None) -> datetime:
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _recent_rows(rows: List[dict], tail: int) -> List[dict]:
+    """Time-ordered ``rows`` cut to today's plus at least the newest ``tail``."""
+    if len(rows) <= tail:
+        return rows
+    today = epoch_ns(_utc_day_start())
+    lo = len(rows) - tail
+    while lo > 0 and epoch_ns(rows[lo - 1]["timestamp"]) >= today:
+        lo -= 1
+    return rows[lo:]
+
+
+@metrics.timed("history_load")
+def load_recent_biometrics(user_id: str, days: int, tail: int) -> List[dict]:
+    """Today's readings plus at least the newest ``tail`` in the last ``days``."""
+    _record_query("load_recent_biometrics")
     if not _use_db:
-        rows = _memory_biometrics.get(user_id, [])
-        if not rows:
-            return []
-        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-        filtered = [r for r in rows if isinstance(r.get("timestamp"), datetime) and r["timestamp"].astimezone(timezone.utc) >= cutoff]
-        return sorted(filtered, key=lambda r: r.get("timestamp") or datetime.now(timezone.utc))
+        return _recent_rows(_merge_pending(user_id, _memory_window(user_id, days), days), tail)
     conn = _get_conn()
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             cur.execute(
-                """
-                SELECT
-                    time        AS timestamp,
-                    hr_resting  AS heart_rate_resting,
-                    hrv_rmssd,
-                    spo2,
-                    resp_rate   AS respiratory_rate,
-                    step_count,
-                    active_cals AS active_calories,
-                    sleep_hrs   AS sleep_duration_hours,
-                    skin_temp   AS skin_temp_offset,
-                    ecg_rhythm,
-                    temp_trend  AS temperature_trend,
-                    alert_level,
-                    anomalies
-                FROM biometric_time_series
-                WHERE user_id = %s
-                  AND time > NOW() - INTERVAL '1 day' * %s
-                ORDER BY time ASC
-                """,
-                (user_id, days),
+                SELECT_RECENT_BIOMETRICS_SQL,
+                {"user_id": user_id, "days": days, "offset": max(tail, 1) - 1},
             )
-            rows = cur.fetchall()
-            return [dict(r) for r in rows]
+            rows = [dict(r) for r in cur.fetchall()]
+            return _recent_rows(_merge_pending(user_id, rows, days), tail)
+    finally:
+        _put_conn(conn)
+
+
+def rollup_rows_from_readings(rows: List[dict]) -> List[dict]:
+    """Aggregate reading rows into biometric_daily_rollup-shaped dicts."""
+    days: Dict[datetime, dict] = {}
+    for r in rows:
+        ts = r.get("timestamp")
+        if not isinstance(ts, datetime):
+            continue
+        ts = ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+        day = _utc_day_start(ts)
+        agg = days.get(day)
+        if agg is None:
+            agg = days[day] = {"day": day, "n": 0, "first_time": ts, "last_time": ts}
+            for field in ROLLUP_COLUMNS:
+                agg[f"{field}_n"], agg[f"{field}_sum"], agg[f"{field}_sumsq"] = 0, 0.0, 0.0
+        agg["n"] += 1
+        agg["first_time"] = min(agg["first_time"], ts)
+        agg["last_time"] = max(agg["last_time"], ts)
+        for field in ROLLUP_COLUMNS:
+            v = r.get(field)
+            if v is None:
+                continue
+            agg[f"{field}_n"] += 1
+            agg[f"{field}_sum"] += float(v)
+            agg[f"{field}_sumsq"] += float(v) * float(v)
+    return [days[d] for d in sorted(days)]
+
+
+@metrics.timed("rollup_load")
+def load_daily_rollups(user_id: str, days: int) -> List[dict]:
+    """
+    Rollup rows for the user's completed UTC days in the last ``days`` days
+    (today excluded), oldest first.  Keys: day, n, first_time, last_time and
+    ``<field>_n`` / ``<field>_sum`` / ``<field>_sumsq`` per ROLLUP_COLUMNS field.
+    """
+    _record_query("load_daily_rollups")
+    if not _use_db:
+        today = _utc_day_start()
+        floor = _utc_day_start(today - timedelta(days=days))
+        rows = _merge_pending(user_id, _memory_window(user_id, days + 1))
+        return [r for r in rollup_rows_from_readings(rows) if floor <= r["day"] < today]
+    conn = _get_conn()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(SELECT_DAILY_ROLLUPS_SQL, (user_id, days))
+            rows = [dict(r) for r in cur.fetchall()]
     finally:
         _put_conn(conn)
+    return _merge_pending_rollups(user_id, rows)
+
+
+def _merge_pending_rollups(user_id: str, rows: List[dict]) -> List[dict]:
+    """Fold queued write-behind readings from before today into ``rows``."""
+    if _write_buffer is None:
+        return rows
+    today = _utc_day_start()
+    pending = [
+        r for r in _write_buffer.pending(user_id)
+        if isinstance(r.get("timestamp"), datetime)
+        and (r["timestamp"] if r["timestamp"].tzinfo else r["timestamp"].replace(tzinfo=timezone.utc)) < today
+    ]
+    if not pending:
+        return rows
+    merged = {r["day"]: dict(r) for r in rows}
+    for extra in rollup_rows_from_readings(pending):
+        agg = merged.get(extra["day"])
+        if agg is None:
+            merged[extra["day"]] = extra
+            continue
+        agg["n"] += extra["n"]
+        agg["first_time"] = min(agg["first_time"], extra["first_time"])
+        agg["last_time"] = max(agg["last_time"], extra["last_time"])
+        for key in extra:
+            if key.endswith(("_n", "_sum", "_sumsq")) and key != "n":
+                agg[key] = (agg.get(key) or 0) + extra[key]
+    return [merged[d] for d in sorted(merged)]
+
 
+def _latest_with_pending(user_id: str, row: Optional[dict]) -> Optional[dict]:
+    if _write_buffer is None:
+        return row
+    rows = _merge_pending(user_id, [row] if row else [])
+    return rows[-1] if rows else None
 
+
+@metrics.timed("latest_load")
 def load_latest_biometric(user_id: str) -> Optional[dict]:
+    hit, latest, generation = _cached_latest(user_id)
+    if hit:
+        return _latest_with_pending(user_id, latest)
+    _record_query("load_latest_biometric")
     if not _use_db:
-        rows = _memory_biometrics.get(user_id, [])
-        if not rows:
-            return None
-        return max(rows, key=lambda r: r.get("timestamp") or datetime.min.replace(tzinfo=timezone.utc))
+        latest = _memory_store.latest(user_id)
+    else:
+        conn = _get_conn()
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute(SELECT_LATEST_BIOMETRIC_SQL, (user_id,))
+                row = cur.fetchone()
+                latest = dict(row) if row else None
+        finally:
+            _put_conn(conn)
+    _cache_latest(user_id, latest, generation)
+    return _latest_with_pending(user_id, latest)
+
+
+def load_latest_biometrics_bulk(user_ids: List[str]) -> Dict[str, dict]:
+    """load_latest_biometric for many users in one query; users without rows are omitted."""
+    if not user_ids:
+        return {}
+    _record_query("load_latest_biometrics_bulk")
+    if not _use_db:
+        out = {u: _memory_store.latest(u) for u in user_ids}
+    else:
+        conn = _get_conn()
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute(SELECT_LATEST_BIOMETRICS_BULK_SQL, (list(user_ids),))
+                out = {}
+                for r in cur.fetchall():
+                    row = dict(r)
+                    out[row.pop("user_id")] = row
+        finally:
+            _put_conn(conn)
+    out = {u: _latest_with_pending(u, out.get(u)) for u in user_ids}
+    return {u: row for u, row in out.items() if row}
+
+
+def _count_pending(user_id: str, days: int) -> int:
+    """Queued rows inside the window.  A batch committing concurrently with
+    the COUNT can be counted twice for that instant; the count is advisory."""
+    if _write_buffer is None:
+        return 0
+    return len(_merge_pending(user_id, [], days))
+
+
+@metrics.timed("history_count")
+def count_biometrics(user_id: str, days: int = 30) -> int:
+    cache = _cache()
+    cached = cache.count(user_id, days) if cache is not None else None
+    if cached is not None:
+        return cached + _count_pending(user_id, days)
+    _record_query("count_biometrics")
+    if not _use_db:
+        return _memory_store.count(user_id, _memory_cutoff(days)) + _count_pending(user_id, days)
+    conn = _get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(COUNT_BIOMETRICS_SQL, (user_id, days))
+            result = cur.fetchone()
+            return (int(result[0]) if result else 0) + _count_pending(user_id, days)
+    finally:
+        _put_conn(conn)
+
+
+# ---------------------------------------------------------------------------
+# Materialised latest summary
+# ---------------------------------------------------------------------------
+SELECT_SUMMARY_SQL = """
+SELECT reading_time, summary_key, computed_at, summary::text AS summary
+FROM early_warning_summaries
+WHERE user_id = %s
+"""
+
+# Never replace a summary of a newer reading with one of an older reading
+UPSERT_SUMMARY_SQL = """
+INSERT INTO early_warning_summaries (user_id, reading_time, summary_key, computed_at, summary)
+VALUES (%s, %s, %s, %s, %s::jsonb)
+ON CONFLICT (user_id) DO UPDATE SET
+    reading_time = EXCLUDED.reading_time,
+    summary_key  = EXCLUDED.summary_key,
+    computed_at  = EXCLUDED.computed_at,
+    summary      = EXCLUDED.summary
+WHERE early_warning_summaries.reading_time <= EXCLUDED.reading_time
+"""
+
+
+def _keep_summary(user_id: str, reading_time: datetime) -> bool:
+    current = _memory_summaries.get(user_id)
+    return current is None or epoch_ns(current["reading_time"]) <= epoch_ns(reading_time)
+
+
+@metrics.timed("summary_load")
+def load_summary(user_id: str) -> Optional[dict]:
+    """Stored summary row: reading_time, summary_key, computed_at, summary (JSON text)."""
+    _record_query("load_summary")
+    if not _use_db:
+        row = _memory_summaries.get(user_id)
+        return dict(row) if row else None
     conn = _get_conn()
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(
-                """
-                SELECT
-                    time        AS timestamp,
-                    hr_resting  AS heart_rate_resting,
-                    hrv_rmssd,
-                    spo2,
-                    resp_rate   AS respiratory_rate,
-                    step_count,
-                    active_cals AS active_calories,
-                    sleep_hrs   AS sleep_duration_hours,
-                    skin_temp   AS skin_temp_offset,
-                    ecg_rhythm,
-                    temp_trend  AS temperature_trend,
-                    alert_level,
-                    anomalies
-                FROM biometric_time_series
-                WHERE user_id = %s
-                ORDER BY time DESC
-                LIMIT 1
-                """,
-                (user_id,),
-            )
+            cur.execute(SELECT_SUMMARY_SQL, (user_id,))
             row = cur.fetchone()
             return dict(row) if row else None
     finally:
         _put_conn(conn)
 
 
-def count_biometrics(user_id: str, days: int = 30) -> int:
+@metrics.timed("summary_save")
+def save_summary(user_id: str, reading_time: datetime, summary_key: str, summary: str) -> None:
+    _record_query("save_summary")
+    computed_at = datetime.now(timezone.utc)
     if not _use_db:
-        return len(load_biometrics(user_id, days=days))
+        if _keep_summary(user_id, reading_time):
+            _memory_summaries[user_id] = {
+                "reading_time": reading_time, "summary_key": summary_key,
+                "computed_at": computed_at, "summary": summary,
+            }
+        return
     conn = _get_conn()
     try:
         with conn.cursor() as cur:
             cur.execute(
-                """
-                SELECT COUNT(*)
-                FROM biometric_time_series
-                WHERE user_id = %s
-                  AND time > NOW() - INTERVAL '1 day' * %s
-                """,
-                (user_id, days),
+                UPSERT_SUMMARY_SQL,
+                (user_id, reading_time, summary_key, computed_at, summary),
             )
-            result = cur.fetchone()
-            return int(result[0]) if result else 0
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         _put_conn(conn)
 
@@ -316,57 +1392,128 @@ def count_biometrics(user_id: str, days: int = 30) -> int:
 # Context (CVD risk profile) — stored in User.riskProfile JSON via Prisma
 # We read it directly from the shared PostgreSQL users table.
 # ---------------------------------------------------------------------------
+SELECT_CONTEXT_SQL = 'SELECT "riskProfile" FROM users WHERE id = %s'
+UPDATE_CONTEXT_SQL = 'UPDATE users SET "riskProfile" = %s::jsonb WHERE id = %s'
+
+
+def profile_from_risk_json(value) -> Optional[ContextualProfile]:
+    """Build a ContextualProfile from a users."riskProfile" value (dict or JSON text)."""
+    if not value:
+        return None
+    profile_data = value if isinstance(value, dict) else json.loads(value)
+    # Build ContextualProfile — default age 50 if not stored
+    return ContextualProfile(
+        age=int(profile_data.get("age", 50)),
+        smoker=bool(profile_data.get("smoker", False)),
+        hypertension=bool(profile_data.get("hypertension", False)),
+        cholesterol_known=bool(profile_data.get("cholesterolKnown", False)),
+        cholesterol_mmol_per_L=profile_data.get("cholesterolValue"),
+    )
+
+
+def risk_json_from_profile(profile: ContextualProfile) -> str:
+    return json.dumps({
+        "age": profile.age,
+        "smoker": profile.smoker,
+        "hypertension": profile.hypertension,
+        "cholesterolKnown": profile.cholesterol_known,
+        "cholesterolValue": profile.cholesterol_mmol_per_L,
+    })
+
+
+SELECT_CONTEXTS_BULK_SQL = 'SELECT id, "riskProfile" FROM users WHERE id = ANY(%s)'
+
+
+def load_contexts_bulk(user_ids: List[str]) -> Dict[str, Optional[ContextualProfile]]:
+    """load_context for many users in one query (bypasses the context cache)."""
+    if not user_ids:
+        return {}
+    _record_query("load_contexts_bulk")
+    if not _use_db:
+        return {u: _memory_context.get(u) for u in user_ids}
+    out: Dict[str, Optional[ContextualProfile]] = {u: None for u in user_ids}
+    conn = _get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SELECT_CONTEXTS_BULK_SQL, (list(user_ids),))
+            for user_id, value in cur.fetchall():
+                try:
+                    out[user_id] = profile_from_risk_json(value)
+                except Exception as e:
+                    logger.warning("[db] Ignoring unreadable riskProfile for %s: %s", user_id, e)
+    finally:
+        _put_conn(conn)
+    return out
+
+
+def _cached_context(user_id: str) -> Tuple[bool, Optional[ContextualProfile], Optional[int]]:
+    """(hit, profile, generation token for _cache_context after a miss)."""
+    if _context_cache is None or not _listening():
+        return False, None, None
+    generation = _context_cache.generation()
+    hit, profile = _context_cache.get(user_id)
+    return hit, profile, generation
+
+
+def _cache_context(user_id: str, profile: Optional[ContextualProfile],
+                   generation: Optional[int]) -> None:
+    if generation is not None and _context_cache is not None:
+        _context_cache.store(user_id, profile, generation)
+
+
+def _context_saved(user_id: str, profile: ContextualProfile, updated: bool) -> None:
+    """Write-through after save_context; ``updated`` is False if no users row matched."""
+    if _context_cache is None:
+        return
+    if updated:
+        _context_cache.put(user_id, profile)
+    else:
+        _context_cache.invalidate(user_id)
+
+
+@metrics.timed("context_load")
 def load_context(user_id: str) -> Optional[ContextualProfile]:
+    hit, profile, generation = _cached_context(user_id)
+    if hit:
+        return profile
+    _record_query("load_context")
     if not _use_db:
-        return _memory_context.get(user_id)
+        profile = _memory_context.get(user_id)
+        _cache_context(user_id, profile, generation)
+        return profile
     conn = _get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                'SELECT "riskProfile" FROM users WHERE id = %s',
-                (user_id,),
-            )
+            cur.execute(SELECT_CONTEXT_SQL, (user_id,))
             row = cur.fetchone()
-            if not row or not row[0]:
-                return None
-            profile_data = row[0] if isinstance(row[0], dict) else json.loads(row[0])
-            # Build ContextualProfile — default age 50 if not stored
-            return ContextualProfile(
-                age=int(profile_data.get("age", 50)),
-                smoker=bool(profile_data.get("smoker", False)),
-                hypertension=bool(profile_data.get("hypertension", False)),
-                cholesterol_known=bool(profile_data.get("cholesterolKnown", False)),
-                cholesterol_mmol_per_L=profile_data.get("cholesterolValue"),
-            )
+            profile = profile_from_risk_json(row[0] if row else None)
     except Exception as e:
+        # Not cached: a failed read must not become a negative entry
         logger.warning("[db] load_context failed for %s: %s", user_id, e)
         return None
     finally:
         _put_conn(conn)
+    _cache_context(user_id, profile, generation)
+    return profile
 
 
+@metrics.timed("context_save")
 def save_context(user_id: str, profile: ContextualProfile) -> None:
     """Persist context back to User.riskProfile column."""
+    _record_query("save_context")
     if not _use_db:
         _memory_context[user_id] = profile
+        _context_saved(user_id, profile, True)
         return
     conn = _get_conn()
     try:
-        profile_json = json.dumps({
-            "age": profile.age,
-            "smoker": profile.smoker,
-            "hypertension": profile.hypertension,
-            "cholesterolKnown": profile.cholesterol_known,
-            "cholesterolValue": profile.cholesterol_mmol_per_L,
-        })
         with conn.cursor() as cur:
-            cur.execute(
-                'UPDATE users SET "riskProfile" = %s::jsonb WHERE id = %s',
-                (profile_json, user_id),
-            )
+            cur.execute(UPDATE_CONTEXT_SQL, (risk_json_from_profile(profile), user_id))
+            updated = cur.rowcount > 0
         conn.commit()
     except Exception:
         conn.rollback()
         raise
     finally:
         _put_conn(conn)
+    _context_saved(user_id, profile, updated)
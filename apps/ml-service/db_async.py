@@ -0,0 +1,344 @@
+"""
+Async persistence layer for the ML Early Warning Service request path.
+
+Mirrors the public functions of db.py (same names, arguments and return
+shapes) on top of a psycopg 3 AsyncConnectionPool, so FastAPI handlers can
+await storage instead of parking a threadpool thread on every psycopg2 call.
+The pool queues waiters until a connection frees up rather than raising.
+
+SQL, row shaping and the query counter are shared with db.py.  When
+DATABASE_URL is unset every function delegates to db.py's in-memory store,
+so tests and local runs need no database.
+
+Requirements: psycopg[binary] and psycopg-pool (see requirements.txt).
+They are imported when the pool is first created, not with this module, so
+memory mode and the port bind at startup never pay for them (startup.py).
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
+
+import db
+import metrics
+from db_pool import PoolConfig, PoolTimeout
+from models import BiometricData, ContextualProfile
+
+if TYPE_CHECKING:
+    from psycopg_pool import AsyncConnectionPool
+
+logger = logging.getLogger(__name__)
+
+COPY_BIOMETRICS_SQL = (
+    f"COPY biometric_time_series ({db.BIOMETRIC_INSERT_COLUMNS}) FROM STDIN"
+)
+
+# ---------------------------------------------------------------------------
+# Connection pool (opened lazily inside the running event loop).  Uses the
+# same ML_DB_POOL_* settings as the sync pool in db.py.
+# ---------------------------------------------------------------------------
+_pool: Optional["AsyncConnectionPool"] = None
+_pool_lock = asyncio.Lock()
+
+# Bound on first pool creation (deferred import of psycopg 3)
+psycopg_pool = None
+dict_row = None
+
+
+async def _get_pool() -> "AsyncConnectionPool":
+    global _pool, psycopg_pool, dict_row
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                if not db._db_url:
+                    raise RuntimeError("DATABASE_URL environment variable not set")
+                import psycopg_pool
+                from psycopg.rows import dict_row
+                from psycopg_pool import AsyncConnectionPool
+                config = PoolConfig.from_env()
+                kwargs = {"application_name": db.WORKER_ID}
+                if config.connect_options:
+                    kwargs["options"] = config.connect_options
+                pool = AsyncConnectionPool(
+                    conninfo=db._db_url,
+                    min_size=max(1, config.min_size),
+                    max_size=config.max_size,
+                    timeout=config.timeout,
+                    max_idle=config.recycle_seconds,
+                    check=AsyncConnectionPool.check_connection,
+                    kwargs=kwargs,
+                    open=False,
+                )
+                await pool.open()
+                _pool = pool
+                logger.info(
+                    "[db_async] Connection pool created (min=%d max=%d timeout=%.1fs)",
+                    max(1, config.min_size), config.max_size, config.timeout,
+                )
+    return _pool
+
+
+@asynccontextmanager
+async def _connection() -> AsyncIterator:
+    """Borrow a pooled connection; exhaustion surfaces as db_pool.PoolTimeout."""
+    pool = await _get_pool()
+    try:
+        cm = pool.connection()
+        conn = await cm.__aenter__()
+    except psycopg_pool.PoolTimeout as e:
+        raise PoolTimeout(str(e)) from e
+    try:
+        yield conn
+    except BaseException as e:
+        if not await cm.__aexit__(type(e), e, e.__traceback__):
+            raise
+    else:
+        await cm.__aexit__(None, None, None)
+
+
+def pool_stats() -> Optional[Dict[str, float]]:
+    """psycopg_pool statistics for the async pool, or None before it is created."""
+    if _pool is None:
+        return None
+    stats = _pool.get_stats()
+    stats["max_size"] = _pool.max_size
+    return stats
+
+
+async def open() -> None:
+    """Create the pool ahead of the first request (startup warm-up)."""
+    await _get_pool()
+
+
+async def close() -> None:
+    """Close the pool; call from the application's shutdown hook."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+# ---------------------------------------------------------------------------
+# Write
+# ---------------------------------------------------------------------------
+async def save_biometric(
+    user_id: str,
+    data: BiometricData,
+    alert_level: str,
+    anomalies: list,
+) -> None:
+    await save_biometrics([(user_id, data, alert_level, anomalies)])
+
+
+async def save_biometrics(rows: List[Tuple[str, BiometricData, str, list]]) -> None:
+    """Persist many evaluated readings with one COPY (see db.save_biometrics)."""
+    if not rows:
+        return
+    buffer = db.write_behind()
+    if buffer is None and not db._use_db:
+        db.save_biometrics(rows)
+        return
+    with metrics.stage("save"):
+        if buffer is not None:
+            # Queue without blocking the event loop; wait in a thread only
+            # when the queue is full (backpressure)
+            if not buffer.offer(rows):
+                await asyncio.to_thread(buffer.put, rows)
+            return
+        db._record_query("save_biometrics")
+        async with _connection() as conn:
+            async with conn.cursor() as cur:
+                async with cur.copy(COPY_BIOMETRICS_SQL) as copy:
+                    for row in rows:
+                        values = db.biometric_values(*row)
+                        await copy.write_row(values[:-1] + (json.dumps(values[-1]),))
+    db._write_through(rows)
+
+
+# ---------------------------------------------------------------------------
+# Read
+# ---------------------------------------------------------------------------
+async def load_biometrics(user_id: str, days: int = 30) -> List[dict]:
+    if not db._use_db:
+        return db.load_biometrics(user_id, days=days)
+    with metrics.stage("history_load"):
+        cached, generation = db._cached_window(user_id, days)
+        if cached is not None:
+            return db._merge_pending(user_id, cached, days)
+        db._record_query("load_biometrics")
+        async with _connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(db.SELECT_BIOMETRICS_SQL, (user_id, days))
+                rows = await cur.fetchall()
+        db._cache_window(user_id, days, rows, generation)
+        return db._merge_pending(user_id, rows, days)
+
+
+async def load_latest_biometric(user_id: str) -> Optional[dict]:
+    if not db._use_db:
+        return db.load_latest_biometric(user_id)
+    with metrics.stage("latest_load"):
+        hit, row, generation = db._cached_latest(user_id)
+        if hit:
+            return db._latest_with_pending(user_id, row)
+        db._record_query("load_latest_biometric")
+        async with _connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(db.SELECT_LATEST_BIOMETRIC_SQL, (user_id,))
+                row = await cur.fetchone()
+        db._cache_latest(user_id, row, generation)
+        return db._latest_with_pending(user_id, row)
+
+
+async def load_biometrics_bulk(user_ids: List[str], days: int) -> Dict[str, List[dict]]:
+    if not db._use_db or not user_ids:
+        return db.load_biometrics_bulk(user_ids, days)
+    with metrics.stage("history_load"):
+        db._record_query("load_biometrics_bulk")
+        out: Dict[str, List[dict]] = {}
+        async with _connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(db.SELECT_BIOMETRICS_BULK_SQL, (list(user_ids), days))
+                for row in await cur.fetchall():
+                    out.setdefault(row.pop("user_id"), []).append(row)
+        return {u: db._merge_pending(u, rows, days) for u, rows in out.items()}
+
+
+async def load_latest_biometrics_bulk(user_ids: List[str]) -> Dict[str, dict]:
+    if not db._use_db or not user_ids:
+        return db.load_latest_biometrics_bulk(user_ids)
+    with metrics.stage("latest_load"):
+        db._record_query("load_latest_biometrics_bulk")
+        async with _connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(db.SELECT_LATEST_BIOMETRICS_BULK_SQL, (list(user_ids),))
+                out = {row.pop("user_id"): row for row in await cur.fetchall()}
+        out = {u: db._latest_with_pending(u, out.get(u)) for u in user_ids}
+        return {u: row for u, row in out.items() if row}
+
+
+async def load_recent_biometrics(user_id: str, days: int, tail: int) -> List[dict]:
+    if not db._use_db:
+        return db.load_recent_biometrics(user_id, days, tail)
+    with metrics.stage("history_load"):
+        db._record_query("load_recent_biometrics")
+        async with _connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(
+                    db.SELECT_RECENT_BIOMETRICS_SQL,
+                    {"user_id": user_id, "days": days, "offset": max(tail, 1) - 1},
+                )
+                rows = db._merge_pending(user_id, await cur.fetchall(), days)
+                return db._recent_rows(rows, tail)
+
+
+async def load_daily_rollups(user_id: str, days: int) -> List[dict]:
+    if not db._use_db:
+        return db.load_daily_rollups(user_id, days)
+    with metrics.stage("rollup_load"):
+        db._record_query("load_daily_rollups")
+        async with _connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(db.SELECT_DAILY_ROLLUPS_SQL, (user_id, days))
+                rows = await cur.fetchall()
+        return db._merge_pending_rollups(user_id, rows)
+
+
+async def count_biometrics(user_id: str, days: int = 30) -> int:
+    if not db._use_db:
+        return db.count_biometrics(user_id, days=days)
+    with metrics.stage("history_count"):
+        cached, _ = db._cached_window(user_id, days)
+        if cached is not None:
+            return len(cached) + db._count_pending(user_id, days)
+        db._record_query("count_biometrics")
+        async with _connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(db.COUNT_BIOMETRICS_SQL, (user_id, days))
+                result = await cur.fetchone()
+                return (int(result[0]) if result else 0) + db._count_pending(user_id, days)
+
+
+# ---------------------------------------------------------------------------
+# Materialised latest summary
+# ---------------------------------------------------------------------------
+async def load_summary(user_id: str) -> Optional[dict]:
+    if not db._use_db:
+        return db.load_summary(user_id)
+    with metrics.stage("summary_load"):
+        db._record_query("load_summary")
+        async with _connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(db.SELECT_SUMMARY_SQL, (user_id,))
+                return await cur.fetchone()
+
+
+async def save_summary(user_id: str, reading_time: datetime, summary_key: str, summary: str) -> None:
+    if not db._use_db:
+        db.save_summary(user_id, reading_time, summary_key, summary)
+        return
+    with metrics.stage("summary_save"):
+        db._record_query("save_summary")
+        async with _connection() as conn:
+            await conn.execute(
+                db.UPSERT_SUMMARY_SQL,
+                (user_id, reading_time, summary_key, datetime.now(timezone.utc), summary),
+            )
+
+
+# ---------------------------------------------------------------------------
+# Context (CVD risk profile)
+# ---------------------------------------------------------------------------
+async def load_context(user_id: str) -> Optional[ContextualProfile]:
+    if not db._use_db:
+        return db.load_context(user_id)
+    with metrics.stage("context_load"):
+        hit, profile, generation = db._cached_context(user_id)
+        if hit:
+            return profile
+        db._record_query("load_context")
+        try:
+            async with _connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(db.SELECT_CONTEXT_SQL, (user_id,))
+                    row = await cur.fetchone()
+                    profile = db.profile_from_risk_json(row[0] if row else None)
+        except Exception as e:
+            logger.warning("[db_async] load_context failed for %s: %s", user_id, e)
+            return None
+        db._cache_context(user_id, profile, generation)
+        return profile
+
+
+async def load_contexts_bulk(user_ids: List[str]) -> Dict[str, Optional[ContextualProfile]]:
+    if not db._use_db or not user_ids:
+        return db.load_contexts_bulk(user_ids)
+    with metrics.stage("context_load"):
+        db._record_query("load_contexts_bulk")
+        out: Dict[str, Optional[ContextualProfile]] = {u: None for u in user_ids}
+        async with _connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(db.SELECT_CONTEXTS_BULK_SQL, (list(user_ids),))
+                for user_id, value in await cur.fetchall():
+                    try:
+                        out[user_id] = db.profile_from_risk_json(value)
+                    except Exception as e:
+                        logger.warning("[db_async] Ignoring unreadable riskProfile for %s: %s", user_id, e)
+        return out
+
+
+async def save_context(user_id: str, profile: ContextualProfile) -> None:
+    if not db._use_db:
+        db.save_context(user_id, profile)
+        return
+    with metrics.stage("context_save"):
+        db._record_query("save_context")
+        async with _connection() as conn:
+            cur = await conn.execute(
+                db.UPDATE_CONTEXT_SQL, (db.risk_json_from_profile(profile), user_id)
+            )
+            updated = cur.rowcount > 0
+        db._context_saved(user_id, profile, updated)
@@ -0,0 +1,274 @@
+"""
+PostgreSQL connection pool for db.py.
+
+psycopg2's ThreadedConnectionPool raises PoolError the moment every
+connection is checked out, which surfaced as HTTP 500s from /ingest under
+webhook bursts.  This pool instead makes callers wait (up to a timeout) for
+a connection to be returned, checks a connection's health before handing it
+out, recycles connections that have sat idle too long, and keeps counters
+for acquire wait time, connections in use and exhaustion.
+
+Configuration (environment, shared with the async pool in db_async.py):
+
+    ML_DB_POOL_MIN                  connections opened up front      (default 1)
+    ML_DB_POOL_MAX                  hard cap on open connections     (default 10)
+    ML_DB_POOL_TIMEOUT_SECONDS      max wait for a free connection   (default 10)
+    ML_DB_POOL_RECYCLE_SECONDS      close connections idle this long (default 300)
+    ML_DB_STATEMENT_TIMEOUT_MS      server-side statement_timeout, 0 = off (default 15000);
+                                    schema and storage upkeep lift it per transaction
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+# Idle connections older than this are pinged with SELECT 1 before reuse
+_PING_AFTER_SECONDS = 30.0
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the acquire timeout."""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        logger.warning("[db_pool] Ignoring non-integer %s", name)
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        logger.warning("[db_pool] Ignoring non-numeric %s", name)
+        return default
+
+
+class PoolConfig:
+    def __init__(
+        self,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 10.0,
+        recycle_seconds: float = 300.0,
+        statement_timeout_ms: int = 15000,
+    ):
+        self.max_size = max(1, max_size)
+        self.min_size = max(0, min(min_size, self.max_size))
+        self.timeout = timeout
+        self.recycle_seconds = recycle_seconds
+        self.statement_timeout_ms = statement_timeout_ms
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        return cls(
+            min_size=_env_int("ML_DB_POOL_MIN", 1),
+            max_size=_env_int("ML_DB_POOL_MAX", 10),
+            timeout=_env_float("ML_DB_POOL_TIMEOUT_SECONDS", 10.0),
+            recycle_seconds=_env_float("ML_DB_POOL_RECYCLE_SECONDS", 300.0),
+            statement_timeout_ms=_env_int("ML_DB_STATEMENT_TIMEOUT_MS", 15000),
+        )
+
+    @property
+    def connect_options(self) -> Optional[str]:
+        """libpq ``options`` value applying the statement timeout, if any."""
+        if self.statement_timeout_ms > 0:
+            return f"-c statement_timeout={self.statement_timeout_ms}"
+        return None
+
+
+class ConnectionPool:
+    """Thread-safe, blocking psycopg2 pool with health checks and metrics."""
+
+    def __init__(self, dsn: str, config: Optional[PoolConfig] = None, **connect_kwargs):
+        self.dsn = dsn
+        self.config = config or PoolConfig.from_env()
+        self._connect_kwargs = connect_kwargs  # extra psycopg2.connect() arguments
+        self._cond = threading.Condition()
+        # (connection, returned_at) — most recently returned at the right
+        self._idle: Deque[Tuple[object, float]] = deque()
+        self._size = 0        # open connections, idle + in use
+        self._waiting = 0
+        self._closed = False
+        # Counters
+        self.acquired_total = 0
+        self.acquire_wait_seconds_total = 0.0
+        self.acquire_wait_seconds_max = 0.0
+        self.exhausted_total = 0   # acquires that found no free connection
+        self.timeouts_total = 0
+        self.created_total = 0
+        self.discarded_total = 0   # broken, unhealthy or recycled connections
+
+    # ------------------------------------------------------------------
+    # Connection lifecycle
+    # ------------------------------------------------------------------
+    def _connect(self):
+        kwargs = dict(self._connect_kwargs)
+        if self.config.connect_options:
+            kwargs["options"] = self.config.connect_options
+        conn = psycopg2.connect(self.dsn, **kwargs)
+        with self._cond:
+            self.created_total += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        with self._cond:
+            self.discarded_total += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, idle_for: float) -> bool:
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if idle_for >= _PING_AFTER_SECONDS:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    def prewarm(self) -> None:
+        """Open connections up to the configured minimum."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.config.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    # ------------------------------------------------------------------
+    # Acquire / release
+    # ------------------------------------------------------------------
+    def getconn(self, timeout: Optional[float] = None):
+        timeout = self.config.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+        while True:
+            conn = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("connection pool is closed")
+                while not self._idle and self._size >= self.config.max_size:
+                    if not waited:
+                        waited = True
+                        self.exhausted_total += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts_total += 1
+                        raise PoolTimeout(
+                            f"no database connection free after {timeout:.1f}s "
+                            f"(pool max {self.config.max_size})"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                idle_for = time.monotonic() - returned_at
+                if idle_for >= self.config.recycle_seconds or not self._healthy(conn, idle_for):
+                    self._discard(conn)
+                    with self._cond:
+                        self._size -= 1
+                    continue
+
+            wait = time.monotonic() - started
+            with self._cond:
+                self.acquired_total += 1
+                self.acquire_wait_seconds_total += wait
+                if wait > self.acquire_wait_seconds_max:
+                    self.acquire_wait_seconds_max = wait
+            return conn
+
+    def putconn(self, conn, close: bool = False) -> None:
+        if not close and not conn.closed:
+            status = conn.get_transaction_status()
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    close = True
+        with self._cond:
+            if close or conn.closed or self._closed:
+                self._size -= 1
+                discard = True
+            else:
+                self._idle.append((conn, time.monotonic()))
+                discard = False
+            self._cond.notify()
+        if discard:
+            self._discard(conn)
+
+    def closeall(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "waiting": self._waiting,
+                "max_size": self.config.max_size,
+                "acquired_total": self.acquired_total,
+                "acquire_wait_seconds_total": round(self.acquire_wait_seconds_total, 6),
+                "acquire_wait_seconds_max": round(self.acquire_wait_seconds_max, 6),
+                "exhausted_total": self.exhausted_total,
+                "timeouts_total": self.timeouts_total,
+                "created_total": self.created_total,
+                "discarded_total": self.discarded_total,
+            }
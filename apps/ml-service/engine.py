@@ -6,29 +6,32 @@ Key changes vs original:
 - Progressive baseline: Day-1 value using SA demographic seeds, blended
   progressively as personal data accumulates (4-stage: PROVISIONAL →
   CALIBRATING → PERSONALISING → PERSONAL)
-- ensure_schema() called at import so the hypertable is always ready
+- Importing does no database I/O; main's lifespan ensures the schema in the
+  background (startup.py)
 """
 
+import asyncio
+import logging
+import os
 import numpy as np
-import pandas as pd
-from typing import List, Dict, Tuple, Optional
-from datetime import datetime, timedelta
+from typing import List, Dict, Tuple, Optional, Sequence
+from datetime import datetime, timezone
 import hashlib
 from models import (
     BiometricData, AlertLevel, ContextualProfile,
     RiskScores, FusionOutput, EarlyWarningSummary,
     UncertaintyProfile, ClinicalProvenance,
 )
+import cvd_model
 import db
+import db_async
+import metrics
+from baseline_state import BaselineStateStore, UserBaselineState
+from batch_stats import round_like_python
+from daily_rollup import DailyRollup
+from history_frame import DAY_NS, HistoryFrame, epoch_ns, now_ns
 
-# Call once at module load — creates hypertable if it doesn't exist yet
-try:
-    db.ensure_schema()
-except Exception as _schema_err:
-    import logging
-    logging.getLogger(__name__).warning(
-        "[engine] Could not ensure DB schema on startup: %s", _schema_err
-    )
+logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # SA Demographic seed baselines (WHO / SA NDoH sub-Saharan African cohort norms)
@@ -75,13 +78,6 @@ def _get_demographic_seed(age: int = 45, gender: str = "unknown") -> Dict[str, D
     }
 
 
-def _blend_seed(personal: Dict[str, float], demo_mean: float, demo_std: float,
-                weight: float) -> Tuple[float, float]:
-    blended_mean = personal["mean"] * weight + demo_mean * (1.0 - weight)
-    blended_std  = personal["std"]  * weight + demo_std  * (1.0 - weight)
-    return blended_mean, max(blended_std, 0.1)
-
-
 def _dict_to_biometric(row: dict) -> BiometricData:
     return BiometricData(
         timestamp=row.get("timestamp", datetime.utcnow()),
@@ -97,33 +93,194 @@ def _dict_to_biometric(row: dict) -> BiometricData:
         temperature_trend=row.get("temperature_trend") or "normal",
     )
 
+def _utc(ts: datetime) -> datetime:
+    """Treat naive timestamps as UTC so mixed inputs sort consistently."""
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
 # Numeric columns used for baseline/trend
 BASELINE_METRICS = [
     "heart_rate_resting", "hrv_rmssd", "spo2", "respiratory_rate",
     "step_count", "active_calories", "sleep_duration_hours",
 ]
 
+_UNSET = object()
+
+ENGINE_VERSION = "early-warning-v2.1.0"
+
+_FUSION_ALERT_MESSAGE = "High cardiovascular risk detected. Recommend clinical follow-up."
+
+# Where baselines, history counts and spans come from:
+#   raw    — every raw reading in the window (default)
+#   rollup — biometric_daily_rollup for completed days + today's raw readings;
+#            only a short tail of raw readings is loaded (see daily_rollup.py)
+_BASELINE_SOURCE = (os.getenv("ML_BASELINE_SOURCE", "raw") or "raw").strip().lower()
+_USE_ROLLUPS = _BASELINE_SOURCE == "rollup"
+# Raw readings loaded in rollup mode besides today's (trend / exercise checks)
+_RAW_TAIL_ROWS = max(14, int(os.getenv("ML_BASELINE_RAW_TAIL_ROWS", "200") or 200))
+
+# Materialised latest summary (early_warning_summaries): served by
+# /early-warning/summary while its reading is still the user's latest, the
+# profile and model version are unchanged and it is younger than the max age
+_SUMMARY_STORE = os.getenv("ML_SUMMARY_STORE", "on").strip().lower() not in ("0", "off", "false", "no")
+_SUMMARY_MAX_AGE_SECONDS = float(os.getenv("ML_SUMMARY_MAX_AGE_SECONDS", "21600") or 21600)
+
+
+# ---------------------------------------------------------------------------
+# Per-request analysis context
+# ---------------------------------------------------------------------------
+class AnalysisContext:
+    """
+    One user's stored data for the duration of a single request.
+
+    History and risk profile are fetched from db.py at most once, however
+    many engine stages read them.  ``days`` is the widest window any stage
+    of the request needs; the history is held as one columnar HistoryFrame
+    and narrower windows are zero-copy views of it.  Readings stored during
+    the request are appended so later stages see them without another load.
+
+    In rollup mode (ML_BASELINE_SOURCE=rollup) the frame holds only today's
+    readings plus a short tail, and counts, spans and baseline statistics
+    come from ``rollup`` instead.
+    """
+
+    def __init__(self, user_id: str, days: int, history: Optional[List[dict]] = None,
+                 profile=_UNSET, rollups: Optional[List[dict]] = None,
+                 use_rollups: Optional[bool] = None, frame: Optional[HistoryFrame] = None):
+        self.user_id = user_id
+        self.days = days
+        self.use_rollups = _USE_ROLLUPS if use_rollups is None else use_rollups
+        self._rows = history
+        self._frame = frame
+        self._profile = profile
+        self._rollup_rows = rollups
+        self._rollup: Optional[DailyRollup] = None
+        # Readings stored during this request (folded into the rollup)
+        self._appended: List[dict] = []
+        # age -> blended baselines for every metric, filled by the engine
+        self.baselines: Dict[int, Dict[str, Tuple[float, float]]] = {}
+
+    @property
+    def frame(self) -> HistoryFrame:
+        """All readings in the loaded window, oldest first."""
+        if self._frame is None:
+            rows = self._rows
+            if rows is None:
+                if self.use_rollups:
+                    rows = db.load_recent_biometrics(self.user_id, self.days, _RAW_TAIL_ROWS)
+                else:
+                    frame = db.load_history_frame(self.user_id, self.days, BASELINE_METRICS)
+                    if frame is not None:
+                        self._frame = frame
+                        return frame
+                    rows = db.load_biometrics(self.user_id, days=self.days)
+            with metrics.stage("history_frame"):
+                self._frame = HistoryFrame.from_rows(rows, BASELINE_METRICS)
+            self._rows = None
+        return self._frame
+
+    @property
+    def rollup(self) -> DailyRollup:
+        """Completed-day rollups with today's raw readings folded in."""
+        if self._rollup is None:
+            rows = self._rollup_rows
+            if rows is None:
+                rows = self._rollup_rows = db.load_daily_rollups(self.user_id, self.days)
+            now = now_ns()
+            today = now - now % DAY_NS
+            rollup = DailyRollup.from_rows(rows, BASELINE_METRICS).add_frame(
+                self.frame.since(today - 1)
+            )
+            # Backfilled readings stored this request belong to completed days
+            older = [r for r in self._appended if epoch_ns(r["timestamp"]) < today]
+            if older:
+                rollup = rollup.add_frame(HistoryFrame.from_rows(older, BASELINE_METRICS))
+            self._rollup = rollup
+        return self._rollup
+
+    def count(self, days: int) -> int:
+        """Number of readings in the last ``days`` days."""
+        if self.use_rollups:
+            return self.rollup.size_since(now_ns() - days * DAY_NS)
+        return len(self.window(days))
+
+    def span_days(self, days: int) -> float:
+        """Days between the oldest and newest reading in the last ``days`` days."""
+        if self.use_rollups:
+            return self.rollup.span_days_since(now_ns() - days * DAY_NS)
+        return self.window(days).span_days()
+
+    def window(self, days: int) -> HistoryFrame:
+        """
+        Readings newer than ``days`` ago, matching db.load_biometrics(days=days).
+        Always trimmed (a zero-copy view): backfilled readings older than the
+        load window are appended to the frame too, and the baseline state's
+        agreement check must not count them.
+        """
+        return self.frame.since(now_ns() - days * DAY_NS)
+
+    @property
+    def profile(self) -> Optional[ContextualProfile]:
+        if self._profile is _UNSET:
+            self._profile = db.load_context(self.user_id)
+        return self._profile
+
+    @profile.setter
+    def profile(self, value: Optional[ContextualProfile]) -> None:
+        self._profile = value
+        self.baselines.clear()
+
+    @property
+    def age(self) -> int:
+        return self.profile.age if self.profile else 45
+
+    def append(self, row: dict) -> None:
+        """Record a reading stored during this request."""
+        self.frame.append(row)
+        self.baselines.clear()
+        if self.use_rollups:
+            self._appended.append(row)
+            self._rollup = None
+
 
 class EarlyWarningEngine:
     def __init__(self):
-        self.MODEL_VERSION = "early-warning-v2.1.0"
         self.MIN_BASELINE_DAYS = 14
         self.ROLLING_WINDOW_DAYS = 7
         self.SIGMA_YELLOW = 1.5
         self.SIGMA_RED = 2.5
         self.HIGH_ACTIVITY_STEPS_PERCENTILE = 90
+        self.HISTORY_DAYS = self.MIN_BASELINE_DAYS + self.ROLLING_WINDOW_DAYS + 1
+        self.BASELINE_INFO_DAYS = 30
+        self.TREND_DAYS = 14
+        self.FEATURE_TREND_READINGS = 14
+        self._baselines = BaselineStateStore(
+            BASELINE_METRICS, self.ROLLING_WINDOW_DAYS, self.HISTORY_DAYS,
+            trend_metric="heart_rate_resting", trend_days=self.TREND_DAYS,
+            tail_size=self.FEATURE_TREND_READINGS,
+            percentile_metric="step_count", percentile=self.HIGH_ACTIVITY_STEPS_PERCENTILE,
+        )
+
+    @property
+    def MODEL_VERSION(self) -> str:
+        """Engine version, plus the trained CVD artifact's hash when one is loaded."""
+        model = cvd_model.get()
+        return f"{ENGINE_VERSION}+{model.version}" if model is not None else ENGINE_VERSION
+
+    def analysis_context(self, user_id: str, days: Optional[int] = None) -> AnalysisContext:
+        """Start a per-request context; pass it to every engine call in the request."""
+        return AnalysisContext(user_id, days or self.HISTORY_DAYS)
 
     def _estimate_uncertainty(
         self,
-        history: List[dict],
-        profile: Optional[ContextualProfile],
+        ctx: AnalysisContext,
         data: BiometricData,
         alert_level: AlertLevel,
     ) -> UncertaintyProfile:
         reasons: List[str] = []
         score = 0.0
+        profile = ctx.profile
 
-        data_points = len(history)
+        data_points = len(ctx.window(self.HISTORY_DAYS))
         if data_points < 7:
             score += 0.35
             reasons.append("SPARSE_HISTORY")
@@ -149,6 +306,7 @@ class EarlyWarningEngine:
         score = max(0.0, min(1.0, round(score, 3)))
         return UncertaintyProfile(score=score, reasons=reasons)
 
+    @metrics.timed("provenance")
     def _build_provenance(
         self,
         user_id: str,
@@ -180,28 +338,80 @@ class EarlyWarningEngine:
     # ------------------------------------------------------------------
     # Ingest — persist then evaluate
     # ------------------------------------------------------------------
-    def ingest(self, user_id: str, data: BiometricData) -> Tuple[AlertLevel, List[str]]:
+    def ingest(
+        self, user_id: str, data: BiometricData,
+        ctx: Optional[AnalysisContext] = None,
+    ) -> Tuple[AlertLevel, List[str]]:
         """Store a new data point, then evaluate. Returns (AlertLevel, anomalies)."""
-        alert_level, anomalies = self._evaluate(user_id, data)
+        ctx = ctx or self.analysis_context(user_id)
+        alert_level, anomalies = self._evaluate(ctx, data)
         db.save_biometric(user_id, data, alert_level.value, anomalies)
+        row = db.biometric_row(data, alert_level.value, anomalies)
+        self._baselines.push(user_id, row)
+        ctx.append(row)
         return alert_level, anomalies
 
+    def ingest_batch(
+        self, readings: List[Tuple[str, BiometricData]]
+    ) -> List[Tuple[AlertLevel, List[str]]]:
+        """
+        Evaluate and store many readings, possibly for many users.
+
+        History and context are loaded once per user; each user's readings are
+        evaluated in timestamp order against that history plus the readings
+        before them in the batch, then everything is written in one INSERT.
+        Results are returned in the same order as ``readings``.
+        """
+        contexts = {
+            user_id: self.analysis_context(user_id)
+            for user_id in dict.fromkeys(user_id for user_id, _ in readings)
+        }
+        results, rows = self._evaluate_batch(readings, contexts)
+        try:
+            db.save_biometrics(rows)
+        except Exception:
+            self._discard_batch_state(contexts)
+            raise
+        return results
+
+    def _evaluate_batch(
+        self, readings: List[Tuple[str, BiometricData]],
+        contexts: Dict[str, AnalysisContext],
+    ) -> Tuple[List[Tuple[AlertLevel, List[str]]], List[Tuple[str, BiometricData, str, list]]]:
+        """Evaluate each user's readings in timestamp order; returns (results, rows to save)."""
+        order = sorted(
+            range(len(readings)),
+            key=lambda i: (readings[i][0], _utc(readings[i][1].timestamp)),
+        )
+        results: List[Optional[Tuple[AlertLevel, List[str]]]] = [None] * len(readings)
+        rows: List[Tuple[str, BiometricData, str, list]] = []
+        for idx in order:
+            user_id, data = readings[idx]
+            ctx = contexts[user_id]
+            alert_level, anomalies = self._evaluate(ctx, data)
+            results[idx] = (alert_level, anomalies)
+            rows.append((user_id, data, alert_level.value, anomalies))
+            row = db.biometric_row(data, alert_level.value, anomalies)
+            self._baselines.push(user_id, row)
+            ctx.append(row)
+        return results, rows
+
+    def _discard_batch_state(self, contexts: Dict[str, AnalysisContext]) -> None:
+        """Baseline state already includes readings whose save failed."""
+        for user_id in contexts:
+            self._baselines.invalidate(user_id)
+
     # ------------------------------------------------------------------
     # Evaluate (read-only)
     # ------------------------------------------------------------------
-    def _evaluate(self, user_id: str, data: BiometricData) -> Tuple[AlertLevel, List[str]]:
-        history = db.load_biometrics(
-            user_id, days=self.MIN_BASELINE_DAYS + self.ROLLING_WINDOW_DAYS + 1
-        )
-        if not history:
+    @metrics.timed("evaluate")
+    def _evaluate(self, ctx: AnalysisContext, data: BiometricData) -> Tuple[AlertLevel, List[str]]:
+        if not ctx.count(self.HISTORY_DAYS):
             return AlertLevel.GREEN, ["No history yet — using population baseline"]
 
-        if self._is_exercise_context(history, data):
+        if self._is_exercise_context(ctx, data):
             return AlertLevel.GREEN, ["Suppressed: High physical activity detected"]
 
-        ctx = db.load_context(user_id)
-        age = ctx.age if ctx else 45
-
         anomalies: List[str] = []
         significant_deviations = 0
 
@@ -213,7 +423,7 @@ class EarlyWarningEngine:
         }
 
         for metric_name, (value, bad_direction) in metrics.items():
-            mean, std = self._calculate_blended_baseline(history, metric_name, age)
+            mean, std = self._calculate_blended_baseline(ctx, metric_name)
             if std == 0:
                 continue
             z_score = (value - mean) / std
@@ -241,70 +451,73 @@ class EarlyWarningEngine:
     # ------------------------------------------------------------------
     def _calculate_blended_baseline(
         self,
-        history: List[dict],
+        ctx: AnalysisContext,
         metric: str,
-        age: int = 45,
-        gender: str = "unknown",
+        age: Optional[int] = None,
     ) -> Tuple[float, float]:
+        baselines = self._blended_baselines(ctx, ctx.age if age is None else age)
+        if metric in baselines:
+            return baselines[metric]
+        return 70.0, 5.0
+
+    def _blended_baselines(
+        self, ctx: AnalysisContext, age: int, gender: str = "unknown",
+    ) -> Dict[str, Tuple[float, float]]:
+        """Blended (mean, std) for every metric in BASELINE_METRICS in one pass."""
+        if age not in ctx.baselines:
+            with metrics.stage("baseline"):
+                ctx.baselines[age] = self._compute_blended_baselines(ctx, age, gender)
+        return ctx.baselines[age]
+
+    def _compute_blended_baselines(
+        self, ctx: AnalysisContext, age: int, gender: str,
+    ) -> Dict[str, Tuple[float, float]]:
         demo = _get_demographic_seed(age, gender)
-        demo_mean = demo[metric]["mean"] if metric in demo else 70.0
-        demo_std  = demo[metric]["std"]  if metric in demo else 5.0
-
-        if not history:
-            return demo_mean, demo_std
-
-        df = pd.DataFrame(history)
-        if metric not in df.columns:
-            return demo_mean, demo_std
-
-        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
-        df = df.set_index("timestamp").sort_index()
-        series = df[metric].dropna()
-        if series.empty:
-            return demo_mean, demo_std
-
-        last_date    = df.index.max()
-        window_start = last_date - timedelta(days=self.ROLLING_WINDOW_DAYS)
-        recent = series[series.index >= window_start]
-        if recent.empty:
-            recent = series
-
-        p_mean = float(recent.mean())
-        p_std  = float(recent.std()) if len(recent) > 1 and recent.std() > 0 else demo_std
-
-        date_span_days = (
-            (df.index.max() - df.index.min()).total_seconds() / 86400
-        )
-        personal_weight = min(1.0, date_span_days / float(self.MIN_BASELINE_DAYS))
+        demo_mean = np.array([demo[m]["mean"] for m in BASELINE_METRICS], dtype=np.float64)
+        demo_std  = np.array([demo[m]["std"]  for m in BASELINE_METRICS], dtype=np.float64)
+
+        if ctx.use_rollups:
+            # Daily rollups: O(days) regardless of how many readings per day
+            size = ctx.count(self.HISTORY_DAYS)
+            if size:
+                count, p_mean, p_std = ctx.rollup.window_stats(self.ROLLING_WINDOW_DAYS)
+                span = ctx.span_days(self.HISTORY_DAYS)
+        else:
+            # Rolling state: O(1) regardless of how many readings the user has
+            state = self._baselines.state_for(ctx.user_id, ctx.window(self.HISTORY_DAYS))
+            size = state.size
+            if size:
+                count, p_mean, p_std = state.metric_stats()
+                span = state.span_days()
+        if size == 0:
+            mean, std = demo_mean, demo_std
+        else:
+            has_personal = count > 0
+            p_mean = np.where(has_personal, p_mean, demo_mean)
+            p_std  = np.where(np.isfinite(p_std) & (p_std > 0), p_std, demo_std)
+            weight = min(1.0, span / float(self.MIN_BASELINE_DAYS))
+            mean = np.where(has_personal, p_mean * weight + demo_mean * (1.0 - weight), demo_mean)
+            std  = np.where(has_personal, np.maximum(p_std * weight + demo_std * (1.0 - weight), 0.1), demo_std)
 
-        blended_mean, blended_std = _blend_seed(
-            {"mean": p_mean, "std": p_std}, demo_mean, demo_std, personal_weight
-        )
-        return blended_mean, max(blended_std, 0.1)
+        return {m: (float(mean[i]), float(std[i])) for i, m in enumerate(BASELINE_METRICS)}
 
     def _calculate_baseline(self, user_id: str, metric: str) -> Tuple[float, float]:
         """Convenience wrapper: load history from DB then delegate to blended baseline."""
-        history = db.load_biometrics(
-            user_id, days=self.MIN_BASELINE_DAYS + self.ROLLING_WINDOW_DAYS + 1
-        )
-        ctx = db.load_context(user_id)
-        age = ctx.age if ctx else 45
-        return self._calculate_blended_baseline(history, metric, age)
+        return self._calculate_blended_baseline(self.analysis_context(user_id), metric)
 
     # ------------------------------------------------------------------
     # Baseline confidence / stage
     # ------------------------------------------------------------------
-    def get_baseline_info(self, user_id: str) -> Dict:
-        history = db.load_biometrics(user_id, days=30)
-        if not history:
+    def get_baseline_info(self, user_id: str, ctx: Optional[AnalysisContext] = None) -> Dict:
+        ctx = ctx or self.analysis_context(user_id, self.BASELINE_INFO_DAYS)
+        data_points = ctx.count(self.BASELINE_INFO_DAYS)
+        if not data_points:
             return {
                 "stage": "PROVISIONAL", "confidence": 0, "data_points": 0,
                 "days_established": 0, "days_required": self.MIN_BASELINE_DAYS,
                 "label": _STAGE_LABELS["PROVISIONAL"],
             }
-        df = pd.DataFrame(history)
-        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
-        date_span = (df["timestamp"].max() - df["timestamp"].min()).total_seconds() / 86400
+        date_span = ctx.span_days(self.BASELINE_INFO_DAYS)
         confidence = int(min(100, (date_span / self.MIN_BASELINE_DAYS) * 100))
         if   confidence < 30:  stage = "PROVISIONAL"
         elif confidence < 60:  stage = "CALIBRATING"
@@ -312,7 +525,7 @@ class EarlyWarningEngine:
         else:                  stage = "PERSONAL"
         return {
             "stage": stage, "confidence": confidence,
-            "data_points": len(history), "days_established": round(date_span, 1),
+            "data_points": data_points, "days_established": round(date_span, 1),
             "days_required": self.MIN_BASELINE_DAYS, "label": _STAGE_LABELS[stage],
         }
 
@@ -323,24 +536,36 @@ class EarlyWarningEngine:
         latest = db.load_latest_biometric(user_id)
         if not latest:
             return 75, "PROVISIONAL", "STABLE"
-        _, anomalies = self._evaluate(user_id, _dict_to_biometric(latest))
+        # One 30-day load serves the evaluation, trend and baseline-info windows
+        ctx = self.analysis_context(user_id, self.BASELINE_INFO_DAYS)
+        return self._readiness(ctx, latest)
+
+    def _readiness(self, ctx: AnalysisContext, latest: dict) -> Tuple[int, str, str]:
+        _, anomalies = self._evaluate(ctx, _dict_to_biometric(latest))
         score = 100 - min(100, len(anomalies) * 15)
-        history = db.load_biometrics(user_id, days=14)
-        trend = self._calculate_trend(history)
-        info  = self.get_baseline_info(user_id)
+        trend = self._calculate_trend(ctx)
+        info  = self.get_baseline_info(ctx.user_id, ctx)
         return max(0, score), info["stage"], trend
 
-    def _calculate_trend(self, history: List[dict]) -> str:
-        if len(history) < 7:
-            return "STABLE"
-        df = pd.DataFrame(history)
-        col = "heart_rate_resting" if "heart_rate_resting" in df.columns else None
-        if not col:
+    def _stream_state(self, ctx: AnalysisContext) -> UserBaselineState:
+        """
+        Sliding-window state behind the trend and exercise checks (O(1)
+        reads).  In rollup mode the frame is only today plus a raw tail, so
+        a throwaway state is built over it instead of the user's kept one.
+        """
+        history = ctx.window(self.HISTORY_DAYS)
+        if ctx.use_rollups:
+            return self._baselines.build(history)
+        return self._baselines.state_for(ctx.user_id, history)
+
+    def _calculate_trend(self, ctx: AnalysisContext) -> str:
+        readings, values, slope = self._stream_state(ctx).trend()
+        if readings < 7 or values < 5:
             return "STABLE"
-        series = df[col].dropna()
-        if len(series) < 5:
-            return "STABLE"
-        slope = np.polyfit(np.arange(len(series)), series.values, 1)[0]
+        return self._trend_label(slope)
+
+    @staticmethod
+    def _trend_label(slope: float) -> str:
         if slope > 0.3:  return "DECLINING"
         if slope < -0.3: return "IMPROVING"
         return "STABLE"
@@ -348,14 +573,108 @@ class EarlyWarningEngine:
     # ------------------------------------------------------------------
     # Exercise context suppression
     # ------------------------------------------------------------------
-    def _is_exercise_context(self, history: List[dict], current_data: BiometricData) -> bool:
-        if len(history) < 10:
-            return False
-        steps = [r.get("step_count") or 0 for r in history if r.get("step_count") is not None]
-        if not steps:
+    def _is_exercise_context(self, ctx: AnalysisContext, current_data: BiometricData) -> bool:
+        state = self._stream_state(ctx)
+        if state.size < 10:
             return False
-        threshold = np.percentile(steps, self.HIGH_ACTIVITY_STEPS_PERCENTILE)
-        return (current_data.step_count or 0) > threshold
+        # NaN (no step counts in the window) never suppresses
+        return (current_data.step_count or 0) > state.percentile()
+
+    # ------------------------------------------------------------------
+    # Readiness for many users (POST /readiness-score/batch)
+    # ------------------------------------------------------------------
+    def get_readiness_scores(self, user_ids: List[str]) -> Dict[str, Tuple[int, str, str]]:
+        """get_readiness_score for every user, from three set-based loads."""
+        user_ids = list(dict.fromkeys(user_ids))
+        days = self.BASELINE_INFO_DAYS
+        frames = db.load_history_frames_bulk(user_ids, days, BASELINE_METRICS)
+        histories = db.load_biometrics_bulk(user_ids, days) if frames is None else {}
+        profiles = db.load_contexts_bulk(user_ids)
+        latest = self._latest_from_histories(histories)
+        latest.update(db.load_latest_biometrics_bulk([u for u in user_ids if u not in latest]))
+        return self._readiness_batch(
+            self._bulk_contexts(user_ids, frames, histories, profiles), latest
+        )
+
+    def _latest_from_histories(self, histories: Dict[str, List[dict]]) -> Dict[str, dict]:
+        # The newest reading in the window is the user's latest reading
+        return {u: rows[-1] for u, rows in histories.items() if rows}
+
+    def _bulk_contexts(
+        self, user_ids: List[str], frames: Optional[Dict[str, HistoryFrame]],
+        histories: Dict[str, List[dict]], profiles: Dict[str, Optional[ContextualProfile]],
+    ) -> List[AnalysisContext]:
+        days = self.BASELINE_INFO_DAYS
+        if frames is not None:
+            return [
+                AnalysisContext(u, days, frame=frames[u], profile=profiles.get(u), use_rollups=False)
+                for u in user_ids
+            ]
+        return [
+            AnalysisContext(u, days, history=histories.get(u, []), profile=profiles.get(u),
+                            use_rollups=False)
+            for u in user_ids
+        ]
+
+    @metrics.timed("readiness_batch")
+    def _readiness_batch(
+        self, contexts: List[AnalysisContext], latest: Dict[str, dict],
+    ) -> Dict[str, Tuple[int, str, str]]:
+        """
+        _readiness for many users at once: the same rules as _evaluate,
+        _calculate_trend and get_baseline_info, applied as array operations
+        across users.  Baselines, the step percentile and the HR trend slope
+        are per-user O(1) reads of the same rolling state the single-user
+        path uses, so both agree exactly.
+        """
+        results = {c.user_id: (75, "PROVISIONAL", "STABLE") for c in contexts if not latest.get(c.user_id)}
+        contexts = [c for c in contexts if latest.get(c.user_id)]
+        if not contexts:
+            return results
+        data = [_dict_to_biometric(latest[c.user_id]) for c in contexts]
+        states = [self._stream_state(c) for c in contexts]
+
+        # Exercise suppression: current steps above the user's 90th percentile
+        threshold = np.array([s.percentile() if s.size >= 10 else np.nan for s in states])
+        current_steps = np.array([d.step_count or 0 for d in data], dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            exercise = current_steps > threshold
+        has_history = np.array([c.count(self.HISTORY_DAYS) > 0 for c in contexts])
+        evaluated = has_history & ~exercise
+
+        # Deviations from the blended baseline, for users that get evaluated
+        metric_names = ("heart_rate_resting", "hrv_rmssd", "spo2", "respiratory_rate")
+        high_is_bad = np.array([True, False, False, True])
+        values = np.array([[getattr(d, m) for m in metric_names] for d in data], dtype=np.float64)
+        mean = np.zeros_like(values)
+        std = np.zeros_like(values)
+        for i in np.flatnonzero(evaluated):
+            baselines = self._blended_baselines(contexts[i], contexts[i].age)
+            mean[i], std[i] = zip(*(baselines[m] for m in metric_names))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (values - mean) / std
+        flagged = (std != 0) & np.where(high_is_bad, z > self.SIGMA_YELLOW, z < -self.SIGMA_YELLOW)
+        anomalies = np.where(evaluated, flagged.sum(axis=1), 1)
+        scores = np.maximum(0, 100 - np.minimum(100, anomalies * 15))
+
+        # HR trend over the last TREND_DAYS
+        trends = [s.trend() for s in states]
+        slopes = np.array([
+            slope if readings >= 7 and values >= 5 else np.nan for readings, values, slope in trends
+        ])
+
+        # Baseline stage from the 30-day span
+        data_points = np.array([c.count(self.BASELINE_INFO_DAYS) for c in contexts])
+        spans = np.array([c.span_days(self.BASELINE_INFO_DAYS) for c in contexts], dtype=np.float64)
+        confidence = np.minimum(100, (spans / self.MIN_BASELINE_DAYS) * 100).astype(np.int64)
+        stages = np.select(
+            [data_points == 0, confidence < 30, confidence < 60, confidence < 100],
+            ["PROVISIONAL", "PROVISIONAL", "CALIBRATING", "PERSONALISING"], "PERSONAL",
+        )
+
+        for i, c in enumerate(contexts):
+            results[c.user_id] = (int(scores[i]), str(stages[i]), self._trend_label(slopes[i]))
+        return results
 
     # ------------------------------------------------------------------
     # Context (CVD risk profile)
@@ -369,27 +688,20 @@ class EarlyWarningEngine:
     # ------------------------------------------------------------------
     # Feature extraction
     # ------------------------------------------------------------------
+    @metrics.timed("features")
     def _extract_features(
-        self, history: List[dict], data: BiometricData, user_id: str
+        self, ctx: AnalysisContext, data: BiometricData
     ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
         """Returns (hr_trend_2w, hrv_vs_baseline, sleep_pattern)."""
-        if len(history) < 7:
+        if ctx.count(self.HISTORY_DAYS) < 7:
             return None, None, None
 
-        df = pd.DataFrame(history)
-        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
-        df = df.set_index("timestamp").sort_index().tail(14)
-
         hr_trend_2w = None
-        if "heart_rate_resting" in df.columns:
-            hr = df["heart_rate_resting"].dropna()
-            if len(hr) >= 5:
-                slope = np.polyfit(np.arange(len(hr)), hr.values, 1)[0]
-                hr_trend_2w = "rising" if slope > 0.5 else ("declining" if slope < -0.5 else "stable")
+        values, slope = self._stream_state(ctx).tail_trend()
+        if values >= 5:
+            hr_trend_2w = "rising" if slope > 0.5 else ("declining" if slope < -0.5 else "stable")
 
-        ctx = db.load_context(user_id)
-        age = ctx.age if ctx else 45
-        hrv_mean, hrv_std = self._calculate_blended_baseline(history, "hrv_rmssd", age)
+        hrv_mean, hrv_std = self._calculate_blended_baseline(ctx, "hrv_rmssd")
 
         hrv_vs_baseline = None
         if hrv_std and hrv_std > 0:
@@ -431,12 +743,19 @@ class EarlyWarningEngine:
         self, heart_rate_resting: float, hrv_rmssd: float,
         sleep_hours: float, ecg_rhythm: str, step_count: int,
     ) -> Tuple[float, float]:
-        risk = 12.0
-        if heart_rate_resting >= 80:  risk += (heart_rate_resting - 80) * 0.15
-        if 0 < hrv_rmssd < 30:        risk += (30 - hrv_rmssd) * 0.2
-        if 0 < sleep_hours < 6:       risk += 3.0
-        if ecg_rhythm == "irregular": risk += 6.0
-        if 0 < step_count < 4000:     risk += 2.0
+        model = cvd_model.get()
+        if model is not None:
+            risk = float(model.risk_pct(
+                [heart_rate_resting], [hrv_rmssd], [sleep_hours],
+                [ecg_rhythm == "irregular"], [step_count],
+            )[0])
+        else:
+            risk = 12.0
+            if heart_rate_resting >= 80:  risk += (heart_rate_resting - 80) * 0.15
+            if 0 < hrv_rmssd < 30:        risk += (30 - hrv_rmssd) * 0.2
+            if 0 < sleep_hours < 6:       risk += 3.0
+            if ecg_rhythm == "irregular": risk += 6.0
+            if 0 < step_count < 4000:     risk += 2.0
         risk = min(100.0, round(risk, 1))
         conf = min(1.0, round(0.75 + (heart_rate_resting + hrv_rmssd) / 1000.0, 2))
         return risk, conf
@@ -450,57 +769,193 @@ class EarlyWarningEngine:
         if hr_trend == "rising" and (hrv_vs_baseline == "below" or ecg_rhythm == "irregular"):
             trajectory_2y = min(100.0, round(current + 6.0, 1))
         alert_triggered = current >= 20 or (trajectory_2y >= 28 and current >= 18)
-        message = "High cardiovascular risk detected. Recommend clinical follow-up." if alert_triggered else None
+        message = _FUSION_ALERT_MESSAGE if alert_triggered else None
         return FusionOutput(
             trajectory_risk_2y_pct=trajectory_2y,
             alert_triggered=alert_triggered,
             alert_message=message,
         )
 
+    # ------------------------------------------------------------------
+    # CVD risk algorithms over arrays (cohort scoring)
+    #
+    # One element per (profile, reading) pair.  Results are bit-identical to
+    # the scalar versions above: the same float operations in the same
+    # order, and round() via batch_stats.round_like_python (np.round can
+    # differ in the last digit).  Change both together.
+    # ------------------------------------------------------------------
+    def _framingham_adapted_batch(
+        self, age: np.ndarray, smoker: np.ndarray, hypertension: np.ndarray,
+        heart_rate_resting: np.ndarray,
+    ) -> np.ndarray:
+        age_pts = np.where(age >= 30, np.clip((age - 30) // 10, 0, 4), 0)
+        hr_pts  = np.where(heart_rate_resting >= 90, 2, np.where(heart_rate_resting >= 80, 1, 0))
+        points  = age_pts + hr_pts + np.where(hypertension, 2, 0) + np.where(smoker, 1, 0)
+        return np.minimum(100.0, round_like_python(5.0 + points * 2.2, 1))
+
+    def _qrisk3_adapted_batch(
+        self, age: np.ndarray, smoker: np.ndarray, hypertension: np.ndarray,
+        heart_rate_resting: np.ndarray, hrv_rmssd: np.ndarray,
+        sleep_hours: np.ndarray, step_count: np.ndarray,
+    ) -> np.ndarray:
+        fram   = self._framingham_adapted_batch(age, smoker, hypertension, heart_rate_resting)
+        uplift = np.zeros(len(fram))
+        uplift = np.where((0 < hrv_rmssd) & (hrv_rmssd < 25),     uplift + 2.0, uplift)
+        uplift = np.where((0 < sleep_hours) & (sleep_hours < 6),  uplift + 1.5, uplift)
+        uplift = np.where((0 < step_count) & (step_count < 5000), uplift + 1.5, uplift)
+        return np.minimum(100.0, round_like_python(fram + uplift, 1))
+
+    def _custom_ml_risk_batch(
+        self, heart_rate_resting: np.ndarray, hrv_rmssd: np.ndarray,
+        sleep_hours: np.ndarray, irregular: np.ndarray, step_count: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        model = cvd_model.get()
+        if model is not None:
+            risk = model.risk_pct(heart_rate_resting, hrv_rmssd, sleep_hours, irregular, step_count)
+        else:
+            risk = self._rule_ml_risk_batch(heart_rate_resting, hrv_rmssd, sleep_hours, irregular, step_count)
+        risk = np.minimum(100.0, round_like_python(risk, 1))
+        conf = np.minimum(1.0, round_like_python(0.75 + (heart_rate_resting + hrv_rmssd) / 1000.0, 2))
+        return risk, conf
+
+    def _rule_ml_risk_batch(
+        self, heart_rate_resting: np.ndarray, hrv_rmssd: np.ndarray,
+        sleep_hours: np.ndarray, irregular: np.ndarray, step_count: np.ndarray,
+    ) -> np.ndarray:
+        """The hand-written rules of _custom_ml_risk, before rounding."""
+        risk = np.full(len(heart_rate_resting), 12.0)
+        risk = np.where(heart_rate_resting >= 80, risk + (heart_rate_resting - 80) * 0.15, risk)
+        risk = np.where((0 < hrv_rmssd) & (hrv_rmssd < 30), risk + (30 - hrv_rmssd) * 0.2, risk)
+        risk = np.where((0 < sleep_hours) & (sleep_hours < 6), risk + 3.0, risk)
+        risk = np.where(irregular, risk + 6.0, risk)
+        return np.where((0 < step_count) & (step_count < 4000), risk + 2.0, risk)
+
+    def _fusion_trajectory_batch(
+        self, ml_cvd_risk_pct: np.ndarray,
+        hr_rising: np.ndarray, hrv_below: np.ndarray, irregular: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(trajectory_risk_2y_pct, alert_triggered)."""
+        current = ml_cvd_risk_pct
+        escalate = hr_rising & (hrv_below | irregular)
+        trajectory_2y = np.where(
+            escalate, np.minimum(100.0, round_like_python(current + 6.0, 1)), current
+        )
+        alert_triggered = (current >= 20) | ((trajectory_2y >= 28) & (current >= 18))
+        return trajectory_2y, alert_triggered
+
+    @metrics.timed("cohort_scoring")
+    def score_cohort(
+        self, profiles: Sequence[ContextualProfile], readings: Sequence[BiometricData],
+        hr_trends: Optional[Sequence[Optional[str]]] = None,
+        hrv_vs_baselines: Optional[Sequence[Optional[str]]] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        CVD risk scores and fusion for N (profile, reading) pairs at once,
+        e.g. an insurer's member list.  Element i of each column equals what
+        full_analysis reports in risk_scores / fusion for pair i, given the
+        same hr_trend_2w and hrv_vs_baseline (None when not supplied).
+        Reads no storage.
+        """
+        n = len(readings)
+        if len(profiles) != n:
+            raise ValueError("profiles and readings must have the same length")
+
+        def column(values, dtype) -> np.ndarray:
+            return np.fromiter(values, dtype=dtype, count=n)
+
+        age          = column((p.age for p in profiles), np.int64)
+        smoker       = column((bool(p.smoker) for p in profiles), bool)
+        hypertension = column((bool(p.hypertension) for p in profiles), bool)
+        hr           = column((d.heart_rate_resting for d in readings), np.float64)
+        hrv          = column((d.hrv_rmssd for d in readings), np.float64)
+        sleep        = column((d.sleep_duration_hours or 0 for d in readings), np.float64)
+        steps        = column((d.step_count or 0 for d in readings), np.int64)
+        irregular    = column(((d.ecg_rhythm or "unknown") == "irregular" for d in readings), bool)
+        hr_rising    = column((t == "rising" for t in hr_trends or [None] * n), bool)
+        hrv_below    = column((h == "below" for h in hrv_vs_baselines or [None] * n), bool)
+
+        fram = self._framingham_adapted_batch(age, smoker, hypertension, hr)
+        qrisk = self._qrisk3_adapted_batch(age, smoker, hypertension, hr, hrv, sleep, steps)
+        ml_risk, ml_conf = self._custom_ml_risk_batch(hr, hrv, sleep, irregular, steps)
+        trajectory_2y, alert = self._fusion_trajectory_batch(ml_risk, hr_rising, hrv_below, irregular)
+        return {
+            "framingham_10y_pct": fram,
+            "qrisk3_10y_pct": qrisk,
+            "ml_cvd_risk_pct": ml_risk,
+            "ml_confidence": ml_conf,
+            "trajectory_risk_2y_pct": trajectory_2y,
+            "alert_triggered": alert,
+        }
+
+    def cohort_score_rows(
+        self, member_ids: Sequence[str], scores: Dict[str, np.ndarray],
+    ) -> List[dict]:
+        """score_cohort columns as per-member RiskScores / FusionOutput shaped dicts."""
+        return [
+            {
+                "member_id": member_id,
+                "risk_scores": {
+                    "framingham_10y_pct": fram, "qrisk3_10y_pct": qrisk,
+                    "ml_cvd_risk_pct": ml_risk, "ml_confidence": ml_conf,
+                },
+                "fusion": {
+                    "trajectory_risk_2y_pct": trajectory_2y,
+                    "alert_triggered": alert,
+                    "alert_message": _FUSION_ALERT_MESSAGE if alert else None,
+                },
+            }
+            for member_id, fram, qrisk, ml_risk, ml_conf, trajectory_2y, alert in zip(
+                member_ids,
+                scores["framingham_10y_pct"].tolist(), scores["qrisk3_10y_pct"].tolist(),
+                scores["ml_cvd_risk_pct"].tolist(), scores["ml_confidence"].tolist(),
+                scores["trajectory_risk_2y_pct"].tolist(), scores["alert_triggered"].tolist(),
+            )
+        ]
+
     # ------------------------------------------------------------------
     # Full analysis
     # ------------------------------------------------------------------
     def full_analysis(
         self, user_id: str, data: BiometricData,
         context: Optional[ContextualProfile] = None,
+        ctx: Optional[AnalysisContext] = None,
     ) -> EarlyWarningSummary:
         """Run full pipeline: anomaly detection + CVD risk + fusion."""
-        profile = context or db.load_context(user_id)
-        profile_was_missing = profile is None
-        if profile is None:
-            profile = ContextualProfile(age=50, smoker=False, hypertension=False)
+        ctx = ctx or self.analysis_context(user_id)
         if context:
             db.save_context(user_id, context)
+            ctx.profile = context
+        profile = ctx.profile
+        if profile is None:
+            profile = ContextualProfile(age=50, smoker=False, hypertension=False)
 
-        history = db.load_biometrics(
-            user_id, days=self.MIN_BASELINE_DAYS + self.ROLLING_WINDOW_DAYS + 1
-        )
-        alert_level, anomalies = self._evaluate(user_id, data)
+        alert_level, anomalies = self._evaluate(ctx, data)
 
         age = profile.age
-        hr_baseline,  _ = self._calculate_blended_baseline(history, "heart_rate_resting", age)
-        hrv_baseline, _ = self._calculate_blended_baseline(history, "hrv_rmssd",          age)
-        hr_trend, hrv_vs_baseline, sleep_pattern = self._extract_features(history, data, user_id)
-
-        fram  = self._framingham_adapted(profile, data.heart_rate_resting)
-        qrisk = self._qrisk3_adapted(
-            profile, data.heart_rate_resting, data.hrv_rmssd,
-            data.sleep_duration_hours or 0, data.step_count or 0,
-        )
-        ml_risk, ml_conf = self._custom_ml_risk(
-            data.heart_rate_resting, data.hrv_rmssd,
-            data.sleep_duration_hours or 0,
-            getattr(data, "ecg_rhythm", "unknown") or "unknown",
-            data.step_count or 0,
-        )
-        risk_scores = RiskScores(
-            framingham_10y_pct=fram, qrisk3_10y_pct=qrisk,
-            ml_cvd_risk_pct=ml_risk, ml_confidence=ml_conf,
-        )
-        fusion = self._fusion_trajectory(
-            risk_scores, hr_trend, hrv_vs_baseline,
-            getattr(data, "ecg_rhythm", "unknown") or "unknown",
-        )
+        hr_baseline,  _ = self._calculate_blended_baseline(ctx, "heart_rate_resting", age)
+        hrv_baseline, _ = self._calculate_blended_baseline(ctx, "hrv_rmssd",          age)
+        hr_trend, hrv_vs_baseline, sleep_pattern = self._extract_features(ctx, data)
+
+        with metrics.stage("risk_scoring"):
+            fram  = self._framingham_adapted(profile, data.heart_rate_resting)
+            qrisk = self._qrisk3_adapted(
+                profile, data.heart_rate_resting, data.hrv_rmssd,
+                data.sleep_duration_hours or 0, data.step_count or 0,
+            )
+            ml_risk, ml_conf = self._custom_ml_risk(
+                data.heart_rate_resting, data.hrv_rmssd,
+                data.sleep_duration_hours or 0,
+                getattr(data, "ecg_rhythm", "unknown") or "unknown",
+                data.step_count or 0,
+            )
+            risk_scores = RiskScores(
+                framingham_10y_pct=fram, qrisk3_10y_pct=qrisk,
+                ml_cvd_risk_pct=ml_risk, ml_confidence=ml_conf,
+            )
+            fusion = self._fusion_trajectory(
+                risk_scores, hr_trend, hrv_vs_baseline,
+                getattr(data, "ecg_rhythm", "unknown") or "unknown",
+            )
 
         clinical_flags: List[str] = []
         if getattr(data, "ecg_rhythm", None) == "irregular":
@@ -520,7 +975,7 @@ class EarlyWarningEngine:
         if getattr(data, "ecg_rhythm", None) == "irregular":
             recommendations.append("Your heart rhythm shows irregularities. Please consult a doctor.")
 
-        uncertainty = self._estimate_uncertainty(history, None if profile_was_missing else profile, data, alert_level)
+        uncertainty = self._estimate_uncertainty(ctx, data, alert_level)
         provenance = self._build_provenance(user_id, data, alert_level)
         requires_clinician_review = (
             alert_level != AlertLevel.GREEN
@@ -533,28 +988,185 @@ class EarlyWarningEngine:
                 "Signal quality/context is limited for autonomous interpretation; clinician review is recommended before acting on this result."
             )
 
-        return EarlyWarningSummary(
-            user_id=user_id,
-            processed_at=datetime.utcnow(),
-            heart_rate_resting=data.heart_rate_resting,
-            hrv_rmssd=data.hrv_rmssd,
-            spo2=data.spo2,
-            sleep_duration_hours=getattr(data, "sleep_duration_hours", 0) or 0,
-            step_count=data.step_count or 0,
-            ecg_rhythm=getattr(data, "ecg_rhythm", "unknown") or "unknown",
-            temperature_trend=getattr(data, "temperature_trend", "normal") or "normal",
-            hr_baseline=hr_baseline or None,
-            hrv_baseline=hrv_baseline or None,
-            hr_trend_2w=hr_trend,
-            hrv_vs_baseline=hrv_vs_baseline,
-            sleep_pattern=sleep_pattern,
-            risk_scores=risk_scores,
-            fusion=fusion,
-            clinical_flags=clinical_flags,
-            alert_level=alert_level,
-            anomalies=anomalies,
-            recommendations=recommendations,
-            uncertainty=uncertainty,
-            provenance=provenance,
-            requires_clinician_review=requires_clinician_review,
+        with metrics.stage("summary_model"):
+            return EarlyWarningSummary(
+                user_id=user_id,
+                processed_at=datetime.utcnow(),
+                heart_rate_resting=data.heart_rate_resting,
+                hrv_rmssd=data.hrv_rmssd,
+                spo2=data.spo2,
+                sleep_duration_hours=getattr(data, "sleep_duration_hours", 0) or 0,
+                step_count=data.step_count or 0,
+                ecg_rhythm=getattr(data, "ecg_rhythm", "unknown") or "unknown",
+                temperature_trend=getattr(data, "temperature_trend", "normal") or "normal",
+                hr_baseline=hr_baseline or None,
+                hrv_baseline=hrv_baseline or None,
+                hr_trend_2w=hr_trend,
+                hrv_vs_baseline=hrv_vs_baseline,
+                sleep_pattern=sleep_pattern,
+                risk_scores=risk_scores,
+                fusion=fusion,
+                clinical_flags=clinical_flags,
+                alert_level=alert_level,
+                anomalies=anomalies,
+                recommendations=recommendations,
+                uncertainty=uncertainty,
+                provenance=provenance,
+                requires_clinician_review=requires_clinician_review,
+            )
+
+    # ------------------------------------------------------------------
+    # Async entry points — same results as the sync methods, with storage
+    # awaited through db_async.  The context is preloaded up front (history
+    # and profile concurrently), so the shared sync logic never blocks.
+    # ------------------------------------------------------------------
+    async def aanalysis_context(
+        self, user_id: str, days: Optional[int] = None, with_profile: bool = True,
+    ) -> AnalysisContext:
+        days = days or self.HISTORY_DAYS
+        loads = []
+        if _USE_ROLLUPS:
+            loads += [
+                db_async.load_recent_biometrics(user_id, days, _RAW_TAIL_ROWS),
+                db_async.load_daily_rollups(user_id, days),
+            ]
+        else:
+            frame = db.load_history_frame(user_id, days, BASELINE_METRICS)
+            history = asyncio.sleep(0) if frame is not None else db_async.load_biometrics(user_id, days=days)
+            loads += [history, asyncio.sleep(0)]
+        if with_profile:
+            loads.append(db_async.load_context(user_id))
+        history, rollups, *profile = await asyncio.gather(*loads)
+        kwargs = {"profile": profile[0]} if with_profile else {}
+        if not _USE_ROLLUPS and frame is not None:
+            kwargs["frame"] = frame
+        return AnalysisContext(user_id, days, history=history, rollups=rollups, **kwargs)
+
+    async def aingest(
+        self, user_id: str, data: BiometricData,
+        ctx: Optional[AnalysisContext] = None,
+    ) -> Tuple[AlertLevel, List[str]]:
+        ctx = ctx or await self.aanalysis_context(user_id)
+        alert_level, anomalies = self._evaluate(ctx, data)
+        await db_async.save_biometric(user_id, data, alert_level.value, anomalies)
+        row = db.biometric_row(data, alert_level.value, anomalies)
+        self._baselines.push(user_id, row)
+        ctx.append(row)
+        return alert_level, anomalies
+
+    async def aingest_batch(
+        self, readings: List[Tuple[str, BiometricData]]
+    ) -> List[Tuple[AlertLevel, List[str]]]:
+        user_ids = list(dict.fromkeys(user_id for user_id, _ in readings))
+        loaded = await asyncio.gather(*(self.aanalysis_context(u) for u in user_ids))
+        contexts = dict(zip(user_ids, loaded))
+        # Evaluating a large batch is pure CPU; keep the event loop free
+        results, rows = await asyncio.to_thread(self._evaluate_batch, readings, contexts)
+        try:
+            await db_async.save_biometrics(rows)
+        except Exception:
+            self._discard_batch_state(contexts)
+            raise
+        return results
+
+    async def afull_analysis(
+        self, user_id: str, data: BiometricData,
+        context: Optional[ContextualProfile] = None,
+        ctx: Optional[AnalysisContext] = None,
+    ) -> EarlyWarningSummary:
+        ctx = ctx or await self.aanalysis_context(user_id)
+        if context:
+            await db_async.save_context(user_id, context)
+            ctx.profile = context
+        return self.full_analysis(user_id, data, ctx=ctx)
+
+    # ------------------------------------------------------------------
+    # Materialised latest summary
+    # ------------------------------------------------------------------
+    def summary_key(self, profile: Optional[ContextualProfile]) -> str:
+        """Inputs a stored summary depends on besides history: model and profile."""
+        raw = f"{self.MODEL_VERSION}|{profile.model_dump_json() if profile else ''}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+    def _fresh_summary(self, stored: Optional[dict], latest: dict,
+                       profile: Optional[ContextualProfile]) -> Optional[str]:
+        if not stored or stored.get("summary_key") != self.summary_key(profile):
+            return None
+        if epoch_ns(stored["reading_time"]) != epoch_ns(latest["timestamp"]):
+            return None
+        age_ns = now_ns() - epoch_ns(stored["computed_at"])
+        if age_ns > _SUMMARY_MAX_AGE_SECONDS * 1e9:
+            return None
+        return stored["summary"]
+
+    async def astore_summary(
+        self, user_id: str, summary_json: str, reading_time: datetime,
+        profile: Optional[ContextualProfile],
+    ) -> None:
+        """Best effort: a failed write only costs the next poll a recompute."""
+        if not _SUMMARY_STORE:
+            return
+        try:
+            await db_async.save_summary(
+                user_id, _utc(reading_time), self.summary_key(profile), summary_json,
+            )
+        except Exception as e:
+            logger.warning("[engine] Could not store summary for %s: %s", user_id, e)
+
+    async def alatest_summary_json(self, user_id: str) -> Optional[str]:
+        """
+        EarlyWarningSummary JSON for the user's latest stored reading, or None
+        without data.
+
+        Served from early_warning_summaries when still fresh, as the stored
+        text without parsing it; otherwise the full analysis runs on the
+        latest reading and its JSON is stored and returned.
+        """
+        loads = [db_async.load_latest_biometric(user_id), db_async.load_context(user_id)]
+        if _SUMMARY_STORE:
+            loads.append(db_async.load_summary(user_id))
+        latest, profile, *stored = await asyncio.gather(*loads)
+        if not latest:
+            return None
+        summary_json = self._fresh_summary(stored[0] if stored else None, latest, profile)
+        if summary_json is not None:
+            return summary_json
+        # Profile comes from the load above; passing it as `context` would
+        # write the unchanged profile straight back to the users table.
+        ctx = await self.aanalysis_context(user_id, with_profile=False)
+        ctx.profile = profile
+        summary = self.full_analysis(user_id, _dict_to_biometric(latest), ctx=ctx)
+        summary_json = summary.model_dump_json()
+        await self.astore_summary(user_id, summary_json, latest["timestamp"], profile)
+        return summary_json
+
+    async def aget_readiness_score(self, user_id: str) -> Tuple[int, str, str]:
+        latest = await db_async.load_latest_biometric(user_id)
+        if not latest:
+            return 75, "PROVISIONAL", "STABLE"
+        ctx = await self.aanalysis_context(user_id, self.BASELINE_INFO_DAYS)
+        return self._readiness(ctx, latest)
+
+    async def aget_readiness_scores(self, user_ids: List[str]) -> Dict[str, Tuple[int, str, str]]:
+        user_ids = list(dict.fromkeys(user_ids))
+        days = self.BASELINE_INFO_DAYS
+        frames = db.load_history_frames_bulk(user_ids, days, BASELINE_METRICS)
+        histories, profiles = await asyncio.gather(
+            db_async.load_biometrics_bulk(user_ids, days) if frames is None else asyncio.sleep(0, {}),
+            db_async.load_contexts_bulk(user_ids),
+        )
+        latest = self._latest_from_histories(histories)
+        latest.update(await db_async.load_latest_biometrics_bulk([u for u in user_ids if u not in latest]))
+        return self._readiness_batch(
+            self._bulk_contexts(user_ids, frames, histories, profiles), latest
         )
+
+    async def aget_baseline_info(self, user_id: str) -> Dict:
+        ctx = await self.aanalysis_context(user_id, self.BASELINE_INFO_DAYS, with_profile=False)
+        return self.get_baseline_info(user_id, ctx)
+
+    async def aset_context(self, user_id: str, profile: ContextualProfile) -> None:
+        await db_async.save_context(user_id, profile)
+
+    async def aget_context(self, user_id: str) -> Optional[ContextualProfile]:
+        return await db_async.load_context(user_id)
@@ -0,0 +1,68 @@
+"""
+JSON responses for ml-service routes without FastAPI's second pass.
+
+A handler that returns a pydantic model has it validated again against
+``response_model`` and then encoded.  Depending on the FastAPI version, that
+can mean a model_dump, a full re-validation of the dict and json.dumps.  For
+models the engine has just built (EarlyWarningSummary and its four nested
+models) that work is redundant.
+
+- ``model_response(model)`` serialises a model once with pydantic-core
+  (``model_dump_json``) and returns it as a ready Response.  FastAPI passes
+  Response objects through untouched.  Routes keep ``response_model=`` so
+  the OpenAPI schema is unchanged.
+- ``raw_response(body)`` sends JSON that is already serialised, such as a
+  materialised summary read back from early_warning_summaries.
+- ``FastJSONResponse`` is the app's default response class.  Dicts and lists
+  from the remaining routes are encoded with orjson.  Without orjson it
+  falls back to the standard encoder.
+"""
+
+import json
+from typing import Any, Union
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; see requirements.txt
+    orjson = None
+
+MEDIA_TYPE = "application/json"
+
+
+def _default(value: Any) -> Any:
+    """Types orjson does not encode natively (models, Decimal, sets...)."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON for plain data, models included."""
+    if isinstance(content, BaseModel):
+        return content.model_dump_json().encode()
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def raw_response(body: Union[bytes, str], status_code: int = 200, **kwargs) -> Response:
+    """``body`` is already JSON; sent as is."""
+    return Response(content=body, status_code=status_code, media_type=MEDIA_TYPE, **kwargs)
+
+
+def model_response(model: BaseModel, status_code: int = 200, **kwargs) -> Response:
+    """A model built by the service, serialised once without re-validation."""
+    return raw_response(model.model_dump_json(), status_code, **kwargs)
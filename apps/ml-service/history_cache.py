@@ -0,0 +1,256 @@
+"""
+In-process cache of recent per-user history for db.load_biometrics,
+db.count_biometrics and db.load_latest_biometric.
+
+The same user typically hits /ingest, /readiness-score and /early-warning/*
+within seconds; each call used to reload the whole window from Postgres.
+The cache keeps, per user, the widest window loaded so far and serves any
+narrower or equal window by filtering it in memory.
+
+Correctness rules:
+- Write-through: rows this process commits are added to the user's entry.
+- Cross-process: a trigger on biometric_time_series sends a NOTIFY for every
+  written user (see db.py / notify_listener.py).  Writes from other workers
+  or the Node backend invalidate the entry.  In database mode the cache is
+  only consulted while that listener is connected, and it is cleared
+  whenever the listener (re)connects.
+- Every mutation stamps the user it touched with the next value of a
+  cache-wide clock (invalidate(None) stamps everyone at once).  A miss
+  takes the clock before its database read and only stores the rows if
+  that user was not stamped in the meantime, so a slow read can never
+  overwrite newer data, and writes for other users do not cost it the fill.
+  Stamps are kept for the most recently changed users only; forgetting one
+  raises a floor that every fill must also clear.
+- TTL as a safety net; LRU eviction by total cached rows.
+"""
+
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+def _row_time(row: dict) -> datetime:
+    return _utc(row["timestamp"])
+
+
+class _Entry:
+    __slots__ = ("rows", "days", "loaded_at", "latest", "has_latest")
+
+    def __init__(self):
+        self.rows: List[dict] = []     # time-ordered; window of ``days`` at load
+        self.days = 0                  # widest window held (0 = none)
+        self.loaded_at = time.monotonic()
+        self.latest: Optional[dict] = None
+        self.has_latest = False
+
+    @property
+    def size(self) -> int:
+        return len(self.rows) + (1 if self.has_latest and not self.rows else 0)
+
+
+class HistoryCache:
+    """Bounded LRU map of user_id -> recent rows."""
+
+    def __init__(self, max_rows: int = 100_000, ttl_seconds: float = 60.0,
+                 max_stamps: int = 100_000):
+        self.max_rows = max(1, max_rows)
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._rows = 0
+        # user_id -> clock at its last change, oldest first; the floor covers
+        # users whose stamp was forgotten and invalidate(None)
+        self._clock = 0
+        self._changed: "OrderedDict[str, int]" = OrderedDict()
+        self._floor = 0
+        self.max_stamps = max(1, max_stamps)
+        self._lock = threading.Lock()
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "HistoryCache":
+        return cls(
+            max_rows=int(os.getenv("ML_HISTORY_CACHE_MAX_ROWS", "100000") or 100000),
+            ttl_seconds=float(os.getenv("ML_HISTORY_CACHE_TTL_SECONDS", "60") or 60),
+        )
+
+    # ------------------------------------------------------------------
+    # Internals (lock held)
+    # ------------------------------------------------------------------
+    def _live(self, user_id: str) -> Optional[_Entry]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.loaded_at > self.ttl:
+            self._drop(user_id)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(user_id)
+        return entry
+
+    def _drop(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._rows -= entry.size
+
+    def _resize(self, entry: _Entry, before: int) -> None:
+        self._rows += entry.size - before
+        while self._rows > self.max_rows and len(self._entries) > 1:
+            user_id = next(iter(self._entries))
+            self._drop(user_id)
+            self.evictions += 1
+
+    def _touch(self, user_id: str) -> None:
+        self._clock += 1
+        self._changed[user_id] = self._clock
+        self._changed.move_to_end(user_id)
+        if len(self._changed) > self.max_stamps:
+            _, stamp = self._changed.popitem(last=False)
+            self._floor = max(self._floor, stamp)
+
+    def _unchanged_since(self, user_id: str, generation: int) -> bool:
+        return max(self._floor, self._changed.get(user_id, 0)) <= generation
+
+    def _entry_for_write(self, user_id: str) -> Tuple[_Entry, int]:
+        entry = self._live(user_id)
+        if entry is None:
+            entry = self._entries[user_id] = _Entry()
+        return entry, entry.size
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def generation(self) -> int:
+        """Token to pass to store()/store_latest() after a database read."""
+        with self._lock:
+            return self._clock
+
+    def _window_start(self, entry: _Entry, days: int) -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        return bisect_right(entry.rows, cutoff, key=_row_time)
+
+    def window(self, user_id: str, days: int) -> Optional[List[dict]]:
+        """Rows newer than ``days`` ago, or None on a miss."""
+        with self._lock:
+            entry = self._live(user_id)
+            if entry is None or entry.days < days:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry.rows[self._window_start(entry, days):]
+
+    def count(self, user_id: str, days: int) -> Optional[int]:
+        """len(window(user_id, days)) without copying the rows; None on a miss."""
+        with self._lock:
+            entry = self._live(user_id)
+            if entry is None or entry.days < days:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return len(entry.rows) - self._window_start(entry, days)
+
+    def latest(self, user_id: str) -> Tuple[bool, Optional[dict]]:
+        """(hit, newest row).  A hit may carry None: the user has no rows."""
+        with self._lock:
+            entry = self._live(user_id)
+            if entry is not None:
+                if entry.rows:
+                    self.hits += 1
+                    return True, entry.rows[-1]
+                if entry.has_latest:
+                    self.hits += 1
+                    return True, entry.latest
+            self.misses += 1
+            return False, None
+
+    # ------------------------------------------------------------------
+    # Fills (after a miss)
+    # ------------------------------------------------------------------
+    def store(self, user_id: str, days: int, rows: List[dict], generation: int) -> None:
+        with self._lock:
+            if not self._unchanged_since(user_id, generation):
+                return
+            entry, before = self._entry_for_write(user_id)
+            if days < entry.days:
+                return
+            entry.rows = sorted(rows, key=_row_time)
+            entry.days = days
+            entry.loaded_at = time.monotonic()
+            self._resize(entry, before)
+
+    def store_latest(self, user_id: str, row: Optional[dict], generation: int) -> None:
+        with self._lock:
+            if not self._unchanged_since(user_id, generation):
+                return
+            entry, before = self._entry_for_write(user_id)
+            entry.latest, entry.has_latest = row, True
+            self._resize(entry, before)
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+    def append(self, user_id: str, rows: List[dict]) -> None:
+        """
+        Write-through of rows this process just committed.  A fill that read
+        the database between the commit and this call already holds them, so
+        a row whose timestamp was cached before this call is not added again.
+        """
+        with self._lock:
+            self._touch(user_id)
+            entry = self._live(user_id)
+            if entry is None:
+                return
+            before = entry.size
+            added = set()
+            for row in rows:
+                row = dict(row, timestamp=_utc(row["timestamp"]))
+                t = row["timestamp"]
+                pos = bisect_left(entry.rows, t, key=_row_time)
+                if t in added or pos == len(entry.rows) or _row_time(entry.rows[pos]) != t:
+                    entry.rows.insert(bisect_right(entry.rows, t, lo=pos, key=_row_time), row)
+                    added.add(t)
+                if not entry.has_latest or entry.latest is None or (
+                        row["timestamp"] >= _utc(entry.latest["timestamp"])):
+                    entry.latest, entry.has_latest = row, True
+            self._resize(entry, before)
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        with self._lock:
+            self.invalidations += 1
+            if user_id is None:
+                self._clock += 1
+                self._floor = self._clock
+                self._changed.clear()
+                self._entries.clear()
+                self._rows = 0
+            else:
+                self._touch(user_id)
+                self._drop(user_id)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "users": len(self._entries),
+                "rows": self._rows,
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
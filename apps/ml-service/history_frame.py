@@ -0,0 +1,161 @@
+"""
+Columnar history for the Early Warning engine.
+
+db.load_biometrics returns a list of row dicts.  The engine used to turn that
+list into a pandas DataFrame (and parse/sort its timestamps) separately for
+every metric and every stage of a request.  HistoryFrame is built once per
+request instead: one int64 epoch-nanosecond timestamp array plus a
+(metrics x rows) float64 matrix, missing values as NaN, sorted by time.
+Windows are zero-copy slices found by binary search, and per-metric window
+statistics are computed for every metric in one vectorised pass.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DAY_NS = 86_400 * 1_000_000_000
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+
+
+def epoch_ns(ts: datetime) -> int:
+    """Exact integer nanoseconds since the epoch; naive timestamps are UTC."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ((ts - _EPOCH) // _US) * 1000
+
+
+def now_ns() -> int:
+    return epoch_ns(datetime.now(timezone.utc))
+
+
+class HistoryFrame:
+    """Time-sorted columnar readings; appendable unless it is a window view."""
+
+    __slots__ = ("metrics", "_index", "_ts", "_values", "_size", "_view")
+
+    def __init__(self, metrics: Sequence[str], ts: np.ndarray, values: np.ndarray,
+                 size: Optional[int] = None, view: bool = False):
+        self.metrics = list(metrics)
+        self._index = {m: i for i, m in enumerate(self.metrics)}
+        self._ts = ts
+        self._values = values
+        self._size = len(ts) if size is None else size
+        self._view = view
+
+    @classmethod
+    def from_rows(cls, rows: List[dict], metrics: Sequence[str]) -> "HistoryFrame":
+        timed = [r for r in rows if isinstance(r.get("timestamp"), datetime)]
+        n = len(timed)
+        ts = np.fromiter((epoch_ns(r["timestamp"]) for r in timed), dtype=np.int64, count=n)
+        values = np.empty((len(metrics), n), dtype=np.float64)
+        for i, m in enumerate(metrics):
+            values[i] = np.fromiter(
+                (np.nan if r.get(m) is None else r[m] for r in timed),
+                dtype=np.float64, count=n,
+            )
+        if n > 1 and np.any(ts[1:] < ts[:-1]):
+            order = np.argsort(ts, kind="stable")
+            ts, values = ts[order], values[:, order]
+        return cls(metrics, ts, values)
+
+    # ------------------------------------------------------------------
+    # Shape / access
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def ts(self) -> np.ndarray:
+        return self._ts[: self._size]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values[:, : self._size]
+
+    def column(self, metric: str) -> np.ndarray:
+        return self._values[self._index[metric], : self._size]
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        return int(self._ts[self._size - 1]) if self._size else None
+
+    def span_days(self) -> float:
+        if self._size == 0:
+            return 0.0
+        return float(self._ts[self._size - 1] - self._ts[0]) / DAY_NS
+
+    # ------------------------------------------------------------------
+    # Windows (zero-copy)
+    # ------------------------------------------------------------------
+    def _slice(self, lo: int, hi: int) -> "HistoryFrame":
+        return HistoryFrame(self.metrics, self._ts[lo:hi], self._values[:, lo:hi], view=True)
+
+    def since(self, cutoff_ns: int) -> "HistoryFrame":
+        """Readings strictly newer than ``cutoff_ns``."""
+        lo = int(np.searchsorted(self.ts, cutoff_ns, side="right"))
+        return self._slice(lo, self._size)
+
+    def tail(self, n: int) -> "HistoryFrame":
+        return self._slice(max(0, self._size - n), self._size)
+
+    # ------------------------------------------------------------------
+    # Append (keeps time order; amortised O(1) for in-order readings)
+    # ------------------------------------------------------------------
+    def append(self, row: dict) -> None:
+        # Arrays are only written past ``_size``; a frame built over arrays of
+        # exactly its length (window views, memory_store frames) grows into
+        # new arrays first, so the arrays it was built from are never changed.
+        if self._view:
+            raise ValueError("cannot append to a window view")
+        ts = row.get("timestamp")
+        if not isinstance(ts, datetime):
+            return
+        t = epoch_ns(ts)
+        col = np.array(
+            [np.nan if row.get(m) is None else row[m] for m in self.metrics], dtype=np.float64
+        )
+        if self._size == len(self._ts):
+            cap = max(16, 2 * len(self._ts))
+            ts_arr = np.empty(cap, dtype=np.int64)
+            vals = np.empty((len(self.metrics), cap), dtype=np.float64)
+            ts_arr[: self._size] = self._ts[: self._size]
+            vals[:, : self._size] = self._values[:, : self._size]
+            self._ts, self._values = ts_arr, vals
+        pos = self._size
+        if pos and t < self._ts[pos - 1]:
+            pos = int(np.searchsorted(self._ts[: self._size], t, side="right"))
+            self._ts[pos + 1: self._size + 1] = self._ts[pos: self._size].copy()
+            self._values[:, pos + 1: self._size + 1] = self._values[:, pos: self._size].copy()
+        self._ts[pos] = t
+        self._values[:, pos] = col
+        self._size += 1
+
+    # ------------------------------------------------------------------
+    # Vectorised statistics
+    # ------------------------------------------------------------------
+    def recent_start(self, window_days: float) -> int:
+        """Index of the first reading within ``window_days`` of the newest one."""
+        if self._size == 0:
+            return 0
+        cutoff = self._ts[self._size - 1] - int(window_days * DAY_NS)
+        return int(np.searchsorted(self.ts, cutoff, side="left"))
+
+    def window_stats(self, window_days: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (count, mean, sample std) per metric over readings within
+        ``window_days`` of the newest reading.  Mean is NaN where count is 0,
+        std is NaN where count < 2.
+        """
+        block = self.values[:, self.recent_start(window_days):]
+        present = ~np.isnan(block)
+        count = present.sum(axis=1)
+        filled = np.where(present, block, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = filled.sum(axis=1) / count
+            dev = np.where(present, block - mean[:, None], 0.0)
+            var = (dev * dev).sum(axis=1) / (count - 1)
+        std = np.where(count > 1, np.sqrt(np.where(count > 1, var, 0.0)), np.nan)
+        return count, mean, std
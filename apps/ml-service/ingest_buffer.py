@@ -0,0 +1,376 @@
+"""
+Write-behind buffer for biometric ingest (group commit).
+
+With write-behind enabled, db.save_biometrics queues evaluated readings here
+and returns immediately.  A background flusher thread writes them in batches
+of up to ML_WRITE_BEHIND_BATCH_ROWS rows.  A batch is written as soon as that
+many readings are waiting, or once the oldest reading has waited
+ML_WRITE_BEHIND_FLUSH_MS.  Many requests share one multi-row INSERT and one
+commit, so they no longer each pay a commit round trip.
+
+Queued readings stay visible to reads.  db.py merges ``pending(user_id)``
+into load_biometrics / load_latest_biometric / count_biometrics, so a user's
+next evaluation sees readings that have not reached the database yet.
+
+The queue is bounded (ML_WRITE_BEHIND_MAX_ROWS).  When it is full, put()
+blocks the caller until the flusher frees space.  If no space frees up
+within ML_WRITE_BEHIND_PUT_TIMEOUT_SECONDS it raises BufferFull, which the
+API reports as 503 like pool exhaustion.  close() drains the queue before
+returning.
+
+A failed flush is handled by the kind of error:
+
+- permanent (the ``permanent`` exception types, e.g. psycopg2.DataError for
+  a value the column cannot hold): the batch is written again in halves
+  until the rows that fail on their own are found.  Those are dropped with
+  a log line and counted in ``poisoned_total``; the rest are written.
+- anything else (lost connection, pool timeout): the unwritten rows go back
+  to the front of the queue, in order, and are retried with backoff capped
+  at 5 s for as long as the outage lasts.  Meanwhile the queue bound pushes
+  back on ingest with 503s; nothing is dropped until close().
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Type
+
+from db_pool import PoolTimeout
+from models import BiometricData
+
+logger = logging.getLogger(__name__)
+
+Row = Tuple[str, BiometricData, str, list]   # (user_id, data, alert_level, anomalies)
+
+
+class BufferFull(PoolTimeout):
+    """The write-behind queue stayed full for the whole put timeout."""
+
+
+class _Entry:
+    __slots__ = ("user_id", "values", "row", "queued_at")
+
+    def __init__(self, values: Row, row: dict, queued_at: float):
+        self.user_id = values[0]
+        self.values = values
+        self.row = row
+        self.queued_at = queued_at
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        logger.warning("[ingest_buffer] Ignoring non-integer %s", name)
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        logger.warning("[ingest_buffer] Ignoring non-numeric %s", name)
+        return default
+
+
+class WriteBehindBuffer:
+    """Bounded queue of evaluated readings drained by one flusher thread."""
+
+    def __init__(
+        self,
+        writer: Callable[[List[Row]], None],
+        shape: Callable[[BiometricData, str, list], dict],
+        max_rows: int = 10000,
+        batch_rows: int = 500,
+        flush_interval: float = 0.2,
+        put_timeout: float = 5.0,
+        permanent: Tuple[Type[BaseException], ...] = (),
+    ):
+        self._writer = writer
+        self._shape = shape
+        self.max_rows = max(1, max_rows)
+        self.batch_rows = max(1, min(batch_rows, self.max_rows))
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.permanent = permanent
+        self._cond = threading.Condition()
+        self._queue: Deque[_Entry] = deque()        # not yet handed to the writer
+        self._inflight: List[_Entry] = []           # being written right now
+        self._by_user: Dict[str, Deque[_Entry]] = {}  # queued + in flight, FIFO
+        self._closing = False
+        self._flush_now = False   # set by flush(): skip the time trigger
+        self._thread: Optional[threading.Thread] = None
+        # Counters
+        self.queued_total = 0
+        self.flushed_total = 0
+        self.flush_batches_total = 0
+        self.flush_failures_total = 0
+        self.backpressure_waits_total = 0
+        self.rejected_total = 0
+        self.dropped_total = 0
+        self.poisoned_total = 0
+        self.last_flush_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, writer: Callable[[List[Row]], None],
+                 shape: Callable[[BiometricData, str, list], dict],
+                 permanent: Tuple[Type[BaseException], ...] = ()) -> "WriteBehindBuffer":
+        return cls(
+            writer,
+            shape,
+            max_rows=_env_int("ML_WRITE_BEHIND_MAX_ROWS", 10000),
+            batch_rows=_env_int("ML_WRITE_BEHIND_BATCH_ROWS", 500),
+            flush_interval=_env_int("ML_WRITE_BEHIND_FLUSH_MS", 200) / 1000.0,
+            put_timeout=_env_float("ML_WRITE_BEHIND_PUT_TIMEOUT_SECONDS", 5.0),
+            permanent=permanent,
+        )
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="ingest-write-behind", daemon=True
+                )
+                self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------------------
+    def _size(self) -> int:
+        return len(self._queue) + len(self._inflight)
+
+    def offer(self, rows: List[Row]) -> bool:
+        """Queue ``rows`` if there is room for all of them now; never blocks."""
+        return self.put(rows, timeout=0)
+
+    def put(self, rows: List[Row], timeout: Optional[float] = None) -> bool:
+        """
+        Queue ``rows``, waiting up to ``timeout`` (default put_timeout) for
+        room.  Returns False for a zero timeout with no room; raises
+        BufferFull when a positive timeout expires.
+        """
+        if not rows:
+            return True
+        timeout = self.put_timeout if timeout is None else timeout
+        need = min(len(rows), self.max_rows)
+        entries = [_Entry(r, self._shape(*r[1:]), 0.0) for r in rows]
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("write-behind buffer is closed")
+            if self._size() + need > self.max_rows:
+                if timeout <= 0:
+                    return False
+                self.backpressure_waits_total += 1
+                self._cond.notify_all()   # wake the flusher: the queue is full
+                while self._size() + need > self.max_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._closing:
+                        self.rejected_total += len(rows)
+                        raise BufferFull(
+                            f"write-behind queue full ({self.max_rows} rows) "
+                            f"after {timeout:.1f}s"
+                        )
+                    self._cond.wait(remaining)
+            now = time.monotonic()
+            was_empty = not self._queue
+            for entry in entries:
+                entry.queued_at = now
+                self._queue.append(entry)
+                self._by_user.setdefault(entry.user_id, deque()).append(entry)
+            self.queued_total += len(entries)
+            # An idle flusher waits without a deadline: wake it to start the
+            # flush timer for the first reading
+            if was_empty or len(self._queue) >= self.batch_rows:
+                self._cond.notify_all()
+        self.start()
+        return True
+
+    # ------------------------------------------------------------------
+    # Read-your-writes
+    # ------------------------------------------------------------------
+    def pending(self, user_id: str) -> List[dict]:
+        """Rows for ``user_id`` not yet committed, shaped like load_biometrics rows."""
+        with self._cond:
+            entries = self._by_user.get(user_id)
+            return [e.row for e in entries] if entries else []
+
+    # ------------------------------------------------------------------
+    # Flusher
+    # ------------------------------------------------------------------
+    def _next_batch(self) -> Optional[List[_Entry]]:
+        """Block until a batch is due; None once closed and fully drained."""
+        with self._cond:
+            while True:
+                if self._queue:
+                    due = self._queue[0].queued_at + self.flush_interval
+                    if (self._closing or self._flush_now
+                            or len(self._queue) >= self.batch_rows
+                            or time.monotonic() >= due):
+                        n = min(len(self._queue), self.batch_rows)
+                        batch = [self._queue.popleft() for _ in range(n)]
+                        self._inflight = batch
+                        if not self._queue:
+                            self._flush_now = False
+                        return batch
+                    self._cond.wait(max(0.0, due - time.monotonic()))
+                elif self._closing:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _write(self, entries: List[_Entry]) -> None:
+        self._writer([e.values for e in entries])
+
+    def _isolate(
+        self, batch: List[_Entry],
+    ) -> Tuple[List[_Entry], List[_Entry], List[_Entry], Optional[Exception]]:
+        """
+        Write ``batch`` in ever smaller halves after a permanent error, and
+        drop each row that fails on its own.  Returns (written, dropped,
+        unwritten, error): unwritten rows are in order, and error is the
+        temporary error that stopped the search, if any.
+        """
+        written: List[_Entry] = []
+        dropped: List[_Entry] = []
+        chunks = [batch]
+        while chunks:
+            chunk = chunks.pop()
+            try:
+                self._write(chunk)
+            except self.permanent as e:
+                if len(chunk) > 1:
+                    mid = len(chunk) // 2
+                    chunks += [chunk[mid:], chunk[:mid]]
+                    continue
+                bad = chunk[0]
+                logger.error(
+                    "[ingest_buffer] Dropping reading for user %s at %s: %s",
+                    bad.user_id, bad.values[1].timestamp.isoformat(), e,
+                )
+                dropped.append(bad)
+                continue
+            except Exception as e:
+                unwritten = [entry for c in reversed(chunks) for entry in c]
+                return written, dropped, chunk + unwritten, e
+            written.extend(chunk)
+        return written, dropped, [], None
+
+    def _finish(self, entries: List[_Entry], written: int, started: float,
+                still_inflight: Optional[List[_Entry]] = None) -> None:
+        """Forget ``entries`` (written or dropped) and wake waiting producers."""
+        with self._cond:
+            for entry in entries:
+                user_entries = self._by_user[entry.user_id]
+                user_entries.remove(entry)
+                if not user_entries:
+                    del self._by_user[entry.user_id]
+            self._inflight = still_inflight or []
+            if written:
+                self.flushed_total += written
+                self.flush_batches_total += 1
+                self.last_flush_seconds = time.monotonic() - started
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        failures = 0
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            started = time.monotonic()
+            written, dropped, unwritten, error = batch, [], [], None
+            try:
+                self._write(batch)
+            except self.permanent as e:
+                logger.warning(
+                    "[ingest_buffer] Flush of %d rows rejected, isolating bad rows: %s",
+                    len(batch), e,
+                )
+                with self._cond:
+                    self.flush_failures_total += 1
+                written, dropped, unwritten, error = self._isolate(batch)
+                with self._cond:
+                    self.poisoned_total += len(dropped)
+            except Exception as e:
+                written, unwritten, error = [], batch, e
+            self._finish(written + dropped, len(written), started, unwritten)
+            if error is None:
+                failures = 0
+                continue
+
+            failures += 1
+            with self._cond:
+                self.flush_failures_total += 1
+                closing = self._closing
+            logger.warning(
+                "[ingest_buffer] Flush of %d rows failed (attempt %d): %s",
+                len(unwritten), failures, error,
+            )
+            with self._cond:
+                # Put the rows back at the front, in their original order
+                self._queue.extendleft(reversed(unwritten))
+                self._inflight = []
+            if closing and failures >= 3:
+                self._drop_queued()
+                return
+            time.sleep(min(5.0, 0.1 * 2 ** min(failures, 6)))
+
+    def _drop_queued(self) -> None:
+        with self._cond:
+            dropped = len(self._queue)
+            self._queue.clear()
+            self._by_user.clear()
+            self.dropped_total += dropped
+            self._cond.notify_all()
+        logger.error("[ingest_buffer] Dropped %d unwritten rows on shutdown", dropped)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is written.  False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._queue:
+                self._flush_now = True
+                self._cond.notify_all()
+            while self._size():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        """Stop accepting rows, write everything queued, stop the flusher."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.error(
+                    "[ingest_buffer] Flusher still running after %.0fs; %d rows unwritten",
+                    timeout or 0, self._size(),
+                )
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "inflight": len(self._inflight),
+                "max_rows": self.max_rows,
+                "queued_total": self.queued_total,
+                "flushed_total": self.flushed_total,
+                "flush_batches_total": self.flush_batches_total,
+                "flush_failures_total": self.flush_failures_total,
+                "backpressure_waits_total": self.backpressure_waits_total,
+                "rejected_total": self.rejected_total,
+                "dropped_total": self.dropped_total,
+                "poisoned_total": self.poisoned_total,
+                "last_flush_seconds": round(self.last_flush_seconds, 6),
+            }
@@ -0,0 +1,208 @@
+"""
+Streaming NDJSON ingest for bulk wearable backfills (POST /ingest/stream).
+
+The request body is newline-delimited BiometricData records for one user,
+oldest first.  Lines are parsed and validated as they arrive, and valid
+readings are grouped into chunks of ML_STREAM_CHUNK_ROWS.  Each chunk goes
+through EarlyWarningEngine.aingest_batch: history and context are loaded
+once, readings are evaluated in timestamp order, and the chunk is written in
+one multi-row INSERT.  Memory is bounded by one chunk plus one line
+(ML_STREAM_MAX_LINE_BYTES), whatever the size of the upload.
+
+The response is NDJSON too, written while the upload is still being read:
+
+    {"type": "error", "line": 7, "detail": [...]}            invalid record, skipped
+    {"type": "progress", "chunk": 1, "processed": 500, ...}   one per stored chunk
+    {"type": "done", "processed": 1200, "rejected": 1, ...}   end of upload
+
+The status is 200 once streaming starts, so later failures are reported in
+band.  A storage failure, or more than ML_STREAM_MAX_ERRORS invalid records,
+ends the stream with ``{"type": "error", "fatal": true, ...}``.  Chunks
+reported in earlier progress lines are already stored, so a client can
+resume after ``processed`` records.
+"""
+
+import logging
+import os
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+import fast_json
+from models import AlertLevel, BiometricData
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPE = "application/x-ndjson"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        logger.warning("[ingest_stream] Ignoring non-integer %s", name)
+        return default
+
+
+CHUNK_ROWS = max(1, _env_int("ML_STREAM_CHUNK_ROWS", 500))
+MAX_LINE_BYTES = max(1024, _env_int("ML_STREAM_MAX_LINE_BYTES", 64 * 1024))
+MAX_ERRORS = max(0, _env_int("ML_STREAM_MAX_ERRORS", 100))
+
+IngestBatch = Callable[
+    [List[Tuple[str, BiometricData]]], Awaitable[List[Tuple[AlertLevel, List[str]]]]
+]
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that may be sent while the request body is still read.
+
+    StreamingResponse normally reads ``receive`` alongside the body iterator
+    to spot client disconnects, which would swallow request body messages
+    meant for the handler.  Here a disconnect surfaces from request.stream()
+    (ClientDisconnect) or from ``send`` instead.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def ndjson_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES,
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Yield ``(line number, line)`` for each non-blank line of a byte stream.
+
+    Line numbers are 1-based and count blank lines.  A line longer than
+    ``max_line_bytes`` is yielded once as ``(line number, None)`` and the
+    rest of it is discarded without being buffered.
+    """
+    pending = bytearray()
+    line_no = 0
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            line_no += 1
+            if skipping:
+                skipping = False
+            elif len(pending) + end - start > max_line_bytes:
+                pending.clear()
+                yield line_no, None
+            else:
+                if pending:
+                    pending += chunk[start:end]
+                    line = bytes(pending)
+                    pending.clear()
+                else:
+                    line = chunk[start:end]
+                if line.strip():
+                    yield line_no, line
+            start = end + 1
+        if skipping:
+            continue
+        pending += chunk[start:]
+        if len(pending) > max_line_bytes:
+            pending.clear()
+            skipping = True
+            yield line_no + 1, None
+    if pending and not skipping and pending.strip():
+        yield line_no + 1, bytes(pending)
+
+
+def _line(payload: dict) -> bytes:
+    return fast_json.dumps(payload) + b"\n"
+
+
+def _validation_detail(exc: ValidationError) -> List[dict]:
+    return [
+        {"loc": [str(part) for part in err["loc"]], "msg": err["msg"]}
+        for err in exc.errors(include_url=False)
+    ]
+
+
+async def stream_ingest(
+    ingest_batch: IngestBatch, user_id: str, chunks: AsyncIterator[bytes],
+    chunk_rows: int = CHUNK_ROWS, max_line_bytes: int = MAX_LINE_BYTES,
+    max_errors: int = MAX_ERRORS,
+) -> AsyncIterator[bytes]:
+    """Parse, evaluate and store an NDJSON upload; yields NDJSON status lines."""
+    batch: List[Tuple[int, BiometricData]] = []
+    processed = rejected = chunk_no = 0
+    alert_counts: Dict[str, int] = {level.value: 0 for level in AlertLevel}
+
+    async def flush() -> bytes:
+        nonlocal processed, chunk_no
+        outcomes = await ingest_batch([(user_id, data) for _, data in batch])
+        chunk_no += 1
+        processed += len(batch)
+        counts: Dict[str, int] = {level.value: 0 for level in AlertLevel}
+        alerts = []
+        for (line_no, data), (alert_level, anomalies) in zip(batch, outcomes):
+            counts[alert_level.value] += 1
+            if alert_level != AlertLevel.GREEN:
+                alerts.append({
+                    "line": line_no,
+                    "timestamp": data.timestamp.isoformat(),
+                    "alert_level": alert_level.value,
+                    "anomalies": anomalies,
+                })
+        for level, count in counts.items():
+            alert_counts[level] += count
+        batch.clear()
+        return _line({
+            "type": "progress", "chunk": chunk_no, "rows": sum(counts.values()),
+            "processed": processed, "rejected": rejected,
+            "alert_counts": counts, "alerts": alerts,
+        })
+
+    def fatal(detail: str) -> bytes:
+        return _line({
+            "type": "error", "fatal": True, "detail": detail,
+            "processed": processed, "rejected": rejected,
+        })
+
+    async def store() -> Tuple[bytes, bool]:
+        try:
+            return await flush(), True
+        except Exception as e:
+            logger.warning("[ingest_stream] Chunk %d failed for %s: %s", chunk_no + 1, user_id, e)
+            return fatal(str(e) or type(e).__name__), False
+
+    async for line_no, line in ndjson_lines(chunks, max_line_bytes):
+        if line is None:
+            detail = f"line longer than {max_line_bytes} bytes"
+        else:
+            try:
+                batch.append((line_no, BiometricData.model_validate_json(line)))
+                detail = None
+            except ValidationError as e:
+                detail = _validation_detail(e)
+        if detail is not None:
+            rejected += 1
+            yield _line({"type": "error", "line": line_no, "detail": detail})
+            if rejected > max_errors:
+                yield fatal(f"more than {max_errors} invalid records")
+                return
+            continue
+        if len(batch) >= chunk_rows:
+            out, ok = await store()
+            yield out
+            if not ok:
+                return
+    if batch:
+        out, ok = await store()
+        yield out
+        if not ok:
+            return
+    yield _line({
+        "type": "done", "user_id": user_id, "processed": processed,
+        "rejected": rejected, "chunks": chunk_no, "alert_counts": alert_counts,
+    })
@@ -1,16 +1,29 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import Optional
 from models import (
     BiometricData, IngestResponse, ReadinessScore, AlertLevel,
     ContextualProfile, EarlyWarningSummary,
+    BatchIngestRequest, BatchIngestResponse, BatchIngestResult,
+    BatchReadinessRequest, BatchReadinessResponse,
+    CohortScoreRequest, CohortScoreResponse,
 )
-from engine import EarlyWarningEngine, _dict_to_biometric
+from engine import EarlyWarningEngine
 import db
+import db_async
+import fast_json
+import ingest_stream
+import metrics
+import risk_sweep
+import startup
+from db_pool import PoolTimeout
+from contextlib import asynccontextmanager
 from datetime import datetime
 import os
 import hmac
+import time
+import asyncio
 from dotenv import load_dotenv
 
 
@@ -24,12 +37,30 @@ load_dotenv()
 ML_SERVICE_SHARED_SECRET = os.getenv("ML_SERVICE_SHARED_SECRET", "").strip()
 ML_SERVICE_REQUIRE_AUTH = os.getenv("ML_SERVICE_REQUIRE_AUTH", "true").strip().lower() == "true"
 ML_SERVICE_AUTH_HEADER = "x-ahava-service-key"
-ML_SERVICE_PUBLIC_PATHS = {"/", "/docs", "/openapi.json", "/redoc"}
+ML_SERVICE_PUBLIC_PATHS = {"/", "/health/live", "/health/ready", "/docs", "/openapi.json", "/redoc"}
+# Let Prometheus scrape /metrics without the service key
+if os.getenv("ML_METRICS_PUBLIC", "false").strip().lower() == "true":
+    ML_SERVICE_PUBLIC_PATHS.add("/metrics")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Not awaited: uvicorn binds only after startup returns (see startup.py)
+    warm_up = asyncio.create_task(startup.warm_up())
+    maintenance = asyncio.create_task(startup.storage_maintenance())
+    yield
+    warm_up.cancel()
+    maintenance.cancel()
+    # Drain queued write-behind rows before the pools go away
+    await asyncio.to_thread(db.close_write_behind)
+    await db_async.close()
+
 
 app = FastAPI(
     title="Ahava Healthcare - ML Early Warning Service",
     version="1.0.0",
-    description="Analyzes wearable data for pre-symptomatic physiological shifts."
+    description="Analyzes wearable data for pre-symptomatic physiological shifts.",
+    lifespan=lifespan,
+    default_response_class=fast_json.FastJSONResponse,
 )
 
 print(
@@ -41,10 +72,31 @@ print(
 # Initialize Engine
 engine = EarlyWarningEngine()
 
+# Pool exhaustion is load shedding, not a server fault: tell the caller to retry.
+POOL_RETRY_AFTER_SECONDS = os.getenv("ML_DB_POOL_RETRY_AFTER_SECONDS", "1")
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, retry shortly"},
+        headers={"Retry-After": POOL_RETRY_AFTER_SECONDS},
+    )
+
 @app.get("/")
 def health_check():
     return {"status": "ok", "service": "ML-Service-v1"}
 
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving; restart it only if this fails."""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def readiness():
+    """200 once schema, pools and model are warm (startup.py); 503 until then."""
+    return JSONResponse(status_code=200 if startup.is_ready() else 503, content=startup.status())
+
 @app.middleware("http")
 async def verify_service_auth(request: Request, call_next):
     """
@@ -64,85 +116,239 @@ async def verify_service_auth(request: Request, call_next):
     return await call_next(request)
 
 @app.post("/ingest", response_model=IngestResponse)
-def ingest_biometrics(data: BiometricData, user_id: str):
+async def ingest_biometrics(data: BiometricData, user_id: str):
     """
     Ingest user biometric data and run anomaly detection.
     """
     try:
-        alert_level, anomalies = engine.ingest(user_id, data)
+        alert_level, anomalies = await engine.aingest(user_id, data)
         
         message = "Data processed successfully."
         if alert_level != AlertLevel.GREEN:
             message = "Anomalies detected. Medical review suggested."
 
-        return IngestResponse(
+        return fast_json.model_response(IngestResponse(
             user_id=user_id,
             status="processed",
             processed_at=datetime.now(),
             alert_level=alert_level,
             anomalies=anomalies,
             message=message
-        )
+        ))
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/ingest/batch", response_model=BatchIngestResponse)
+async def ingest_biometrics_batch(body: BatchIngestRequest):
+    """
+    Ingest many readings (e.g. a wearable backfill) in one request.
+    History and context are loaded once per user and all rows are written
+    with a single multi-row INSERT.  At most 5000 readings; larger
+    backfills use /ingest/stream.
+    """
+    try:
+        readings = [(item.user_id, item.data) for item in body.readings]
+        outcomes = await engine.aingest_batch(readings)
+        return fast_json.model_response(BatchIngestResponse(
+            status="processed",
+            processed_at=datetime.now(),
+            processed=len(readings),
+            users=len({user_id for user_id, _ in readings}),
+            results=[
+                BatchIngestResult(
+                    user_id=user_id,
+                    timestamp=data.timestamp,
+                    alert_level=alert_level,
+                    anomalies=anomalies,
+                )
+                for (user_id, data), (alert_level, anomalies) in zip(readings, outcomes)
+            ],
+        ))
+    except PoolTimeout:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/ingest/stream")
+async def ingest_biometrics_stream(user_id: str, request: Request):
+    """
+    Ingest a large backfill as NDJSON (one BiometricData per line, oldest
+    first).  Records are validated, evaluated and stored in bounded chunks
+    while the upload is read; progress and alerts stream back as NDJSON.
+    See ingest_stream.py for the response lines.
+    """
+    return ingest_stream.DuplexStreamingResponse(
+        ingest_stream.stream_ingest(engine.aingest_batch, user_id, request.stream()),
+        media_type=ingest_stream.MEDIA_TYPE,
+    )
+
 @app.get("/readiness-score/{user_id}", response_model=ReadinessScore)
-def get_readiness_score(user_id: str):
+async def get_readiness_score(user_id: str):
     """
     Calculate daily readiness score (0-100) using persistent DB history.
     """
-    score, baseline_status, trend = engine.get_readiness_score(user_id)
-    return ReadinessScore(
+    score, baseline_status, trend = await engine.aget_readiness_score(user_id)
+    return fast_json.model_response(ReadinessScore(
         user_id=user_id,
         score=score,
         baseline_status=baseline_status,
         trend=trend,
-    )
+    ))
+
+
+@app.post("/readiness-score/batch", response_model=BatchReadinessResponse)
+async def get_readiness_scores(body: BatchReadinessRequest):
+    """
+    Readiness scores for many users.  Latest readings, histories and profiles
+    are loaded with one set-based query each and all scores are computed in
+    one vectorised pass; results match GET /readiness-score/{user_id}.
+    """
+    try:
+        scores = await engine.aget_readiness_scores(body.user_ids)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return fast_json.model_response(BatchReadinessResponse(scores=[
+        ReadinessScore(
+            user_id=u, score=scores[u][0], baseline_status=scores[u][1], trend=scores[u][2],
+        )
+        for u in body.user_ids
+    ]))
 
 
 @app.post("/early-warning/analyze", response_model=EarlyWarningSummary)
-def early_warning_analyze(user_id: str, body: EarlyWarningAnalyzeRequest):
+async def early_warning_analyze(user_id: str, body: EarlyWarningAnalyzeRequest):
     """
     Full early-warning analysis: preprocessing, Framingham/QRISK3/ML risk scores,
     fusion layer (trajectory + alert). For use by backend or direct integration.
     """
     try:
-        # Store new data first so baselines and features include this point
-        engine.ingest(user_id, body.biometrics)
-        summary = engine.full_analysis(user_id, body.biometrics, body.context)
-        return summary
+        # Store new data first so baselines and features include this point.
+        # Both steps share one context so history/profile are loaded once.
+        ctx = await engine.aanalysis_context(user_id)
+        await engine.aingest(user_id, body.biometrics, ctx)
+        summary = await engine.afull_analysis(user_id, body.biometrics, body.context, ctx)
+        # Serialised once: the same JSON is stored and sent
+        summary_json = summary.model_dump_json()
+        await engine.astore_summary(user_id, summary_json, body.biometrics.timestamp, ctx.profile)
+        return fast_json.raw_response(summary_json)
+    except PoolTimeout:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/early-warning/summary/{user_id}", response_model=EarlyWarningSummary)
-def early_warning_summary(user_id: str):
+async def early_warning_summary(user_id: str):
     """
     Return latest early-warning summary using last stored biometric row from DB.
-    Returns HTTP 404 if no data exists for user.
+    Served from the materialised summary while that row is still the latest;
+    recomputed (and stored) when stale.  Returns HTTP 404 if no data exists for user.
     """
-    latest_row = db.load_latest_biometric(user_id)
-    if not latest_row:
-        raise HTTPException(status_code=404, detail="No biometric data for user")
     try:
-        last = _dict_to_biometric(latest_row)
-        summary = engine.full_analysis(user_id, last, engine.get_context(user_id))
-        return summary
+        summary_json = await engine.alatest_summary_json(user_id)
+    except PoolTimeout:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if summary_json is None:
+        raise HTTPException(status_code=404, detail="No biometric data for user")
+    return fast_json.raw_response(summary_json)
+
+
+@app.post("/early-warning/cohort-scores", response_model=CohortScoreResponse)
+async def score_cohort(body: CohortScoreRequest):
+    """
+    Framingham / QRISK3 / ML CVD risk and 2-year trajectory for many members
+    at once (insurer and population-health requests).  Scores match what
+    /early-warning/analyze reports for the same profile and reading.
+    """
+    members = body.members
+
+    def score() -> bytes:
+        scores = engine.score_cohort(
+            [m.profile for m in members], [m.biometrics for m in members],
+            [m.hr_trend_2w for m in members], [m.hrv_vs_baseline for m in members],
+        )
+        return fast_json.dumps({
+            "model_version": engine.MODEL_VERSION,
+            "scores": engine.cohort_score_rows([m.member_id for m in members], scores),
+        })
+
+    # Scoring and encoding a large cohort is pure CPU; keep the event loop free
+    return fast_json.raw_response(await asyncio.to_thread(score))
 
 
 @app.put("/early-warning/context/{user_id}")
-def set_early_warning_context(user_id: str, context: ContextualProfile):
+async def set_early_warning_context(user_id: str, context: ContextualProfile):
     """Store contextual profile (age, smoker, hypertension) for CVD risk algorithms."""
-    engine.set_context(user_id, context)
+    await engine.aset_context(user_id, context)
     return {"status": "ok", "user_id": user_id}
 
 
 @app.get("/early-warning/baseline/{user_id}")
-def get_baseline_info(user_id: str):
+async def get_baseline_info(user_id: str):
     """Return baseline confidence stage and progress for a user."""
-    return engine.get_baseline_info(user_id)
+    return await engine.aget_baseline_info(user_id)
+
+
+@app.post("/admin/risk-sweep", status_code=202)
+async def start_risk_sweep(workers: Optional[int] = None, chunk_users: Optional[int] = None):
+    """Start a population risk sweep in the background (see risk_sweep.py)."""
+    try:
+        sweep_id = risk_sweep.start_background(workers, chunk_users)
+    except risk_sweep.SweepRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "started", "sweep_id": sweep_id}
+
+
+@app.get("/admin/risk-sweep/latest")
+async def get_latest_risk_sweep(limit: int = 100, flagged_only: bool = True):
+    """Newest completed sweep: flagged users, highest priority first."""
+    ranked = await asyncio.to_thread(risk_sweep.latest_ranked, min(max(limit, 1), 10000), flagged_only)
+    if ranked is None:
+        raise HTTPException(status_code=404, detail="No completed risk sweep")
+    return ranked
+
+
+@app.get("/admin/risk-sweep/{sweep_id}")
+async def get_risk_sweep(sweep_id: str):
+    """Progress or outcome of one sweep."""
+    run = await asyncio.to_thread(risk_sweep.run_status, sweep_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Unknown sweep")
+    return run
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Stage and route latency histograms plus pool, queue and cache stats (Prometheus text)."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+metrics.register_stats("db_pool", db.pool_stats, pool="sync")
+metrics.register_stats("db_pool", db_async.pool_stats, pool="async")
+metrics.register_stats("write_behind", db.write_behind_stats)
+metrics.register_stats("history_cache", db.history_cache_stats)
+metrics.register_stats("context_cache", db.context_cache_stats)
+metrics.register_stats("memory_store", db.memory_store_stats)
+metrics.register_stats("startup", startup.stats)
+metrics.register_stats("storage", db.storage_stats)
+
+
+@app.get("/health/db-pool")
+async def get_db_pool_stats():
+    """Connection pool, write-behind queue and cache gauges and counters."""
+    return {
+        "sync": db.pool_stats(),
+        "async": db_async.pool_stats(),
+        "write_behind": db.write_behind_stats(),
+        "history_cache": db.history_cache_stats(),
+        "context_cache": db.context_cache_stats(),
+    }
 
 # Middleware / Metadata
 @app.middleware("http")
@@ -151,6 +357,23 @@ async def add_medical_disclaimer(request, call_next):
     response.headers["X-Medical-Disclaimer"] = "Not a Medical Diagnosis. For informational purposes only."
     return response
 
+# Registered last so it wraps every other middleware (auth, disclaimer)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route template, not the raw path, to keep label cardinality bounded
+        route = request.scope.get("route")
+        metrics.observe_request(
+            getattr(route, "path", "unmatched"), request.method, status,
+            time.perf_counter() - started,
+        )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
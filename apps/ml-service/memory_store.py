@@ -0,0 +1,289 @@
+"""
+Columnar in-memory biometric store, used by db.py when DATABASE_URL is unset.
+
+Readings used to be kept as one model_dump() dict each (about a kilobyte per
+reading), and every window query filtered and sorted the user's whole list.
+Here each user has one time-sorted series: int64 epoch-nanosecond
+timestamps, a (columns x readings) float64 matrix for the numeric fields,
+uint8 codes for ecg_rhythm / temperature_trend / alert_level and one shared
+tuple reference for anomalies.  That is about 85 bytes per reading.  Values
+stay float64 so in-memory results match Postgres' DOUBLE PRECISION columns.
+
+Window, latest and count queries are binary searches over the timestamps.
+Only the rows a query returns are materialised as dicts, in the same shape
+as db.load_biometrics rows from Postgres.  ``frame`` skips the dicts
+altogether: it hands the engine a HistoryFrame whose arrays are views of the
+store's buffers.  That is safe without copying because buffer positions
+below ``end`` are never written again.  Appends fill positions past it, and
+compaction, growth and backfill merges build new buffers.
+
+Each series is a sliding buffer: readings are appended at the end (in-order
+writes are amortised O(1)), and the oldest are dropped from the front once
+a user holds more than ``max_readings``.  Out-of-order (backfilled) readings
+are merged into place.
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from history_frame import HistoryFrame, epoch_ns
+from models import BiometricData
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Numeric columns, in matrix row order
+FLOAT_COLUMNS = (
+    "heart_rate_resting", "hrv_rmssd", "spo2", "respiratory_rate",
+    "step_count", "active_calories", "sleep_duration_hours", "skin_temp_offset",
+)
+CODE_COLUMNS = ("ecg_rhythm", "temperature_trend", "alert_level")
+# Key order of rows returned to callers (BiometricData.model_dump() + evaluation)
+ROW_KEYS = (
+    "timestamp", "heart_rate_resting", "hrv_rmssd", "spo2", "skin_temp_offset",
+    "respiratory_rate", "step_count", "active_calories", "sleep_duration_hours",
+    "ecg_rhythm", "temperature_trend", "alert_level", "anomalies",
+)
+_STEP = FLOAT_COLUMNS.index("step_count")
+_NO_ANOMALIES: tuple = ()
+
+Row = Tuple[str, BiometricData, str, list]   # (user_id, data, alert_level, anomalies)
+
+
+class _Codes:
+    """String <-> small-int dictionary for one categorical column."""
+
+    __slots__ = ("values", "_index")
+
+    def __init__(self, known: Sequence[str]):
+        self.values: List[str] = list(known)
+        self._index = {v: i for i, v in enumerate(self.values)}
+
+    def encode(self, value: str) -> int:
+        code = self._index.get(value)
+        if code is None:
+            if len(self.values) >= 255:
+                raise ValueError(f"too many distinct values ({value!r})")
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class _Series:
+    """One user's readings, sorted by time, in ``[start, end)`` of the buffers."""
+
+    __slots__ = ("ts", "values", "codes", "anomalies", "start", "end")
+
+    def __init__(self):
+        self.ts = np.empty(0, dtype=np.int64)
+        self.values = np.empty((len(FLOAT_COLUMNS), 0), dtype=np.float64)
+        self.codes = np.empty((len(CODE_COLUMNS), 0), dtype=np.uint8)
+        self.anomalies = np.empty(0, dtype=object)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    @property
+    def live_ts(self) -> np.ndarray:
+        return self.ts[self.start: self.end]
+
+    def _resize(self, capacity: int) -> None:
+        n = len(self)
+        ts = np.empty(capacity, dtype=np.int64)
+        values = np.empty((len(FLOAT_COLUMNS), capacity), dtype=np.float64)
+        codes = np.empty((len(CODE_COLUMNS), capacity), dtype=np.uint8)
+        anomalies = np.empty(capacity, dtype=object)
+        ts[:n] = self.ts[self.start: self.end]
+        values[:, :n] = self.values[:, self.start: self.end]
+        codes[:, :n] = self.codes[:, self.start: self.end]
+        anomalies[:n] = self.anomalies[self.start: self.end]
+        self.ts, self.values, self.codes, self.anomalies = ts, values, codes, anomalies
+        self.start, self.end = 0, n
+
+    def _reserve(self, extra: int) -> None:
+        needed = len(self) + extra
+        capacity = len(self.ts)
+        if self.end + extra <= capacity:
+            return
+        # Reuse the space freed at the front before growing
+        self._resize(capacity if needed <= capacity else max(16, needed + needed // 2))
+
+    def insert(self, ts: np.ndarray, values: np.ndarray, codes: np.ndarray,
+               anomalies: np.ndarray) -> None:
+        """Add readings already sorted by ``ts``."""
+        k = len(ts)
+        if len(self) == 0 or ts[0] >= self.ts[self.end - 1]:
+            self._reserve(k)
+            lo, hi = self.end, self.end + k
+            self.ts[lo:hi] = ts
+            self.values[:, lo:hi] = values
+            self.codes[:, lo:hi] = codes
+            self.anomalies[lo:hi] = anomalies
+            self.end = hi
+            return
+        # Backfill: stable merge into time order (equal timestamps keep arrival order)
+        at = np.searchsorted(self.live_ts, ts, side="right")
+        s, e = self.start, self.end
+        merged_ts = np.insert(self.ts[s:e], at, ts)
+        merged_values = np.insert(self.values[:, s:e], at, values, axis=1)
+        merged_codes = np.insert(self.codes[:, s:e], at, codes, axis=1)
+        merged_anomalies = np.insert(self.anomalies[s:e], at, anomalies)
+        n = len(merged_ts)
+        self.ts, self.values, self.codes, self.anomalies = (
+            merged_ts, merged_values, merged_codes, merged_anomalies,
+        )
+        self.start, self.end = 0, n
+        self._resize(max(16, n + n // 2))
+
+    def trim(self, max_readings: int) -> int:
+        """Drop the oldest readings beyond ``max_readings``; returns how many."""
+        dropped = len(self) - max_readings
+        if dropped <= 0:
+            return 0
+        self.anomalies[self.start: self.start + dropped] = None
+        self.start += dropped
+        return dropped
+
+    def nbytes(self) -> int:
+        return self.ts.nbytes + self.values.nbytes + self.codes.nbytes + self.anomalies.nbytes
+
+
+class MemoryStore:
+    """Thread-safe per-user columnar readings with a per-user retention cap."""
+
+    def __init__(self, max_readings: int = 100_000):
+        self.max_readings = max(1, max_readings)
+        self._series: Dict[str, _Series] = {}
+        self._codes = {
+            "ecg_rhythm": _Codes(("unknown", "regular", "irregular")),
+            "temperature_trend": _Codes(("normal", "elevated_single_day", "elevated_over_3_days")),
+            "alert_level": _Codes(("GREEN", "YELLOW", "RED")),
+        }
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Write
+    # ------------------------------------------------------------------
+    def add(self, rows: Iterable[Row]) -> None:
+        by_user: Dict[str, List[Row]] = {}
+        for row in rows:
+            by_user.setdefault(row[0], []).append(row)
+        with self._lock:
+            for user_id, user_rows in by_user.items():
+                self._add_user(user_id, user_rows)
+
+    def _add_user(self, user_id: str, rows: List[Row]) -> None:
+        k = len(rows)
+        ts = np.fromiter((epoch_ns(r[1].timestamp) for r in rows), dtype=np.int64, count=k)
+        values = np.array(
+            [[float(getattr(r[1], c) or 0) for r in rows] for c in FLOAT_COLUMNS],
+            dtype=np.float64,
+        ).reshape(len(FLOAT_COLUMNS), k)
+        ecg, trend, level = (self._codes[c] for c in CODE_COLUMNS)
+        codes = np.array(
+            [
+                [ecg.encode(getattr(r[1], "ecg_rhythm", "unknown") or "unknown") for r in rows],
+                [trend.encode(getattr(r[1], "temperature_trend", "normal") or "normal") for r in rows],
+                [level.encode(r[2]) for r in rows],
+            ],
+            dtype=np.uint8,
+        ).reshape(len(CODE_COLUMNS), k)
+        anomalies = np.empty(k, dtype=object)
+        anomalies[:] = [tuple(r[3]) if r[3] else _NO_ANOMALIES for r in rows]
+        if k > 1 and np.any(ts[1:] < ts[:-1]):
+            order = np.argsort(ts, kind="stable")
+            ts, values, codes, anomalies = ts[order], values[:, order], codes[:, order], anomalies[order]
+        series = self._series.get(user_id)
+        if series is None:
+            series = self._series[user_id] = _Series()
+        series.insert(ts, values, codes, anomalies)
+        self.evictions += series.trim(self.max_readings)
+
+    def discard(self, user_id: str) -> None:
+        with self._lock:
+            self._series.pop(user_id, None)
+
+    # ------------------------------------------------------------------
+    # Read
+    # ------------------------------------------------------------------
+    def users(self) -> List[str]:
+        with self._lock:
+            return list(self._series)
+
+    def _rows(self, series: _Series, lo: int, hi: int) -> List[dict]:
+        """Materialise buffer positions ``[lo, hi)`` as row dicts."""
+        if hi <= lo:
+            return []
+        stamps = [_EPOCH + timedelta(microseconds=us) for us in (series.ts[lo:hi] // 1000).tolist()]
+        columns = {c: series.values[i, lo:hi].tolist() for i, c in enumerate(FLOAT_COLUMNS)}
+        columns["step_count"] = series.values[_STEP, lo:hi].astype(np.int64).tolist()
+        for i, c in enumerate(CODE_COLUMNS):
+            table = self._codes[c].values
+            columns[c] = [table[code] for code in series.codes[i, lo:hi].tolist()]
+        columns["anomalies"] = [list(a) for a in series.anomalies[lo:hi]]
+        columns["timestamp"] = stamps
+        return [dict(zip(ROW_KEYS, values)) for values in zip(*(columns[k] for k in ROW_KEYS))]
+
+    def window(self, user_id: str, since_ns: int) -> List[dict]:
+        """Rows with timestamp >= ``since_ns``, oldest first."""
+        with self._lock:
+            series = self._series.get(user_id)
+            if series is None:
+                return []
+            lo = series.start + int(np.searchsorted(series.live_ts, since_ns, side="left"))
+            return self._rows(series, lo, series.end)
+
+    def frame(self, user_id: str, since_ns: int, columns: Sequence[str]) -> HistoryFrame:
+        """
+        ``window`` as a HistoryFrame of ``columns`` (FLOAT_COLUMNS names).
+        Zero-copy when ``columns`` are consecutive in FLOAT_COLUMNS order, as
+        the engine's are.  The frame is exactly as long as its arrays, so its
+        first append copies them (HistoryFrame.append grows into new arrays).
+        """
+        rows = [FLOAT_COLUMNS.index(c) for c in columns]
+        consecutive = rows == list(range(rows[0], rows[0] + len(rows))) if rows else True
+        with self._lock:
+            series = self._series.get(user_id)
+            if series is None:
+                return HistoryFrame(columns, np.empty(0, dtype=np.int64),
+                                    np.empty((len(rows), 0), dtype=np.float64))
+            lo = series.start + int(np.searchsorted(series.live_ts, since_ns, side="left"))
+            hi = series.end
+            if consecutive and rows:
+                values = series.values[rows[0]: rows[0] + len(rows), lo:hi]
+            else:
+                values = series.values[rows, lo:hi]
+            return HistoryFrame(columns, series.ts[lo:hi], values)
+
+    def latest(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            series = self._series.get(user_id)
+            if series is None or len(series) == 0:
+                return None
+            return self._rows(series, series.end - 1, series.end)[0]
+
+    def count(self, user_id: str, since_ns: int) -> int:
+        """Readings with timestamp >= ``since_ns``."""
+        with self._lock:
+            series = self._series.get(user_id)
+            if series is None:
+                return 0
+            return len(series) - int(np.searchsorted(series.live_ts, since_ns, side="left"))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            readings = sum(len(s) for s in self._series.values())
+            nbytes = sum(s.nbytes() for s in self._series.values())
+            return {
+                "users": len(self._series),
+                "readings": readings,
+                "bytes": nbytes,
+                "bytes_per_reading": round(nbytes / readings, 1) if readings else 0.0,
+                "max_readings_per_user": self.max_readings,
+                "evictions": self.evictions,
+            }
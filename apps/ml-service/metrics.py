@@ -0,0 +1,234 @@
+"""
+In-process metrics, exposed by main.py at GET /metrics in the Prometheus
+text format (0.0.4).
+
+- ``stage(name)`` times one hot-path stage into
+  ml_stage_duration_seconds{stage=...}: history load, context load,
+  baselines, features, risk scoring, provenance, save...
+- ``observe_request`` feeds ml_http_request_duration_seconds per route
+  template, method and status.
+- ``register_stats`` exposes an existing ``*_stats()`` dict (pools, caches,
+  write-behind queue) at scrape time.  Keys listed in COUNTER_KEYS become
+  counters and everything else becomes a gauge.
+
+Timing is time.perf_counter plus a bisect and a short lock per
+observation, a few microseconds, cheap enough to leave on in production.
+ML_METRICS=off turns every timer into a no-op.
+
+Each process keeps its own registry.  With several uvicorn workers, a
+scrape is answered by whichever worker receives it.  Run one worker per
+container, or scrape each worker directly, for complete numbers.
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("ML_METRICS", "on").strip().lower() not in ("0", "off", "false", "no")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+REQUEST_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# ``*_stats()`` keys that only ever grow (exported as counters)
+COUNTER_KEYS = frozenset({
+    # db_pool.ConnectionPool
+    "acquired_total", "acquire_wait_seconds_total", "exhausted_total",
+    "timeouts_total", "created_total", "discarded_total",
+    # psycopg_pool (db_async)
+    "requests_num", "requests_queued", "requests_wait_ms", "requests_errors",
+    "usage_ms", "returns_bad", "connections_num", "connections_ms",
+    "connections_errors", "connections_lost",
+    # ingest_buffer.WriteBehindBuffer
+    "queued_total", "flushed_total", "flush_batches_total", "flush_failures_total",
+    "backpressure_waits_total", "rejected_total", "dropped_total", "poisoned_total",
+    # history_cache / context_cache
+    "hits", "negative_hits", "misses", "evictions", "expirations", "invalidations",
+})
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    body = ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs)
+    return "{" + body + "}" if body else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Prometheus histogram with a fixed label set; one series per label tuple."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str],
+                 buckets: Sequence[float]):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(snapshot.items()):
+            pairs = list(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_labels(pairs + [('le', _number(bound))])} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(pairs)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "ml_stage_duration_seconds",
+    "Time spent in one engine or storage stage of a request.",
+    ("stage",), STAGE_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "ml_http_request_duration_seconds",
+    "HTTP request latency by route template, method and status.",
+    ("route", "method", "status"), REQUEST_BUCKETS,
+)
+
+
+# ---------------------------------------------------------------------------
+# Timers
+# ---------------------------------------------------------------------------
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "_Stage":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, self.name)
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoStage":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    """``with stage("history_load"): ...`` records the block's wall time."""
+    return _Stage(name) if METRICS_ENABLED else _NO_STAGE
+
+
+def timed(name: str):
+    """Decorator form of ``stage`` for whole functions, sync or async."""
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, name)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - started, name)
+        return wrapper
+    return decorate
+
+
+def observe_request(route: str, method: str, status: int, seconds: float) -> None:
+    if METRICS_ENABLED:
+        REQUEST_SECONDS.observe(seconds, route, method, str(status))
+
+
+# ---------------------------------------------------------------------------
+# Stats exposed at scrape time
+# ---------------------------------------------------------------------------
+_stats_sources: List[Tuple[str, Callable[[], Optional[Dict[str, float]]], Tuple[Tuple[str, str], ...]]] = []
+
+
+def register_stats(component: str, source: Callable[[], Optional[Dict[str, float]]],
+                   **labels: str) -> None:
+    """Export ``source()`` as ml_<component>_<key>{labels}; None means not created yet."""
+    _stats_sources.append((component, source, tuple(sorted(labels.items()))))
+
+
+def _stats_lines() -> List[str]:
+    families: Dict[str, Tuple[str, List[str]]] = {}
+    for component, source, labels in _stats_sources:
+        try:
+            stats = source()
+        except Exception:
+            continue
+        for key, value in (stats or {}).items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            counter = key in COUNTER_KEYS
+            name = f"ml_{component}_{key}"
+            if counter and not name.endswith("_total"):
+                name += "_total"
+            kind, samples = families.setdefault(name, ("counter" if counter else "gauge", []))
+            samples.append(f"{name}{_labels(labels)} {_number(value)}")
+    lines = []
+    for name in sorted(families):
+        kind, samples = families[name]
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    return lines
+
+
+def render() -> str:
+    """Everything in the Prometheus text exposition format."""
+    lines = STAGE_SECONDS.render() + REQUEST_SECONDS.render() + _stats_lines()
+    return "\n".join(lines) + "\n"
@@ -15,7 +15,7 @@ class BiometricData(BaseModel):
     spo2: float = Field(..., ge=50, le=100, description="Blood Oxygen (%)")
     skin_temp_offset: float = Field(..., ge=-5.0, le=5.0, description="Deviation from baseline temp (standardized)")
     respiratory_rate: float = Field(..., ge=4, le=60, description="Breaths per minute")
-    step_count: int = Field(0, ge=0, description="Total steps in last window (Context Filter)")
+    step_count: int = Field(0, ge=0, le=2**31 - 1, description="Total steps in last window (Context Filter)")
     active_calories: float = Field(0, ge=0, description="Active calories (Context Filter)")
     # Extended wearable metrics for CVD early warning
     sleep_duration_hours: float = Field(0.0, ge=0, le=24, description="Sleep duration (hours/night)")
@@ -38,12 +38,43 @@ class IngestResponse(BaseModel):
     anomalies: List[str] = []
     message: str
 
+class BatchIngestItem(BaseModel):
+    user_id: str
+    data: BiometricData
+
+class BatchIngestRequest(BaseModel):
+    """
+    Many readings, possibly for many users, evaluated and stored in one call.
+    Larger backfills go through POST /ingest/stream, which works in chunks.
+    """
+    readings: List[BatchIngestItem] = Field(..., min_length=1, max_length=5_000)
+
+class BatchIngestResult(BaseModel):
+    user_id: str
+    timestamp: datetime
+    alert_level: AlertLevel
+    anomalies: List[str] = []
+
+class BatchIngestResponse(BaseModel):
+    status: str
+    processed_at: datetime
+    processed: int
+    users: int
+    results: List[BatchIngestResult]  # same order as the request's readings
+
 class ReadinessScore(BaseModel):
     user_id: str
     score: int = Field(..., ge=0, le=100)
     baseline_status: str
     trend: str # "STABLE", "DECLINING", "IMPROVING"
 
+class BatchReadinessRequest(BaseModel):
+    """Readiness for many users (e.g. a clinician's panel) in one call."""
+    user_ids: List[str] = Field(..., min_length=1, max_length=1000)
+
+class BatchReadinessResponse(BaseModel):
+    scores: List[ReadinessScore]  # same order as the request's user_ids
+
 # --- Early Warning / CVD risk outputs ---
 class RiskScores(BaseModel):
     framingham_10y_pct: float = Field(..., ge=0, le=100, description="Adapted Framingham 10-year CVD risk %")
@@ -95,3 +126,25 @@ class EarlyWarningSummary(BaseModel):
     uncertainty: UncertaintyProfile
     provenance: ClinicalProvenance
     requires_clinician_review: bool = False
+
+# --- Cohort CVD risk scoring (insurer / population-health batches) ---
+class CohortMember(BaseModel):
+    member_id: str
+    profile: ContextualProfile
+    biometrics: BiometricData
+    # From the member's history when the caller has it; None skips the trajectory uplift
+    hr_trend_2w: Optional[Literal["rising", "stable", "declining"]] = None
+    hrv_vs_baseline: Optional[Literal["below", "at", "above"]] = None
+
+class CohortScoreRequest(BaseModel):
+    """Many (profile, reading) pairs scored in one vectorised pass; no storage is read."""
+    members: List[CohortMember] = Field(..., min_length=1, max_length=50_000)
+
+class CohortScore(BaseModel):
+    member_id: str
+    risk_scores: RiskScores
+    fusion: FusionOutput
+
+class CohortScoreResponse(BaseModel):
+    model_version: str
+    scores: List[CohortScore]  # same order as the request's members
@@ -0,0 +1,115 @@
+"""
+Postgres LISTEN/NOTIFY listener for cross-process cache invalidation.
+
+One daemon thread per process holds a dedicated autocommit connection (not
+taken from the pool), LISTENs on the subscribed channels and dispatches each
+notification payload to the channel's handlers.
+
+While the listener is disconnected, notifications may be lost.  Callers must
+check ``connected`` before trusting a cache.  Reset handlers run each time
+the listener (re)connects, so anything cached before it was listening is
+dropped.
+"""
+
+import logging
+import select
+import threading
+from typing import Callable, Dict, List
+
+import psycopg2
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+
+class NotifyListener:
+    def __init__(self, dsn: str, application_name: str):
+        self.dsn = dsn
+        self.application_name = application_name
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._reset_handlers: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.connected = threading.Event()
+        self.notifications_total = 0
+        self.reconnects_total = 0
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        """Call ``handler(payload)`` for each NOTIFY on ``channel``."""
+        with self._lock:
+            self._handlers.setdefault(channel, []).append(handler)
+
+    def on_reset(self, handler: Callable[[], None]) -> None:
+        """Call ``handler()`` whenever notifications may have been missed."""
+        with self._lock:
+            self._reset_handlers.append(handler)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="pg-notify-listener", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Thread
+    # ------------------------------------------------------------------
+    def _reset(self) -> None:
+        for handler in list(self._reset_handlers):
+            try:
+                handler()
+            except Exception as e:
+                logger.warning("[notify] Reset handler failed: %s", e)
+
+    def _dispatch(self, channel: str, payload: str) -> None:
+        self.notifications_total += 1
+        for handler in list(self._handlers.get(channel, ())):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.warning("[notify] Handler for %s failed: %s", channel, e)
+
+    def _run(self) -> None:
+        failures = 0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn, application_name=self.application_name)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    for channel in list(self._handlers):
+                        cur.execute(f'LISTEN "{channel}"')
+                # Listening now: drop anything cached while we were not
+                self._reset()
+                self.connected.set()
+                if failures:
+                    self.reconnects_total += 1
+                    logger.info("[notify] Listener reconnected")
+                failures = 0
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        # Idle: make sure the connection is still alive
+                        with conn.cursor() as cur:
+                            cur.execute("SELECT 1")
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        note = conn.notifies.pop(0)
+                        self._dispatch(note.channel, note.payload)
+            except Exception as e:
+                failures += 1
+                logger.warning("[notify] Listener connection lost: %s", e)
+            finally:
+                self.connected.clear()
+                self._reset()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stop.wait(min(30.0, 0.5 * 2 ** min(failures, 6)))
@@ -0,0 +1,503 @@
+"""
+Population-wide risk sweep: full_analysis for every recently active user,
+ranked for clinician review.
+
+Streams the distinct user_ids with readings in the engine's history window
+from biometric_time_series and splits them into chunks of
+ML_SWEEP_CHUNK_USERS.  Each chunk runs in a ProcessPoolExecutor worker.  A
+worker loads the chunk's histories and risk profiles with one query each,
+then runs the engine's evaluation, CVD scoring and fusion on the latest
+reading of every user, the same analysis GET /early-warning/summary returns.
+The parent writes results to risk_sweep_results as chunks complete, so
+memory stays bounded by the number of chunks in flight.
+
+A user is flagged when the latest reading is a RED alert or the two-year
+trajectory is above current risk (rising).  ``priority`` orders flagged users:
+RED first, then rising, then by trajectory risk.  The full summary JSON is
+kept for flagged users only.  Runs are recorded in risk_sweep_runs.  The
+newest ML_SWEEP_KEEP_RUNS runs are kept, and a Postgres advisory lock keeps
+two sweeps from running at once across processes.
+
+Entry points:
+- CLI (nightly cron):  python risk_sweep.py [--workers N] [--chunk-users N]
+- Admin API:  POST /admin/risk-sweep, GET /admin/risk-sweep/latest,
+  GET /admin/risk-sweep/{sweep_id}
+
+The sweep always reads raw history (not daily rollups), so results match
+ML_BASELINE_SOURCE=raw.  In memory mode (no DATABASE_URL) it runs in-process,
+because worker processes cannot see this process's memory store.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import psycopg2.errors
+import psycopg2.extras
+
+import db
+from models import AlertLevel, EarlyWarningSummary
+
+logger = logging.getLogger(__name__)
+
+SWEEP_WORKERS = int(os.getenv("ML_SWEEP_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+SWEEP_CHUNK_USERS = max(1, int(os.getenv("ML_SWEEP_CHUNK_USERS", "500") or 500))
+SWEEP_KEEP_RUNS = max(1, int(os.getenv("ML_SWEEP_KEEP_RUNS", "7") or 7))
+
+# pg_advisory_lock key shared by every process that can start a sweep
+_ADVISORY_LOCK_KEY = 0x6D6C5357  # "mlSW"
+
+
+class SweepRunning(Exception):
+    """Another sweep holds the lock."""
+
+
+# ---------------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------------
+SWEEP_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS risk_sweep_runs (
+    sweep_id     TEXT        PRIMARY KEY,
+    started_at   TIMESTAMPTZ NOT NULL,
+    finished_at  TIMESTAMPTZ,
+    status       TEXT        NOT NULL,   -- running | completed | failed
+    users        INTEGER     NOT NULL DEFAULT 0,
+    flagged      INTEGER     NOT NULL DEFAULT 0,
+    errors       INTEGER     NOT NULL DEFAULT 0,
+    error        TEXT
+);
+
+CREATE TABLE IF NOT EXISTS risk_sweep_results (
+    sweep_id               TEXT             NOT NULL
+                           REFERENCES risk_sweep_runs (sweep_id) ON DELETE CASCADE,
+    user_id                TEXT             NOT NULL,
+    latest_reading         TIMESTAMPTZ      NOT NULL,
+    alert_level            TEXT             NOT NULL,
+    ml_cvd_risk_pct        DOUBLE PRECISION NOT NULL,
+    trajectory_risk_2y_pct DOUBLE PRECISION NOT NULL,
+    rising                 BOOLEAN          NOT NULL,
+    flagged                BOOLEAN          NOT NULL,
+    priority               DOUBLE PRECISION NOT NULL,
+    summary                JSONB,
+    PRIMARY KEY (sweep_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS risk_sweep_results_rank_idx
+    ON risk_sweep_results (sweep_id, flagged, priority DESC);
+"""
+
+RESULT_COLUMNS = (
+    "sweep_id", "user_id", "latest_reading", "alert_level", "ml_cvd_risk_pct",
+    "trajectory_risk_2y_pct", "rising", "flagged", "priority", "summary",
+)
+
+INSERT_RESULTS_SQL = f"""
+INSERT INTO risk_sweep_results ({", ".join(RESULT_COLUMNS)})
+VALUES %s
+ON CONFLICT (sweep_id, user_id) DO NOTHING
+"""
+
+PRUNE_RUNS_SQL = """
+DELETE FROM risk_sweep_runs
+WHERE sweep_id NOT IN (
+    SELECT sweep_id FROM risk_sweep_runs ORDER BY started_at DESC LIMIT %s
+)
+"""
+
+# Memory mode stand-ins for the two tables
+_memory_runs: Dict[str, dict] = {}
+_memory_results: Dict[str, List[dict]] = {}
+
+# Live progress of sweeps started by this process
+_progress: Dict[str, dict] = {}
+_background_lock = threading.Lock()
+_background: Optional[threading.Thread] = None
+
+
+def ensure_sweep_schema() -> None:
+    if not db._use_db:
+        return
+    conn = db._get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SWEEP_SCHEMA_SQL)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        db._put_conn(conn)
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+_worker_engine = None
+
+
+def _engine():
+    global _worker_engine
+    if _worker_engine is None:
+        from engine import EarlyWarningEngine
+        _worker_engine = EarlyWarningEngine()
+    return _worker_engine
+
+
+def _result_row(summary: EarlyWarningSummary, latest_reading: datetime) -> dict:
+    current = summary.risk_scores.ml_cvd_risk_pct
+    trajectory = summary.fusion.trajectory_risk_2y_pct
+    red = summary.alert_level == AlertLevel.RED
+    rising = trajectory > current
+    flagged = red or rising
+    return {
+        "user_id": summary.user_id,
+        "latest_reading": latest_reading,
+        "alert_level": summary.alert_level.value,
+        "ml_cvd_risk_pct": current,
+        "trajectory_risk_2y_pct": trajectory,
+        "rising": rising,
+        "flagged": flagged,
+        "priority": (2.0 if red else 0.0) + (1.0 if rising else 0.0) + trajectory / 100.0,
+        "summary": summary.model_dump(mode="json") if flagged else None,
+    }
+
+
+def sweep_chunk(user_ids: List[str]) -> Tuple[List[dict], int]:
+    """Analyse one chunk of users; returns (result rows, error count)."""
+    from engine import AnalysisContext, _dict_to_biometric
+
+    engine = _engine()
+    histories = db.load_biometrics_bulk(user_ids, engine.HISTORY_DAYS)
+    profiles = db.load_contexts_bulk(list(histories))
+    results: List[dict] = []
+    errors = 0
+    for user_id, rows in histories.items():
+        try:
+            ctx = AnalysisContext(
+                user_id, engine.HISTORY_DAYS, history=rows,
+                profile=profiles.get(user_id), use_rollups=False,
+            )
+            latest = rows[-1]
+            summary = engine.full_analysis(user_id, _dict_to_biometric(latest), ctx=ctx)
+            results.append(_result_row(summary, latest["timestamp"]))
+        except Exception as e:
+            errors += 1
+            logger.warning("[risk_sweep] Analysis failed for %s: %s", user_id, e)
+        finally:
+            # One pass per user: don't keep rolling baseline state around
+            engine._baselines.invalidate(user_id)
+    return results, errors
+
+
+# ---------------------------------------------------------------------------
+# Coordinator
+# ---------------------------------------------------------------------------
+def _chunks(user_ids: Iterator[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for user_id in user_ids:
+        chunk.append(user_id)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _save_run(sweep_id: str, progress: dict) -> None:
+    if not db._use_db:
+        _memory_runs[sweep_id] = dict(progress)
+        return
+    conn = db._get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO risk_sweep_runs
+                    (sweep_id, started_at, finished_at, status, users, flagged, errors, error)
+                VALUES (%(sweep_id)s, %(started_at)s, %(finished_at)s, %(status)s,
+                        %(users)s, %(flagged)s, %(errors)s, %(error)s)
+                ON CONFLICT (sweep_id) DO UPDATE SET
+                    finished_at = EXCLUDED.finished_at, status = EXCLUDED.status,
+                    users = EXCLUDED.users, flagged = EXCLUDED.flagged,
+                    errors = EXCLUDED.errors, error = EXCLUDED.error
+                """,
+                progress,
+            )
+        conn.commit()
+    finally:
+        db._put_conn(conn)
+
+
+def _write_results(sweep_id: str, rows: List[dict]) -> None:
+    if not rows:
+        return
+    if not db._use_db:
+        _memory_results.setdefault(sweep_id, []).extend(rows)
+        return
+    conn = db._get_conn()
+    try:
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(
+                cur, INSERT_RESULTS_SQL,
+                [
+                    (sweep_id,) + tuple(
+                        psycopg2.extras.Json(r[c]) if c == "summary" and r[c] is not None else r[c]
+                        for c in RESULT_COLUMNS[1:]
+                    )
+                    for r in rows
+                ],
+                page_size=1000,
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        db._put_conn(conn)
+
+
+def _prune_runs() -> None:
+    if not db._use_db:
+        keep = sorted(_memory_runs, key=lambda s: _memory_runs[s]["started_at"])[-SWEEP_KEEP_RUNS:]
+        for sweep_id in list(_memory_runs):
+            if sweep_id not in keep:
+                _memory_runs.pop(sweep_id, None)
+                _memory_results.pop(sweep_id, None)
+        return
+    conn = db._get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(PRUNE_RUNS_SQL, (SWEEP_KEEP_RUNS,))
+        conn.commit()
+    finally:
+        db._put_conn(conn)
+
+
+def _record(progress: dict, results: List[dict], errors: int) -> None:
+    progress["users"] += len(results)
+    progress["flagged"] += sum(1 for r in results if r["flagged"])
+    progress["errors"] += errors
+
+
+def _run_chunks(sweep_id: str, progress: dict, workers: int, chunk_users: int) -> None:
+    days = _engine().HISTORY_DAYS
+    started = time.monotonic()
+    chunks = _chunks(db.iter_active_user_ids(days), chunk_users)
+    try:
+        if workers <= 1 or not db._use_db:
+            for chunk in chunks:
+                results, errors = sweep_chunk(chunk)
+                _write_results(sweep_id, results)
+                _record(progress, results, errors)
+            return
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            pending: Set[Future] = set()
+            for chunk in chunks:
+                pending.add(pool.submit(sweep_chunk, chunk))
+                if len(pending) < workers * 2:
+                    continue
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results, errors = future.result()
+                    _write_results(sweep_id, results)
+                    _record(progress, results, errors)
+                logger.info(
+                    "[risk_sweep] %s: %d users (%.0f/s), %d flagged",
+                    sweep_id, progress["users"],
+                    progress["users"] / max(1e-9, time.monotonic() - started), progress["flagged"],
+                )
+            for future in pending:
+                results, errors = future.result()
+                _write_results(sweep_id, results)
+                _record(progress, results, errors)
+    finally:
+        chunks.close()
+
+
+def _advisory_lock():
+    """Hold the cluster-wide sweep lock; returns the connection holding it."""
+    if not db._use_db:
+        return None
+    conn = db._get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (_ADVISORY_LOCK_KEY,))
+            locked = cur.fetchone()[0]
+        conn.commit()
+    except Exception:
+        db._put_conn(conn)
+        raise
+    if not locked:
+        db._put_conn(conn)
+        raise SweepRunning("a risk sweep is already running")
+    return conn
+
+
+def _advisory_unlock(conn) -> None:
+    if conn is None:
+        return
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (_ADVISORY_LOCK_KEY,))
+        conn.commit()
+    except Exception:
+        # Closing the session releases the lock too
+        db._get_pool().putconn(conn, close=True)
+        return
+    db._put_conn(conn)
+
+
+def run_sweep(workers: Optional[int] = None, chunk_users: Optional[int] = None,
+              sweep_id: Optional[str] = None) -> dict:
+    """Run one sweep to completion; returns the run record."""
+    workers = SWEEP_WORKERS if workers is None else workers
+    chunk_users = chunk_users or SWEEP_CHUNK_USERS
+    sweep_id = sweep_id or uuid.uuid4().hex
+    lock = _advisory_lock()
+    progress = _progress.setdefault(sweep_id, {"sweep_id": sweep_id})
+    progress.update(
+        started_at=datetime.now(timezone.utc), finished_at=None, status="running",
+        users=0, flagged=0, errors=0, error=None,
+    )
+    try:
+        ensure_sweep_schema()
+        _save_run(sweep_id, progress)
+        logger.info("[risk_sweep] %s started (%d workers, %d users/chunk)",
+                    sweep_id, workers, chunk_users)
+        try:
+            _run_chunks(sweep_id, progress, workers, chunk_users)
+            progress["status"] = "completed"
+        except Exception as e:
+            progress.update(status="failed", error=str(e)[:1000])
+            logger.error("[risk_sweep] %s failed: %s", sweep_id, e)
+            raise
+        finally:
+            progress["finished_at"] = datetime.now(timezone.utc)
+            _save_run(sweep_id, progress)
+        _prune_runs()
+        logger.info(
+            "[risk_sweep] %s completed: %d users, %d flagged, %d errors in %.1fs",
+            sweep_id, progress["users"], progress["flagged"], progress["errors"],
+            (progress["finished_at"] - progress["started_at"]).total_seconds(),
+        )
+        return dict(progress)
+    finally:
+        _advisory_unlock(lock)
+
+
+def start_background(workers: Optional[int] = None, chunk_users: Optional[int] = None) -> str:
+    """Start run_sweep in a thread of this process; raises SweepRunning if one is active."""
+    global _background
+    with _background_lock:
+        if _background is not None and _background.is_alive():
+            raise SweepRunning("a risk sweep is already running in this process")
+        sweep_id = uuid.uuid4().hex
+        _progress[sweep_id] = {"sweep_id": sweep_id, "status": "starting"}
+
+        def target():
+            try:
+                run_sweep(workers, chunk_users, sweep_id)
+            except SweepRunning as e:
+                _progress[sweep_id].update(status="rejected", error=str(e))
+            except Exception:
+                pass  # already recorded as failed
+
+        _background = threading.Thread(target=target, name="risk-sweep", daemon=True)
+        _background.start()
+        return sweep_id
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+def run_status(sweep_id: str) -> Optional[dict]:
+    if sweep_id in _progress:
+        return dict(_progress[sweep_id])
+    if not db._use_db:
+        run = _memory_runs.get(sweep_id)
+        return dict(run) if run else None
+    conn = db._get_conn()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute("SELECT * FROM risk_sweep_runs WHERE sweep_id = %s", (sweep_id,))
+            row = cur.fetchone()
+            return dict(row) if row else None
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        return None
+    finally:
+        db._put_conn(conn)
+
+
+def latest_ranked(limit: int = 100, flagged_only: bool = True) -> Optional[dict]:
+    """The newest completed sweep with its users in priority order."""
+    if not db._use_db:
+        done = [r for r in _memory_runs.values() if r["status"] == "completed"]
+        if not done:
+            return None
+        run = max(done, key=lambda r: r["started_at"])
+        rows = [r for r in _memory_results.get(run["sweep_id"], []) if r["flagged"] or not flagged_only]
+        rows.sort(key=lambda r: r["priority"], reverse=True)
+        return {"run": dict(run), "results": rows[:limit]}
+    conn = db._get_conn()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(
+                "SELECT * FROM risk_sweep_runs WHERE status = 'completed' "
+                "ORDER BY started_at DESC LIMIT 1"
+            )
+            run = cur.fetchone()
+            if run is None:
+                return None
+            cur.execute(
+                f"""
+                SELECT {", ".join(RESULT_COLUMNS[1:])}
+                FROM risk_sweep_results
+                WHERE sweep_id = %s {"AND flagged" if flagged_only else ""}
+                ORDER BY priority DESC, user_id
+                LIMIT %s
+                """,
+                (run["sweep_id"], limit),
+            )
+            return {"run": dict(run), "results": [dict(r) for r in cur.fetchall()]}
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        return None
+    finally:
+        db._put_conn(conn)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the population risk sweep once.")
+    parser.add_argument("--workers", type=int, default=SWEEP_WORKERS,
+                        help=f"worker processes (default ML_SWEEP_WORKERS or CPUs: {SWEEP_WORKERS})")
+    parser.add_argument("--chunk-users", type=int, default=SWEEP_CHUNK_USERS,
+                        help=f"users per chunk (default {SWEEP_CHUNK_USERS})")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        run = run_sweep(args.workers, args.chunk_users)
+    except SweepRunning as e:
+        print(f"[risk_sweep] {e}", file=sys.stderr)
+        return 2
+    except Exception:
+        return 1
+    print(json.dumps(run, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
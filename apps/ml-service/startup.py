@@ -0,0 +1,140 @@
+"""
+Service warm-up and readiness state.
+
+Importing main does no database I/O, so uvicorn binds the port as soon as
+the app is built and GET /health/live answers immediately.  The lifespan
+hook starts ``warm_up`` as a background task.  It runs these steps in order:
+
+    schema      db.ensure_schema(): tables, hypertable, rollup, triggers;
+                with ML_HISTORY_CACHE on, then checks the write NOTIFY
+                trigger exists (the cache stays off if it does not)
+    sync_pool   psycopg2 pool opened with ML_DB_POOL_MIN connections
+    async_pool  psycopg 3 pool opened (and psycopg imported)
+    cvd_model   the ML_CVD_MODEL artifact, if one is configured
+
+Until every step has finished, GET /health/ready returns 503, so the
+platform does not send traffic to a cold instance.  The database steps are
+skipped when DATABASE_URL is unset.  A failing step is logged and retried
+with exponential backoff (up to ML_STARTUP_RETRY_MAX_SECONDS).  Transient
+database outages at boot therefore delay readiness rather than leave the
+schema half-made.  The instance stays live throughout.
+
+``storage_maintenance`` runs alongside: once ready, it repeats the plain
+PostgreSQL partition upkeep (storage_policy.py) every
+ML_BIOMETRICS_MAINTENANCE_HOURS, so new months get partitions and retention
+keeps applying on instances that run for months.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import cvd_model
+import db
+import db_async
+
+logger = logging.getLogger(__name__)
+
+RETRY_MAX_SECONDS = float(os.getenv("ML_STARTUP_RETRY_MAX_SECONDS", "30"))
+MAINTENANCE_SECONDS = float(os.getenv("ML_BIOMETRICS_MAINTENANCE_HOURS", "6")) * 3600
+
+_started = time.monotonic()
+_ready_at: Optional[float] = None
+# step -> seconds taken once done; step -> failed attempts so far.  Error
+# text goes to the log only: /health/ready is public.
+_done: Dict[str, float] = {}
+_failures: Dict[str, int] = {}
+
+
+async def _ensure_schema() -> None:
+    await asyncio.to_thread(db.ensure_schema)
+    await asyncio.to_thread(db.check_notify_trigger)
+
+
+async def _open_sync_pool() -> None:
+    await asyncio.to_thread(db._get_pool)
+
+
+async def _load_cvd_model() -> None:
+    await asyncio.to_thread(cvd_model.get)
+
+
+def _steps() -> List[Tuple[str, Callable[[], Awaitable[None]]]]:
+    steps = []
+    if db._use_db:
+        steps += [("schema", _ensure_schema), ("sync_pool", _open_sync_pool),
+                  ("async_pool", db_async.open)]
+    steps.append(("cvd_model", _load_cvd_model))
+    return steps
+
+
+async def warm_up() -> None:
+    """Run every startup step to completion; /health/ready turns 200 after."""
+    global _ready_at
+    for name, step in _steps():
+        delay = 0.5
+        while True:
+            t0 = time.perf_counter()
+            try:
+                await step()
+            except Exception as e:
+                _failures[name] = _failures.get(name, 0) + 1
+                logger.warning("[startup] %s failed, retrying in %.1fs: %s", name, delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_SECONDS)
+                continue
+            _done[name] = time.perf_counter() - t0
+            break
+    _ready_at = time.monotonic()
+    logger.info("[startup] Ready %.2fs after import (%s)", _ready_at - _started,
+                ", ".join(f"{k} {v * 1000:.0f}ms" for k, v in _done.items()))
+
+
+async def storage_maintenance() -> None:
+    """Periodic partition upkeep; schema setup already did the first pass."""
+    if not db._use_db:
+        return
+    while not is_ready():
+        await asyncio.sleep(1.0)
+    while True:
+        await asyncio.sleep(MAINTENANCE_SECONDS)
+        try:
+            result = await asyncio.to_thread(db.maintain_storage)
+        except Exception as e:
+            logger.warning("[db] Storage maintenance failed: %s", e)
+            continue
+        if result and any(result.values()):
+            logger.info("[db] Storage maintenance: %s", result)
+
+
+def is_ready() -> bool:
+    return _ready_at is not None
+
+
+def status() -> dict:
+    """Body of GET /health/ready."""
+    return {
+        "status": "ready" if is_ready() else "starting",
+        "seconds_since_import": round(time.monotonic() - _started, 3),
+        "ready_after_seconds": round(_ready_at - _started, 3) if _ready_at is not None else None,
+        "steps": {
+            name: {
+                "done": name in _done,
+                "seconds": round(_done[name], 4) if name in _done else None,
+                "failures": _failures.get(name, 0),
+            }
+            for name, _ in _steps()
+        },
+    }
+
+
+def stats() -> Dict[str, float]:
+    """Gauges for /metrics (ml_startup_*)."""
+    out = {"ready": int(is_ready())}
+    if _ready_at is not None:
+        out["ready_seconds"] = _ready_at - _started
+    for name, seconds in _done.items():
+        out[f"{name}_seconds"] = seconds
+    return out
@@ -0,0 +1,388 @@
+"""
+Size limits for biometric_time_series: compression, retention and, on plain
+PostgreSQL, monthly partitions.
+
+The engine reads at most the last 30 days of raw readings.  The daily-rollup
+refresh looks back 40 days.  Anything older is only needed in aggregate, and
+biometric_daily_rollup keeps those aggregates (it is never trimmed here).
+db.ensure_schema applies the settings below on every startup; they are
+idempotent and a changed value replaces the old policy.
+
+TimescaleDB (hypertable modes):
+
+    compression   chunks older than ML_BIOMETRICS_COMPRESS_AFTER_DAYS
+                  (default 45, 0 = off) are compressed, segmented by user_id
+                  and ordered by time DESC, so a user's readings stay
+                  together and the newest decompress first
+    retention     chunks older than ML_BIOMETRICS_RETENTION_DAYS are dropped
+                  (default 0 = keep raw readings forever)
+
+Both are TimescaleDB background jobs; nothing runs in the service.
+
+Plain PostgreSQL (TIMESCALE_MODE=off, or auto without the extension): a new
+table is created PARTITION BY RANGE (time) with one partition per UTC month
+and a DEFAULT partition for anything else (ML_BIOMETRICS_PARTITIONING=off
+keeps the single table).  ``maintain_partitions`` runs at startup and every
+ML_BIOMETRICS_MAINTENANCE_HOURS from the service (startup.py).  It:
+
+- creates partitions for the current month and the next
+  ML_BIOMETRICS_PARTITIONS_AHEAD months;
+- moves rows that landed in DEFAULT (backfill, or maintenance fell behind)
+  into a partition for their month;
+- with retention on, drops partitions that lie wholly before the horizon
+  and deletes older rows still in DEFAULT.
+
+An existing unpartitioned table is left alone, with a warning at startup.
+``python -m storage_policy migrate`` converts it once: the old table becomes
+the partition for everything before the month after next, and new months
+get their own partitions from then on.  Run it with ingest paused.
+
+Both day settings are floored so they never reach into data the service
+still reads or refreshes: compression at 31 days, retention at 45.
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TABLE = "biometric_time_series"
+DEFAULT_PARTITION = f"{TABLE}_default"
+LEGACY_PARTITION = f"{TABLE}_legacy"
+
+# Longest raw window the engine reads, and the rollup refresh look-back
+# (ROLLUP_CAGG_SQL start_offset) plus margin
+HOT_WINDOW_DAYS = 31
+MIN_RETENTION_DAYS = 45
+
+# Upkeep and migration statements are not bounded by the pool's
+# statement_timeout (see db._no_statement_timeout)
+_NO_TIMEOUT_SQL = "SET LOCAL statement_timeout = 0"
+
+
+def _days_setting(name: str, default: str, floor: int) -> int:
+    days = max(int(os.getenv(name, default) or 0), 0)
+    if 0 < days < floor:
+        logger.warning("[db] %s=%d reaches into data still in use; using %d", name, days, floor)
+        return floor
+    return days
+
+
+COMPRESS_AFTER_DAYS = _days_setting("ML_BIOMETRICS_COMPRESS_AFTER_DAYS", "45", HOT_WINDOW_DAYS)
+RETENTION_DAYS = _days_setting("ML_BIOMETRICS_RETENTION_DAYS", "0", MIN_RETENTION_DAYS)
+PARTITIONING = (os.getenv("ML_BIOMETRICS_PARTITIONING", "monthly") or "monthly").strip().lower()
+PARTITIONS_AHEAD = max(int(os.getenv("ML_BIOMETRICS_PARTITIONS_AHEAD", "3") or 3), 1)
+
+_totals: Dict[str, int] = {
+    "partitions_created": 0, "rows_moved": 0, "partitions_dropped": 0, "rows_deleted": 0,
+}
+_last_run: Optional[datetime] = None
+
+
+# ---------------------------------------------------------------------------
+# TimescaleDB
+# ---------------------------------------------------------------------------
+COMPRESSION_SETTINGS_SQL = f"""
+ALTER TABLE {TABLE} SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'user_id',
+    timescaledb.compress_orderby   = 'time DESC'
+);
+"""
+
+# (job proc_name, config key, add function, remove function)
+_COMPRESSION_POLICY = ("policy_compression", "compress_after",
+                       "add_compression_policy", "remove_compression_policy")
+_RETENTION_POLICY = ("policy_retention", "drop_after",
+                     "add_retention_policy", "remove_retention_policy")
+
+
+def _set_policy(cur, policy: Tuple[str, str, str, str], days: int) -> None:
+    """Make the hypertable's policy match ``days`` (0 removes it)."""
+    proc, key, add_fn, remove_fn = policy
+    cur.execute(
+        """
+        SELECT (config->>%s)::interval = make_interval(days => %s)
+        FROM timescaledb_information.jobs
+        WHERE proc_name = %s AND hypertable_name = %s
+        """,
+        (key, days, proc, TABLE),
+    )
+    row = cur.fetchone()
+    if row is not None and days and row[0]:
+        return
+    if row is not None:
+        cur.execute(f"SELECT {remove_fn}(%s, if_exists => TRUE)", (TABLE,))
+    if days:
+        cur.execute(f"SELECT {add_fn}(%s, make_interval(days => %s))", (TABLE, days))
+
+
+def apply_timescale_policies(cur) -> None:
+    """Compression settings plus compression and retention jobs."""
+    if COMPRESS_AFTER_DAYS:
+        cur.execute(
+            "SELECT compression_enabled FROM timescaledb_information.hypertables "
+            "WHERE hypertable_name = %s",
+            (TABLE,),
+        )
+        row = cur.fetchone()
+        if row is not None and not row[0]:
+            cur.execute(COMPRESSION_SETTINGS_SQL)
+    _set_policy(cur, _COMPRESSION_POLICY, COMPRESS_AFTER_DAYS)
+    _set_policy(cur, _RETENTION_POLICY, RETENTION_DAYS)
+
+
+# ---------------------------------------------------------------------------
+# Plain PostgreSQL: monthly range partitions
+# ---------------------------------------------------------------------------
+_BOUND_RE = re.compile(r"FROM \((?:'([^']*)'|MINVALUE)\) TO \((?:'([^']*)'|MAXVALUE)\)")
+
+
+def table_exists(cur) -> bool:
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (TABLE,))
+    return bool(cur.fetchone()[0])
+
+
+def is_partitioned(cur) -> bool:
+    cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", (TABLE,))
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def _month_start(t: datetime) -> datetime:
+    return t.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(t: datetime) -> datetime:
+    return (t.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _bound(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def _partitions(cur) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+    """(name, lower, upper) of each range partition; None is MINVALUE/MAXVALUE."""
+    cur.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        """,
+        (TABLE,),
+    )
+    out = []
+    for name, expr in cur.fetchall():
+        m = _BOUND_RE.search(expr or "")
+        if m:
+            out.append((name, _bound(m.group(1)), _bound(m.group(2))))
+    return out
+
+
+def _overlaps(lo: datetime, hi: datetime, part: Tuple[str, Optional[datetime], Optional[datetime]]) -> bool:
+    _, p_lo, p_hi = part
+    return (p_lo is None or p_lo < hi) and (p_hi is None or lo < p_hi)
+
+
+def _create_month(cur, lo: datetime, hi: datetime, counts: Dict[str, int]) -> None:
+    name = f"{TABLE}_p{lo:%Y%m}"
+    bounds = (lo.isoformat(), hi.isoformat())
+    cur.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE time >= %s AND time < %s)",
+        bounds,
+    )
+    if not cur.fetchone()[0]:
+        cur.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)", bounds)
+    else:
+        # Postgres refuses a partition whose range has rows in DEFAULT, so
+        # fill a standalone table first.  Its INSERT fires no triggers: the
+        # rows are already in the rollup and were already notified.
+        cur.execute(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)")
+        cur.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE time >= %s AND time < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            bounds,
+        )
+        counts["rows_moved"] += cur.rowcount
+        cur.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+    counts["partitions_created"] += 1
+
+
+def maintain_partitions(cur, now: Optional[datetime] = None) -> Optional[Dict[str, int]]:
+    """
+    Create upcoming months, empty DEFAULT and apply retention.  Runs in the
+    caller's transaction.  Returns what it did, or None when the table is not
+    partitioned or another worker holds the maintenance lock.
+    """
+    global _last_run
+    if not is_partitioned(cur):
+        return None
+    cur.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", (f"{TABLE}_partitions",))
+    if not cur.fetchone()[0]:
+        return None
+    now = now or datetime.now(timezone.utc)
+    counts = {key: 0 for key in _totals}
+    parts = _partitions(cur)
+
+    if RETENTION_DAYS:
+        horizon = now - timedelta(days=RETENTION_DAYS)
+        for name, _, upper in parts:
+            if upper is not None and upper <= horizon:
+                cur.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+                cur.execute(f"DROP TABLE {name}")
+                counts["partitions_dropped"] += 1
+        parts = [p for p in parts if p[2] is None or p[2] > horizon]
+        cur.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE time < %s", (horizon,))
+        counts["rows_deleted"] = cur.rowcount
+
+    cur.execute(
+        f"SELECT DISTINCT date_trunc('month', time AT TIME ZONE 'UTC') FROM {DEFAULT_PARTITION}"
+    )
+    months = {m.replace(tzinfo=timezone.utc) for (m,) in cur.fetchall()}
+    month = _month_start(now)
+    for _ in range(PARTITIONS_AHEAD + 1):
+        months.add(month)
+        month = _next_month(month)
+    for lo in sorted(months):
+        hi = _next_month(lo)
+        if not any(_overlaps(lo, hi, p) for p in parts):
+            _create_month(cur, lo, hi, counts)
+            parts.append((f"{TABLE}_p{lo:%Y%m}", lo, hi))
+
+    for key, value in counts.items():
+        _totals[key] += value
+    _last_run = now
+    return counts
+
+
+def stats() -> Dict[str, float]:
+    """Gauges for /metrics (ml_storage_*); partition upkeep since start."""
+    out: Dict[str, float] = dict(_totals)
+    out["compress_after_days"] = COMPRESS_AFTER_DAYS
+    out["retention_days"] = RETENTION_DAYS
+    if _last_run is not None:
+        out["last_maintenance_timestamp"] = _last_run.timestamp()
+    return out
+
+
+# ---------------------------------------------------------------------------
+# One-off conversion of an existing unpartitioned table
+# ---------------------------------------------------------------------------
+def _is_hypertable(cur) -> bool:
+    cur.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb')")
+    if not cur.fetchone()[0]:
+        return False
+    cur.execute(
+        "SELECT EXISTS (SELECT 1 FROM timescaledb_information.hypertables WHERE hypertable_name = %s)",
+        (TABLE,),
+    )
+    return bool(cur.fetchone()[0])
+
+
+def migrate_to_partitions(conn, partitioned_table_sql: str,
+                          set_notify_trigger: Callable[[Any, bool], None],
+                          now: Optional[datetime] = None) -> bool:
+    """
+    Turn an unpartitioned biometric_time_series into LEGACY_PARTITION of a
+    new partitioned parent.  The range check is validated in its own
+    transaction, which does not block writes, so attaching needs no scan.
+    Returns False when there was nothing to do.  Every transaction here
+    runs without ML_DB_STATEMENT_TIMEOUT_MS: validating and moving a large
+    table takes as long as it takes.
+    """
+    now = now or datetime.now(timezone.utc)
+    bound = _next_month(_next_month(_month_start(now))).isoformat()
+    with conn.cursor() as cur:
+        cur.execute(_NO_TIMEOUT_SQL)
+        if not table_exists(cur) or is_partitioned(cur) or _is_hypertable(cur):
+            conn.rollback()
+            return False
+        cur.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_constraint "
+            "WHERE conname = 'bts_legacy_range' AND conrelid = to_regclass(%s))",
+            (TABLE,),
+        )
+        if cur.fetchone()[0]:
+            cur.execute(f"ALTER TABLE {TABLE} DROP CONSTRAINT bts_legacy_range")
+        cur.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT bts_legacy_range CHECK (time < %s) NOT VALID",
+            (bound,),
+        )
+        conn.commit()
+        logger.info("[db] Validating %s rows before %s", TABLE, bound)
+        cur.execute(_NO_TIMEOUT_SQL)
+        cur.execute(f"ALTER TABLE {TABLE} VALIDATE CONSTRAINT bts_legacy_range")
+        conn.commit()
+
+        cur.execute(_NO_TIMEOUT_SQL)
+        cur.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        cur.execute(f"DROP TRIGGER IF EXISTS bts_daily_rollup_trg ON {TABLE}")
+        set_notify_trigger(cur, False)
+        cur.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_PARTITION}")
+        cur.execute("ALTER INDEX IF EXISTS bts_user_time_idx RENAME TO bts_legacy_user_time_idx")
+        cur.execute(partitioned_table_sql)
+        cur.execute(
+            f"ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY_PARTITION} "
+            "FOR VALUES FROM (MINVALUE) TO (%s)",
+            (bound,),
+        )
+        cur.execute(f"ALTER TABLE {LEGACY_PARTITION} DROP CONSTRAINT bts_legacy_range")
+        # Same triggers, now on the parent; the rollup already holds the
+        # legacy rows, so no backfill
+        cur.execute(
+            f"""
+            CREATE TRIGGER bts_daily_rollup_trg
+                AFTER INSERT ON {TABLE}
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION biometric_daily_rollup_apply();
+            """
+        )
+        set_notify_trigger(cur, True)
+        conn.commit()
+        cur.execute(_NO_TIMEOUT_SQL)
+        maintain_partitions(cur, now)
+        conn.commit()
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(
+        prog="python -m storage_policy",
+        description="Partition upkeep for biometric_time_series on plain PostgreSQL.",
+    )
+    p.add_argument("command", choices=["maintain", "migrate"],
+                   help="maintain: one upkeep pass; migrate: partition an existing table")
+    args = p.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    import db
+
+    if not db._use_db:
+        raise SystemExit("DATABASE_URL is not set")
+    if args.command == "maintain":
+        print(db.maintain_storage())
+        return 0
+    conn = db._get_conn()
+    try:
+        migrated = migrate_to_partitions(conn, db.PARTITIONED_TABLE_SQL, db.set_notify_trigger)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        db._put_conn(conn)
+    print(f"{TABLE}: {'partitioned by month' if migrated else 'nothing to migrate'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Sliding-window estimators updated one reading at a time.
+
+UserBaselineState (baseline_state.py) feeds these as readings enter and
+leave its windows.  The HR trend and exercise-suppression checks then read
+a ready answer instead of refitting the user's history on every request.
+
+- ``SlidingSlope``: least-squares slope of a FIFO window of values against
+  their position 0..n-1, the statistic ``np.polyfit(..., 1)`` computes.
+  It keeps running centred sums, so push, pop and query are O(1).  After as
+  many removals as the window holds, the sums are recomputed from the
+  window.  That bounds rounding drift from the subtractions at amortised
+  O(1) cost.
+- ``WindowPercentile``: the exact percentile of the values currently in a
+  window, equal bit for bit to ``np.percentile`` (linear method).  Values
+  are kept sorted.  Adding or removing one is a binary search plus a list
+  shift; reading the percentile is two lookups.
+"""
+
+import bisect
+import math
+from collections import deque
+from typing import Deque, Iterable, List
+
+import numpy as np
+
+
+class SlidingSlope:
+    """OLS slope of a FIFO window of values against their positions."""
+
+    def __init__(self, values: Iterable[float] = ()):
+        self._values: Deque[float] = deque(values)
+        self._refresh()
+
+    def _refresh(self) -> None:
+        # Sums of (value - shift) and position * (value - shift)
+        self._shift = self._values[0] if self._values else 0.0
+        if len(self._values) > 32:
+            d = np.fromiter(self._values, dtype=np.float64, count=len(self._values)) - self._shift
+            self._sum = float(d.sum())
+            self._sum_xy = float(np.arange(len(d), dtype=np.float64) @ d)
+        else:
+            self._sum = self._sum_xy = 0.0
+            for x, v in enumerate(self._values):
+                d = v - self._shift
+                self._sum += d
+                self._sum_xy += x * d
+        self._removed = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def push(self, value: float) -> None:
+        d = value - self._shift
+        self._sum_xy += len(self._values) * d
+        self._sum += d
+        self._values.append(value)
+
+    def popleft(self) -> None:
+        d = self._values.popleft() - self._shift
+        self._sum -= d
+        # Every remaining value moves down one position
+        self._sum_xy -= self._sum
+        self._removed += 1
+        if self._removed >= max(32, len(self._values)):
+            self._refresh()
+
+    def slope(self) -> float:
+        """NaN with fewer than two values."""
+        n = len(self._values)
+        if n < 2:
+            return math.nan
+        sxy = self._sum_xy - (n - 1) / 2.0 * self._sum
+        return sxy / (n * (n * n - 1) / 12.0)
+
+
+class WindowPercentile:
+    """``np.percentile(window, q)`` of a multiset that values enter and leave."""
+
+    def __init__(self, q: float, values: Iterable[float] = ()):
+        self.q = q
+        self._sorted: List[float] = sorted(values)
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def add(self, value: float) -> None:
+        bisect.insort(self._sorted, value)
+
+    def remove(self, value: float) -> None:
+        del self._sorted[bisect.bisect_left(self._sorted, value)]
+
+    def value(self) -> float:
+        """NaN when empty.  Same virtual index and interpolation as NumPy."""
+        n = len(self._sorted)
+        if not n:
+            return math.nan
+        virtual = (n - 1) * (self.q / 100.0)
+        previous = math.floor(virtual)
+        gamma = virtual - previous
+        if virtual >= n - 1:
+            previous = following = n - 1
+        else:
+            following = previous + 1
+        a = self._sorted[previous]
+        b = self._sorted[following]
+        diff = b - a
+        if gamma >= 0.5:
+            return b - diff * (1 - gamma)
+        return a + diff * gamma
@@ -0,0 +1,5 @@
+"""
+Offline training for the ML service models.
+
+Run from apps/ml-service:  python -m train.train_cvd_risk --help
+"""
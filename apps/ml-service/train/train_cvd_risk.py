@@ -0,0 +1,284 @@
+"""
+Train the CVD risk model and export its inference artifact (see cvd_model.py).
+
+Usage (from apps/ml-service, against the service database):
+
+    # clinical outcomes: user_id,label (1 = confirmed CVD event in follow-up)
+    python -m train.train_cvd_risk --labels outcomes.csv --out-dir train/artifacts
+
+    # no outcomes yet: distil the engine's hand-written rules
+    python -m train.train_cvd_risk --target rules --out-dir train/artifacts
+
+Features are one row per reading from biometric_time_series (last --days
+days), built by cvd_model.features, so training and serving share one
+definition.  NULL columns get the defaults engine._dict_to_biometric uses.
+Targets:
+
+- ``--labels CSV``: every reading of a labelled user gets that user's
+  label.  Readings of unlabelled users are dropped.
+- ``--target rules``: the rule-based ml_cvd_risk_pct / 100 as a soft
+  label.  This exercises the pipeline end to end and gives a drop-in model
+  until outcomes are available.
+
+Each user's readings share one unit of weight, so heavy wearers do not
+dominate.  Users are split into training and validation sets by a hash of
+user_id (--holdout).  The model is L2-regularised logistic regression on
+standardised features, fitted with Newton (IRLS) steps in NumPy.
+Validation log-loss, AUC (binary labels only) and the mean absolute
+difference from the rules, in risk points, are printed.  They are also
+stored in the artifact's metadata.  The artifact path is printed last; set
+ML_CVD_MODEL to it to serve the model.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import cvd_model
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Same defaults as engine._dict_to_biometric for missing values
+SELECT_TRAINING_ROWS_SQL = """
+SELECT user_id,
+       COALESCE(hr_resting, 70)  AS heart_rate_resting,
+       COALESCE(hrv_rmssd, 40)   AS hrv_rmssd,
+       COALESCE(sleep_hrs, 0)    AS sleep_hours,
+       ecg_rhythm = 'irregular'  AS irregular,
+       COALESCE(step_count, 0)   AS step_count
+FROM biometric_time_series
+WHERE time > NOW() - INTERVAL '1 day' * %s
+"""
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m train.train_cvd_risk", description=__doc__.split("\n\n")[0])
+    target = p.add_mutually_exclusive_group(required=True)
+    target.add_argument("--labels", help="CSV with user_id,label (0/1) per user")
+    target.add_argument("--target", choices=("rules",), help="distil the rule-based score")
+    p.add_argument("--days", type=int, default=365, help="readings from the last N days")
+    p.add_argument("--limit", type=int, default=0, help="stop after N readings (0 = all)")
+    p.add_argument("--holdout", type=float, default=0.2, help="fraction of users for validation")
+    p.add_argument("--l2", type=float, default=1.0, help="L2 penalty on the (standardised) weights")
+    p.add_argument("--max-iter", type=int, default=50)
+    p.add_argument("--out-dir", default=os.path.join(SERVICE_DIR, "train", "artifacts"))
+    return p.parse_args(argv)
+
+
+# ---------------------------------------------------------------------------
+# Data
+# ---------------------------------------------------------------------------
+def load_readings(days: int, limit: int = 0, batch: int = 50_000) -> Dict[str, np.ndarray]:
+    """Training rows as columns, streamed with a server-side cursor."""
+    import db
+    if not db._use_db:
+        raise SystemExit("DATABASE_URL is not set; training reads biometric_time_series")
+    parts: Dict[str, list] = {k: [] for k in ("user_id", "heart_rate_resting", "hrv_rmssd",
+                                              "sleep_hours", "irregular", "step_count")}
+    conn = db._get_conn()
+    try:
+        with conn.cursor(name=f"cvd_training_{uuid.uuid4().hex[:8]}") as cur:
+            cur.itersize = batch
+            cur.execute(SELECT_TRAINING_ROWS_SQL, (days,))
+            seen = 0
+            while True:
+                rows = cur.fetchmany(batch)
+                if not rows:
+                    break
+                if limit:
+                    rows = rows[:limit - seen]
+                seen += len(rows)
+                for key, values in zip(parts, zip(*rows)):
+                    parts[key].extend(values)
+                if limit and seen >= limit:
+                    break
+        conn.commit()
+    finally:
+        db._put_conn(conn)
+    return {
+        "user_id": np.array(parts["user_id"], dtype=object),
+        "heart_rate_resting": np.array(parts["heart_rate_resting"], dtype=np.float64),
+        "hrv_rmssd": np.array(parts["hrv_rmssd"], dtype=np.float64),
+        "sleep_hours": np.array(parts["sleep_hours"], dtype=np.float64),
+        "irregular": np.array([bool(v) for v in parts["irregular"]], dtype=bool),
+        "step_count": np.array(parts["step_count"], dtype=np.float64),
+    }
+
+
+def load_labels(path: str) -> Dict[str, float]:
+    labels: Dict[str, float] = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            label = float(row["label"])
+            if label not in (0.0, 1.0):
+                raise SystemExit(f"label for {row['user_id']} must be 0 or 1, got {row['label']}")
+            labels[row["user_id"]] = label
+    return labels
+
+
+def rule_risk_pct(cols: Dict[str, np.ndarray]) -> np.ndarray:
+    """The engine's hand-written ml_cvd_risk_pct (unrounded) for every row."""
+    from engine import EarlyWarningEngine
+    risk = EarlyWarningEngine()._rule_ml_risk_batch(
+        cols["heart_rate_resting"], cols["hrv_rmssd"], cols["sleep_hours"],
+        cols["irregular"], cols["step_count"],
+    )
+    return np.minimum(risk, 100.0)
+
+
+def user_weights(user_ids: np.ndarray) -> np.ndarray:
+    """1 / (readings of the row's user): every user counts once."""
+    _, inverse, counts = np.unique(user_ids, return_inverse=True, return_counts=True)
+    return 1.0 / counts[inverse]
+
+
+def holdout_mask(user_ids: np.ndarray, fraction: float) -> np.ndarray:
+    """True for rows of users in the validation split (stable across runs)."""
+    users, inverse = np.unique(user_ids, return_inverse=True)
+    bucket = np.array([
+        int.from_bytes(hashlib.sha256(str(u).encode()).digest()[:4], "big") % 10_000
+        for u in users
+    ])
+    return (bucket < fraction * 10_000)[inverse]
+
+
+# ---------------------------------------------------------------------------
+# Model
+# ---------------------------------------------------------------------------
+def design_matrix(cols: Dict[str, np.ndarray]) -> np.ndarray:
+    return np.column_stack(cvd_model.features(
+        cols["heart_rate_resting"], cols["hrv_rmssd"], cols["sleep_hours"],
+        cols["irregular"], cols["step_count"],
+    ))
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def fit_logistic(
+    X: np.ndarray, y: np.ndarray, weights: np.ndarray, l2: float = 1.0,
+    max_iter: int = 50, tol: float = 1e-10,
+) -> Tuple[np.ndarray, float, int]:
+    """
+    Weighted, L2-regularised logistic regression by Newton (IRLS) steps.
+    ``y`` may be soft (0..1).  The intercept is not penalised.  Returns
+    (coef, intercept, iterations).
+    """
+    n, k = X.shape
+    A = np.column_stack([np.ones(n), X])
+    penalty = np.full(k + 1, l2)
+    penalty[0] = 0.0
+    w = np.zeros(k + 1)
+    w[0] = np.log(np.clip(np.average(y, weights=weights), 1e-6, 1 - 1e-6) /
+                  np.clip(1 - np.average(y, weights=weights), 1e-6, 1 - 1e-6))
+    for iteration in range(1, max_iter + 1):
+        p = _sigmoid(A @ w)
+        grad = A.T @ (weights * (p - y)) + penalty * w
+        hess = (A * (weights * p * (1 - p))[:, None]).T @ A + np.diag(penalty)
+        step = np.linalg.solve(hess + 1e-12 * np.eye(k + 1), grad)
+        w -= step
+        if np.max(np.abs(step)) < tol:
+            break
+    return w[1:], float(w[0]), iteration
+
+
+def log_loss(y: np.ndarray, p: np.ndarray, weights: np.ndarray) -> float:
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return float(np.average(-(y * np.log(p) + (1 - y) * np.log(1 - p)), weights=weights))
+
+
+def auc(y: np.ndarray, p: np.ndarray) -> Optional[float]:
+    """ROC AUC (Mann-Whitney, tied scores share their average rank)."""
+    positive = y == 1
+    n_pos = int(positive.sum())
+    n_neg = len(y) - n_pos
+    if not n_pos or not n_neg:
+        return None
+    ranks = np.empty(len(p))
+    ranks[np.argsort(p, kind="mergesort")] = np.arange(1, len(p) + 1)
+    _, inverse, counts = np.unique(p, return_inverse=True, return_counts=True)
+    ranks = (np.bincount(inverse, weights=ranks) / counts)[inverse]
+    return float((ranks[positive].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
+
+
+def train(
+    cols: Dict[str, np.ndarray], y: np.ndarray, holdout: float = 0.2, l2: float = 1.0,
+    max_iter: int = 50,
+) -> Tuple[dict, dict]:
+    """Fit on the training users; returns (artifact arrays for cvd_model.save, metrics)."""
+    X = design_matrix(cols)
+    weights = user_weights(cols["user_id"])
+    valid = holdout_mask(cols["user_id"], holdout)
+    fit_rows = ~valid if (~valid).any() else np.ones(len(y), dtype=bool)
+
+    mean = X[fit_rows].mean(axis=0)
+    scale = X[fit_rows].std(axis=0)
+    scale[scale == 0] = 1.0
+    coef, intercept, iterations = fit_logistic(
+        (X[fit_rows] - mean) / scale, y[fit_rows], weights[fit_rows], l2, max_iter,
+    )
+    model = {"coef": coef, "intercept": intercept, "mean": mean, "scale": scale}
+
+    eval_rows = valid if valid.any() else fit_rows
+    p = _sigmoid((X[eval_rows] - mean) / scale @ coef + intercept)
+    rules = rule_risk_pct({k: v[eval_rows] for k, v in cols.items()})
+    binary = bool(np.isin(y, (0.0, 1.0)).all())
+    roc_auc = auc(y[eval_rows], p) if binary else None
+    metrics = {
+        "rows": int(len(y)),
+        "users": int(len(np.unique(cols["user_id"]))),
+        "validation_rows": int(valid.sum()),
+        "iterations": iterations,
+        "log_loss": round(log_loss(y[eval_rows], p, weights[eval_rows]), 6),
+        "auc": round(roc_auc, 6) if roc_auc is not None else None,
+        "mae_vs_rules_pct": round(float(np.average(np.abs(p * 100.0 - rules), weights=weights[eval_rows])), 4),
+    }
+    return model, metrics
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(SERVICE_DIR, ".env"))
+    except ImportError:
+        pass
+
+    cols = load_readings(args.days, args.limit)
+    if args.labels:
+        labels = load_labels(args.labels)
+        keep = np.array([u in labels for u in cols["user_id"]], dtype=bool)
+        cols = {k: v[keep] for k, v in cols.items()}
+        y = np.array([labels[u] for u in cols["user_id"]], dtype=np.float64)
+        target = f"labels:{os.path.basename(args.labels)}"
+    else:
+        y = rule_risk_pct(cols) / 100.0
+        target = "rules"
+    if not len(y):
+        raise SystemExit("no training rows")
+
+    model, metrics = train(cols, y, args.holdout, args.l2, args.max_iter)
+    meta = {
+        "target": target, "days": args.days, "l2": args.l2, "holdout": args.holdout,
+        "features": list(cvd_model.FEATURE_NAMES),
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "metrics": metrics,
+    }
+    path, sha256 = cvd_model.save(args.out_dir, meta=meta, **model)
+    print(json.dumps(meta, indent=2, sort_keys=True), file=sys.stderr)
+    print(f"[train] Wrote {path} (cvd-lr-{sha256[:12]}); set ML_CVD_MODEL to serve it", file=sys.stderr)
+    print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())